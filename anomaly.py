@@ -0,0 +1,171 @@
+"""
+Anomaly and changepoint scan over daily series:
+Every entity's daily ROAS / CTR (row means per day, as in the window comparisons) is scanned
+on every day, not only at the recent-vs-previous cut. Two detectors, both vectorized across
+entities (one array op per day or per candidate split, never a loop per entity):
+    EWMA z-score      day value vs the exponentially weighted mean / std of the days before it
+    changepoints      binary segmentation on the t statistic of a mean shift (robust noise scale)
+Outputs are dated events; InsightAgent turns them into hypotheses.
+"""
+
+import warnings
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from utils.time_index import TimeIndex
+
+METRICS = {"roas": "roas_sum", "ctr": "ctr_sum"}
+# candidate splits are scored for this many segments at a time (bounds the (segments x days) temporaries)
+CHUNK_SEGMENTS = 4096
+
+
+def ewma_zscores(x: np.ndarray, halflife: float, min_history: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    x: (n_series, n_days), NaN where unobserved. z[s, d] compares x[s, d] with the EWMA mean and
+    std of the observed days before d (NaN until min_history days were observed, or std is 0).
+    Returns (z, expected), expected being that prior EWMA mean.
+    """
+    n, days = x.shape
+    alpha = 1.0 - 0.5 ** (1.0 / halflife)
+    mean = np.zeros(n)
+    var = np.zeros(n)
+    count = np.zeros(n, dtype=np.int64)
+    z = np.full(x.shape, np.nan)
+    expected = np.full(x.shape, np.nan)
+    for d in range(days):
+        v = x[:, d]
+        obs = ~np.isnan(v)
+        sd = np.sqrt(var)
+        ok = obs & (count >= min_history) & (sd > 1e-12)
+        z[ok, d] = (v[ok] - mean[ok]) / sd[ok]
+        expected[ok, d] = mean[ok]
+        # incremental EW mean / variance; the first observation only seeds the mean
+        diff = np.where(obs, v - mean, 0.0)
+        first = obs & (count == 0)
+        mean = np.where(first, v, mean + alpha * diff)
+        var = np.where(first, 0.0, np.where(obs, (1 - alpha) * (var + alpha * diff * diff), var))
+        count += obs
+    return z, expected
+
+
+def ewma_events(z: np.ndarray, threshold: float) -> Dict[str, np.ndarray]:
+    """
+    Runs of consecutive days with |z| >= threshold and the same sign, one event per run at its peak.
+    """
+    series, day = np.nonzero(np.abs(np.nan_to_num(z)) >= threshold)
+    if not len(series):
+        return {k: np.zeros(0, dtype=np.int64) for k in ("series", "start", "end", "peak")}
+    sign = np.sign(z[series, day])
+    new = np.ones(len(series), dtype=bool)
+    new[1:] = (series[1:] != series[:-1]) | (day[1:] != day[:-1] + 1) | (sign[1:] != sign[:-1])
+    run = np.cumsum(new) - 1
+    starts = np.flatnonzero(new)
+    ends = np.r_[starts[1:], len(series)] - 1
+    # peak = largest |z| within each run
+    order = np.lexsort((-np.abs(z[series, day]), run))
+    peak = order[np.r_[True, run[order][1:] != run[order][:-1]]]
+    return {"series": series[starts], "start": day[starts], "end": day[ends], "peak": day[peak]}
+
+
+def noise_scale(x: np.ndarray) -> np.ndarray:
+    """
+    Robust per-series noise std from day-to-day differences (MAD / 0.6745 / sqrt 2): unlike the
+    std within a segment, it is not inflated by the shifts being looked for.
+    """
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mad = np.nanmedian(np.abs(np.diff(x, axis=1)), axis=1)
+        level = np.nanmedian(np.abs(x), axis=1)
+    sigma = np.nan_to_num(mad) / (0.6745 * np.sqrt(2))
+    return np.maximum(sigma, 1e-6 * np.nan_to_num(level) + 1e-12)
+
+
+def _best_splits(s1, cnt, obs, sigma, seg, lo, hi, min_segment):
+    """
+    Best mean-shift split per segment [lo, hi) of series seg: (day, t statistic, mean before, mean after).
+    s1 / cnt are prefix sums (n_series, n_days + 1) of values and observed days.
+    """
+    days = np.arange(s1.shape[1])[None, :]
+    out = [np.zeros(len(seg), dtype=np.int64), np.zeros(len(seg)), np.zeros(len(seg)), np.zeros(len(seg))]
+    at = lambda arr, k: np.take_along_axis(arr, k, axis=1)
+    for a in range(0, len(seg), CHUNK_SEGMENTS):
+        b = min(a + CHUNK_SEGMENTS, len(seg))
+        r, sl, sh = seg[a:b], lo[a:b, None], hi[a:b, None]
+        c, p1 = cnt[r], s1[r]
+        n_l, n_r = c - at(c, sl), at(c, sh) - c
+        x_l, x_r = p1 - at(p1, sl), at(p1, sh) - p1
+        # the split day opens the second segment and must itself be observed
+        valid = (days > sl) & (days < sh) & (n_l >= min_segment) & (n_r >= min_segment)
+        valid[:, :-1] &= obs[r]
+        valid[:, -1] = False
+        with np.errstate(divide="ignore", invalid="ignore"):
+            m_l, m_r = x_l / n_l, x_r / n_r
+            t = (m_r - m_l) / (sigma[r, None] * np.sqrt(1 / n_l + 1 / n_r))
+        score = np.where(valid, np.abs(np.nan_to_num(t)), -1.0)
+        best = np.argmax(score, axis=1)[:, None]
+        out[0][a:b] = np.where(at(score, best)[:, 0] >= 0, best[:, 0], -1)
+        out[1][a:b] = at(np.where(valid, t, 0.0), best)[:, 0]
+        out[2][a:b], out[3][a:b] = at(m_l, best)[:, 0], at(m_r, best)[:, 0]
+    return out
+
+
+def changepoints(x: np.ndarray, min_segment: int, min_t: float, min_shift: float, max_splits: int) -> Dict[str, np.ndarray]:
+    """
+    Binary segmentation: each round splits every open segment at its strongest mean shift, kept
+    when |t| >= min_t and the relative change of the mean is >= min_shift. Up to max_splits rounds.
+    """
+    n, days = x.shape
+    obs = ~np.isnan(x)
+    zero = np.zeros((n, 1))
+    s1 = np.hstack([zero, np.cumsum(np.where(obs, x, 0.0), axis=1)])
+    cnt = np.hstack([zero, np.cumsum(obs, axis=1)])
+    sigma = noise_scale(x)
+    seg, lo, hi = np.arange(n), np.zeros(n, dtype=np.int64), np.full(n, days, dtype=np.int64)
+    found = {k: [] for k in ("series", "day", "t", "before", "after", "seg_start", "seg_end")}
+    for _ in range(max_splits):
+        if not len(seg):
+            break
+        day, t, before, after = _best_splits(s1, cnt, obs, sigma, seg, lo, hi, min_segment)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shift = np.abs(after - before) / (np.abs(before) + 1e-9)
+        keep = (day >= 0) & (np.abs(t) >= min_t) & (shift >= min_shift)
+        for k, arr in (("series", seg), ("day", day), ("t", t), ("before", before), ("after", after),
+                       ("seg_start", lo), ("seg_end", hi)):
+            found[k].append(arr[keep])
+        seg, lo, hi, day = seg[keep], lo[keep], hi[keep], day[keep]
+        seg, lo, hi = np.r_[seg, seg], np.r_[lo, day], np.r_[day, hi]
+    return {k: np.concatenate(v) if v else np.zeros(0) for k, v in found.items()}
+
+
+def scan(index: TimeIndex, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    All events for one grain's index, strongest first within each detector.
+    """
+    halflife = float(config.get("anomaly_ewma_halflife_days", 7))
+    min_history = int(config.get("anomaly_min_history_days", 14))
+    z_threshold = float(config.get("anomaly_z", 3.0))
+    min_segment = int(config.get("changepoint_min_segment_days", 7))
+    min_t = float(config.get("changepoint_min_t", 4.0))
+    max_splits = int(config.get("changepoint_max_splits", 2))
+    min_shift = {"roas": float(config.get("roas_drop_pct", 0.15)), "ctr": float(config.get("ctr_drop_pct", 0.10))}
+    day0 = np.datetime64(index.start_date.date(), "D")
+    date = lambda d: str(day0 + np.timedelta64(int(d), "D"))
+
+    events = []
+    for metric, measure in METRICS.items():
+        x = index.daily_means(measure)
+        cps = changepoints(x, min_segment, min_t, min_shift[metric], max_splits)
+        for i in np.argsort(-np.abs(cps["t"]), kind="stable"):
+            events.append({"detector": "changepoint", "metric": metric, "entity": index.entities[int(cps["series"][i])],
+                           "date": date(cps["day"][i]), "before": float(cps["before"][i]), "after": float(cps["after"][i]),
+                           "t_stat": float(cps["t"][i]), "segment": [date(cps["seg_start"][i]), date(cps["seg_end"][i] - 1)]})
+        z, expected = ewma_zscores(x, halflife, min_history)
+        runs = ewma_events(z, z_threshold)
+        peak_z = z[runs["series"], runs["peak"]]
+        for i in np.argsort(-np.abs(peak_z), kind="stable"):
+            s, p = int(runs["series"][i]), int(runs["peak"][i])
+            events.append({"detector": "ewma", "metric": metric, "entity": index.entities[s], "date": date(p),
+                           "start": date(runs["start"][i]), "end": date(runs["end"][i]), "value": float(x[s, p]),
+                           "expected": float(expected[s, p]), "z": float(peak_z[i])})
+    return events
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Batch runner: one pipeline run per ad account, fanned out over a process pool.
+
+Usage:
+    python src/orchestrator/batch.py accounts.yaml --config config/config.yaml --out batch_reports
+
+Manifest: YAML/JSON list whose entries are a data path string, or a mapping with
+`account_id` and/or `data_path` (optional `query`). Entries with only an account id use
+the config's `account_data_template` (e.g. "data/accounts/{account_id}.csv"). A plain
+text file with one data path per line also works.
+
+Each account writes reports, logs and memory under <out>/<account_id>/; the batch writes
+<out>/batch_summary.json and <out>/batch_summary.md.
+"""
+
+import os
+import sys
+import argparse
+import multiprocessing as mp
+import time
+from datetime import datetime
+
+import yaml
+
+# Ensure src package path so local imports work when running as script
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from orchestrator.run import load_config, run_pipeline
+from utils.io_utils import write_json
+from utils.dataset import clear_memo
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - non-POSIX
+    resource = None
+
+
+def load_manifest(path, cfg):
+    with open(path, "r") as fh:
+        text = fh.read()
+    if path.endswith((".yaml", ".yml", ".json")):
+        entries = yaml.safe_load(text) or []
+        if isinstance(entries, dict):
+            entries = entries.get("accounts", [])
+    else:
+        entries = [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+
+    template = cfg.get("account_data_template")
+    accounts = []
+    for i, e in enumerate(entries):
+        if isinstance(e, str):
+            e = {"data_path": e}
+        account_id = str(e.get("account_id") or os.path.splitext(os.path.basename(e.get("data_path", f"account_{i}")))[0])
+        data_path = e.get("data_path") or (template.format(account_id=account_id) if template else None)
+        accounts.append({"account_id": account_id, "data_path": data_path, "query": e.get("query")})
+    ids = [a["account_id"] for a in accounts]
+    if len(set(ids)) != len(ids):
+        raise ValueError("duplicate account ids in manifest")
+    return accounts
+
+
+_STARTED = None  # worker side of the queue that reports when each account starts
+
+
+def _init_worker(memory_limit_mb, started=None):
+    global _STARTED
+    _STARTED = started
+    # bound each worker's address space so one huge export fails alone instead of starving the box
+    if memory_limit_mb and resource is not None:
+        limit = int(memory_limit_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _start(fn, account, *args):
+    if _STARTED is not None:
+        _STARTED.put((account["account_id"], time.time()))
+    return fn(account, *args)
+
+
+def _failed(account, duration_s, error):
+    return {"account_id": account["account_id"], "status": "failed", "data_path": account["data_path"],
+            "duration_s": round(duration_s, 3), "error": error}
+
+
+def run_pool(ctx, accounts, fn, args=(), workers=1, timeout_s=3600, memory_limit_mb=None, tasks_per_worker=None,
+             poll_s=0.1):
+    """
+    Runs fn(account, *args) for every account on a process pool; yields results as they finish.
+    Each account has its own deadline, timeout_s from when a worker picks it up, so timeouts don't
+    add up. A timed-out account is reported failed while the others carry on; once every worker is
+    stuck on one, the pool is terminated and the accounts not yet started go to a fresh pool.
+    """
+    queue = list(accounts)
+    while queue:
+        started = ctx.SimpleQueue()
+        # workers are reused for tasks_per_worker accounts, then recycled to release memory
+        with ctx.Pool(processes=workers, initializer=_init_worker, initargs=(memory_limit_mb, started),
+                      maxtasksperchild=tasks_per_worker) as pool:
+            pending = [(a, pool.apply_async(_start, (fn, a) + tuple(args))) for a in queue]
+            start_times, hung = {}, []
+            while pending and sum(not res.ready() for res in hung) < workers:
+                while not started.empty():
+                    account_id, t = started.get()
+                    start_times[account_id] = t
+                now, still = time.time(), []
+                for account, res in pending:
+                    t = start_times.get(account["account_id"])
+                    if res.ready():
+                        try:
+                            yield res.get()
+                        except Exception as e:
+                            yield _failed(account, now - (t or now), f"{type(e).__name__}: {e}")
+                    elif t is not None and now - t > timeout_s:
+                        hung.append(res)
+                        yield _failed(account, now - t, f"TimeoutError: no result after {timeout_s}s")
+                    else:
+                        still.append((account, res))
+                if len(still) == len(pending):
+                    time.sleep(poll_s)
+                pending = still
+            # leaving the block terminates the pool, including any worker still stuck on an account
+        queue = [a for a, _ in pending]
+
+
+def _run_account(account, cfg, out_dir, query, sweep):
+    account_dir = os.path.join(out_dir, account["account_id"])
+    overrides = {
+        "data_path": account["data_path"],
+        "reports_path": os.path.join(account_dir, "reports"),
+        "logs_path": os.path.join(account_dir, "logs", "run_logs.jsonl"),
+        "memory_path": os.path.join(account_dir, "memory", "insight_memory.sqlite"),
+        "checkpoint_path": os.path.join(account_dir, "checkpoints", "aggregates"),
+        "legacy_memory_path": None,
+        "log_echo": False,
+    }
+    t0 = time.perf_counter()
+    try:
+        if not account["data_path"] or not os.path.exists(account["data_path"]):
+            raise FileNotFoundError(f"data file not found: {account['data_path']}")
+        summary = run_pipeline(query=account.get("query") or query, sweep=sweep, config=cfg, overrides=overrides)
+        return {"account_id": account["account_id"], "status": "ok",
+                "duration_s": round(time.perf_counter() - t0, 3), **summary}
+    except Exception as e:
+        # one bad account must not sink the batch
+        return _failed(account, time.perf_counter() - t0, f"{type(e).__name__}: {e}")
+    finally:
+        # reused workers must not keep the previous account's frame alive
+        clear_memo()
+
+
+def consolidate(results):
+    ok = [r for r in results if r["status"] == "ok"]
+    spend = sum(r["overall"].get("total_spend", 0) for r in ok)
+    revenue = sum(r["overall"].get("total_revenue", 0) for r in ok)
+    impressions = sum(r["overall"].get("total_impressions", 0) for r in ok)
+    clicks = sum(r["overall"].get("total_clicks", 0) for r in ok)
+    hypotheses = {}
+    for r in ok:
+        for h, n in r.get("hypotheses", {}).items():
+            hypotheses[h] = hypotheses.get(h, 0) + n
+    return {
+        "accounts": len(results),
+        "succeeded": len(ok),
+        "failed": [{"account_id": r["account_id"], "error": r.get("error")} for r in results if r["status"] != "ok"],
+        "total_spend": round(spend, 2),
+        "total_revenue": round(revenue, 2),
+        "total_impressions": int(impressions),
+        "blended_ctr": round(clicks / impressions, 6) if impressions else 0.0,
+        "blended_roas": round(revenue / spend, 4) if spend else 0.0,
+        "hypotheses": hypotheses,
+    }
+
+
+def write_summary_md(path, summary, results):
+    lines = ["# Batch Run Summary", f"Generated (UTC): {datetime.utcnow().isoformat()}Z\n"]
+    lines.append(f"- Accounts: {summary['accounts']} ({summary['succeeded']} succeeded)")
+    lines.append(f"- Total spend: ${summary['total_spend']:.2f}")
+    lines.append(f"- Total revenue: ${summary['total_revenue']:.2f}")
+    lines.append(f"- Blended ROAS: {summary['blended_roas']:.3f}")
+    lines.append(f"- Blended CTR: {summary['blended_ctr']:.4f}\n")
+    lines.append("## Accounts")
+    lines.append("| Account | Status | Spend | Revenue | Insights | Creatives | Seconds |")
+    lines.append("|---|---|---|---|---|---|---|")
+    for r in results:
+        o = r.get("overall", {})
+        lines.append(f"| {r['account_id']} | {r['status']} | {o.get('total_spend', 0):.2f} | {o.get('total_revenue', 0):.2f} | "
+                     f"{r.get('insights', 0)} | {r.get('creatives', 0)} | {r['duration_s']} |")
+    if summary["failed"]:
+        lines.append("\n## Failures")
+        for f in summary["failed"]:
+            lines.append(f"- {f['account_id']}: {f['error']}")
+    lines.append("\n## Hypotheses across accounts")
+    for h, n in sorted(summary["hypotheses"].items(), key=lambda kv: -kv[1]):
+        lines.append(f"- {h}: {n}")
+    with open(path, "w") as fh:
+        fh.write("\n".join(lines) + "\n")
+
+
+def run_batch(manifest_path, config_path="config/config.yaml", out_dir="batch_reports", query="Analyze ROAS drop",
+              workers=None, sweep=False):
+    cfg = load_config(config_path)
+    accounts = load_manifest(manifest_path, cfg)
+    workers = int(workers or cfg.get("batch_workers") or min(4, os.cpu_count() or 1))
+    timeout_s = cfg.get("batch_task_timeout_s", 3600)
+    os.makedirs(out_dir, exist_ok=True)
+
+    ctx = mp.get_context(cfg.get("batch_start_method", "spawn"))
+    by_id = {}
+    for r in run_pool(ctx, accounts, _run_account, (cfg, out_dir, query, sweep), workers=workers, timeout_s=timeout_s,
+                      memory_limit_mb=cfg.get("batch_worker_memory_mb"),
+                      tasks_per_worker=cfg.get("batch_tasks_per_worker", 8)):
+        print(f"[batch] {r['account_id']}: {r['status']} ({r['duration_s']}s)")
+        by_id[r["account_id"]] = r
+    results = [by_id[a["account_id"]] for a in accounts]
+
+    summary = consolidate(results)
+    write_json(os.path.join(out_dir, "batch_summary.json"), {"summary": summary, "accounts": results})
+    write_summary_md(os.path.join(out_dir, "batch_summary.md"), summary, results)
+    print(f"Batch complete: {summary['succeeded']}/{summary['accounts']} accounts. Summary in {out_dir}.")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("manifest", help="YAML/JSON list of accounts or a text file of CSV paths")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--out", default="batch_reports")
+    parser.add_argument("--query", default="Analyze ROAS drop")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrency cap (default: batch_workers)")
+    parser.add_argument("--sweep", action="store_true")
+    args = parser.parse_args()
+    summary = run_batch(args.manifest, config_path=args.config, out_dir=args.out, query=args.query,
+                        workers=args.workers, sweep=args.sweep)
+    sys.exit(1 if summary["failed"] else 0)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness: times each pipeline stage on synthetic datasets of increasing size.
+
+Usage:
+    python src/orchestrator/benchmark.py --rows 10000 100000 1000000 --out bench/results.json
+    python src/orchestrator/benchmark.py --rows 100000 --compare bench/results.json
+
+For every size a dataset is generated once (cached under --data-dir, keyed by size and seed),
+then DataAgent, InsightAgent, EvaluatorAgent, CreativeAgent and report writing are timed
+--repeat times each. Peak memory per stage comes from tracemalloc (Python + NumPy allocations)
+and the process RSS high-water mark. Results are saved as JSON so versions can be compared.
+"""
+
+import os
+import sys
+import json
+import argparse
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# Ensure src package path so local imports work when running as script
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from agents.planner_agent import PlannerAgent
+from agents.data_agent import DataAgent
+from agents.insight_agent import InsightAgent
+from agents.evaluator_agent import EvaluatorAgent
+from agents.creative_agent import CreativeAgent
+from orchestrator.run import load_config, write_report
+from utils.dataset import clear_memo
+from utils.io_utils import write_json
+from utils.synthetic_data import generate
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - non-POSIX
+    resource = None
+
+STAGES = ["data_agent", "insight_agent", "evaluator_agent", "creative_agent", "report"]
+
+
+@contextmanager
+def measure(rec, trace_memory=True):
+    if trace_memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        rec["seconds"] = time.perf_counter() - t0
+        if trace_memory:
+            rec["peak_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+        if resource is not None:
+            rec["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def dataset_for(rows, data_dir, seed, campaigns, adsets, days, messages):
+    path = os.path.join(data_dir, f"ads_{rows}_s{seed}_c{campaigns}_a{adsets}_d{days}_m{messages}.csv")
+    if not os.path.exists(path):
+        print(f"[bench] generating {rows:,} rows -> {path}")
+        generate(path, n_rows=rows, n_campaigns=campaigns, adsets_per_campaign=adsets, n_days=days,
+                 n_messages=messages, seed=seed)
+    return path
+
+
+def run_once(cfg, data_path, reports_dir, trace_memory):
+    """
+    One pass over the stages in pipeline order; returns {stage: {"seconds", "peak_mb", "max_rss_mb"}}.
+    """
+    clear_memo()
+    plan = PlannerAgent().generate_plan("Analyze ROAS drop")
+    out = {s: {} for s in STAGES}
+    with measure(out["data_agent"], trace_memory):
+        summary = DataAgent(data_path, cfg).load_and_summarize()
+    with measure(out["insight_agent"], trace_memory):
+        insights = InsightAgent(cfg, data_path=data_path).generate_insights(summary, plan)
+    with measure(out["evaluator_agent"], trace_memory):
+        validated = EvaluatorAgent(cfg, data_path=data_path).validate(insights, summary)
+    with measure(out["creative_agent"], trace_memory):
+        creatives = CreativeAgent(cfg, data_path=data_path).generate(summary)
+    with measure(out["report"], trace_memory):
+        write_json(os.path.join(reports_dir, "insights.json"), validated)
+        write_json(os.path.join(reports_dir, "creatives.json"), creatives)
+        write_report(os.path.join(reports_dir, "report.md"), datetime.utcnow().isoformat() + "Z",
+                     summary, validated, creatives)
+    out["_counts"] = {"insights": len(validated), "creatives": len(creatives)}
+    return out
+
+
+def bench_size(cfg, data_path, rows, repeat, reports_dir, trace_memory):
+    runs = [run_once(cfg, data_path, reports_dir, trace_memory) for _ in range(repeat)]
+    stages = {}
+    for s in STAGES:
+        secs = [r[s]["seconds"] for r in runs]
+        stages[s] = {"seconds_median": round(statistics.median(secs), 5), "seconds_min": round(min(secs), 5)}
+        if trace_memory:
+            stages[s]["peak_mb"] = round(max(r[s]["peak_mb"] for r in runs), 2)
+    total = [sum(r[s]["seconds"] for s in STAGES) for r in runs]
+    return {
+        "rows": rows,
+        "file_mb": round(os.path.getsize(data_path) / (1024 * 1024), 2),
+        "repeat": repeat,
+        "stages": stages,
+        "total_seconds_median": round(statistics.median(total), 5),
+        "rows_per_second": round(rows / statistics.median(total), 1) if statistics.median(total) else None,
+        "max_rss_mb": round(max(r["report"].get("max_rss_mb", 0) for r in runs), 2),
+        "counts": runs[-1]["_counts"],
+    }
+
+
+def environment():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        rev = None
+    return {
+        "time": datetime.utcnow().isoformat() + "Z",
+        "git_rev": rev,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, "r") as fh:
+        baseline = json.load(fh)
+    base = {r["rows"]: r for r in baseline.get("results", [])}
+    print(f"[bench] vs {baseline_path} (rev {baseline.get('environment', {}).get('git_rev')})")
+    for r in current["results"]:
+        b = base.get(r["rows"])
+        if not b:
+            continue
+        for s in STAGES:
+            now, then = r["stages"][s]["seconds_median"], b["stages"].get(s, {}).get("seconds_median")
+            if then:
+                print(f"  {r['rows']:>10,} {s:<16} {then:9.4f}s -> {now:9.4f}s  x{now / then:5.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--data-dir", default="bench/data")
+    parser.add_argument("--out", default="bench/results.json")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--campaigns", type=int, default=50)
+    parser.add_argument("--adsets", type=int, default=5)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--messages", type=int, default=120)
+    parser.add_argument("--no-trace-memory", action="store_true", help="Skip tracemalloc (lower overhead)")
+    parser.add_argument("--compare", default=None, help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    cfg = load_config(args.config) if os.path.exists(args.config) else {}
+    # benchmark the parse and index build, not the on-disk caches; memory lookups are out of scope
+    cfg = dict(cfg, dataset_cache_path=None, phrase_index_path=None)
+    reports_dir = os.path.join(os.path.dirname(args.out) or ".", "reports")
+    os.makedirs(reports_dir, exist_ok=True)
+
+    results = []
+    for rows in args.rows:
+        path = dataset_for(rows, args.data_dir, args.seed, args.campaigns, args.adsets, args.days, args.messages)
+        res = bench_size(cfg, path, rows, args.repeat, reports_dir, not args.no_trace_memory)
+        print(f"[bench] {rows:>10,} rows: " + ", ".join(f"{s} {v['seconds_median']:.3f}s" for s, v in res["stages"].items()))
+        results.append(res)
+
+    current = {"environment": environment(), "params": vars(args), "results": results}
+    write_json(args.out, current)
+    print(f"[bench] results in {args.out}")
+    if args.compare:
+        compare(current, args.compare)
+
+
+if __name__ == "__main__":
+    main()
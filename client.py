@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Client for the analysis server (orchestrator/server.py).
+
+Usage:
+    python src/orchestrator/client.py "Analyze ROAS drop" --recent 7 --roas-drop 0.2
+    python src/orchestrator/client.py --grain adset_name --filter campaign_name="Men ComfortMax Launch"
+    python src/orchestrator/client.py --load-test 2000 --concurrency 8
+
+--load-test sends a mix of queries (windows, thresholds, grains and single-campaign filters
+drawn from the server's summary) and prints throughput and latency percentiles.
+"""
+
+import os
+import sys
+import json
+import argparse
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class AnalysisClient:
+    def __init__(self, url="http://127.0.0.1:8780", timeout_s=60.0):
+        self.url = url.rstrip("/")
+        self.timeout_s = timeout_s
+
+    def _call(self, path, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(self.url + path, data=data, method="POST" if data is not None else "GET",
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout_s) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            # the server answers errors as {"error": ...}
+            try:
+                message = json.loads(e.read()).get("error")
+            except Exception:
+                message = e.reason
+            raise RuntimeError(f"{e.code}: {message}") from None
+
+    def health(self):
+        return self._call("/health")
+
+    def summary(self):
+        return self._call("/summary")
+
+    def query(self, query="Analyze ROAS drop", **params):
+        return self._call("/query", {"query": query, **{k: v for k, v in params.items() if v is not None}})
+
+    def reload(self):
+        return self._call("/reload", {})
+
+
+def load_test(client, n, concurrency, seed=42):
+    """
+    n mixed queries over `concurrency` connections; returns throughput and latency stats (ms).
+    """
+    rng = random.Random(seed)
+    campaigns = [c["campaign_name"] for c in client.summary().get("by_campaign", [])]
+    variants = []
+    for _ in range(n):
+        params = {"recent_window_days": rng.choice([7, 14, 21]), "previous_window_days": rng.choice([14, 30]),
+                  "roas_drop_pct": rng.choice([0.1, 0.15, 0.25]), "grains": [rng.choice(["campaign_name", "adset_name"])]}
+        if campaigns and rng.random() < 0.3:
+            params["filters"] = {"campaign_name": rng.choice(campaigns)}
+            params["grains"] = ["adset_name"]
+        variants.append(params)
+
+    def one(params):
+        t0 = time.perf_counter()
+        try:
+            res = client.query(**params)
+            return (time.perf_counter() - t0) * 1000, res.get("elapsed_ms"), None
+        except Exception as e:
+            return (time.perf_counter() - t0) * 1000, None, str(e)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, variants))
+    wall = time.perf_counter() - t0
+    latency = np.array([r[0] for r in results if r[2] is None])
+    server = np.array([r[1] for r in results if r[1] is not None])
+    pct = lambda a, q: round(float(np.percentile(a, q)), 3) if len(a) else None
+    return {
+        "requests": n, "concurrency": concurrency, "errors": sum(r[2] is not None for r in results),
+        "wall_s": round(wall, 3), "qps": round(n / wall, 1) if wall else None,
+        "latency_ms": {"p50": pct(latency, 50), "p95": pct(latency, 95), "p99": pct(latency, 99),
+                       "max": pct(latency, 100)},
+        "server_ms": {"p50": pct(server, 50), "p95": pct(server, 95)},
+    }
+
+
+def print_result(res):
+    print(f"{res['n_insights']} insights in {res['elapsed_ms']} ms (server) for {res['params']}")
+    for ins in res["insights"]:
+        ev = ins.get("evidence", {})
+        print(f"- [{ins.get('confidence')}] {ins.get('campaign')}: {ins.get('hypothesis')} "
+              f"(ROAS {ev.get('roas_pct_change', 0):+.1%}, CTR {ev.get('ctr_pct_change', 0):+.1%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("query", nargs="?", default="Analyze ROAS drop")
+    parser.add_argument("--url", default=os.environ.get("FB_ANALYST_URL", "http://127.0.0.1:8780"))
+    parser.add_argument("--recent", type=int, default=None, help="recent_window_days")
+    parser.add_argument("--previous", type=int, default=None, help="previous_window_days")
+    parser.add_argument("--roas-drop", type=float, default=None, help="roas_drop_pct")
+    parser.add_argument("--ctr-drop", type=float, default=None, help="ctr_drop_pct")
+    parser.add_argument("--grain", action="append", default=None, help="Repeat for several grains")
+    parser.add_argument("--filter", action="append", default=[], metavar="COLUMN=VALUE",
+                        help="Row filter; repeat a column to allow several values")
+    parser.add_argument("--significance", action="store_true", help="Add Welch p-values and bootstrap CIs")
+    parser.add_argument("--limit", type=int, default=None, help="Only the N most confident insights")
+    parser.add_argument("--json", action="store_true", help="Print the raw JSON response")
+    parser.add_argument("--summary", action="store_true", help="Print the dataset summary instead")
+    parser.add_argument("--load-test", type=int, default=0, metavar="N", help="Send N mixed queries and time them")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    client = AnalysisClient(args.url)
+    if args.load_test:
+        print(json.dumps(load_test(client, args.load_test, args.concurrency), indent=2))
+        sys.exit(0)
+    if args.summary:
+        print(json.dumps(client.summary(), indent=2))
+        sys.exit(0)
+    filters = {}
+    for f in args.filter:
+        col, _, value = f.partition("=")
+        filters.setdefault(col, []).append(value)
+    res = client.query(args.query, recent_window_days=args.recent, previous_window_days=args.previous,
+                       roas_drop_pct=args.roas_drop, ctr_drop_pct=args.ctr_drop, grains=args.grain,
+                       filters=filters or None, significance=args.significance or None, limit=args.limit)
+    if args.json:
+        print(json.dumps(res, indent=2))
+    else:
+        print_result(res)
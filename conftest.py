@@ -0,0 +1,22 @@
+"""
+Test setup: modules import each other as utils.*, agents.* and orchestrator.*. With a src/
+checkout that is just src/ on the path; in the flat layout every module sits next to this file,
+so the three packages are mapped onto this directory. Either way each module loads once.
+"""
+
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(ROOT, "src")
+
+if os.path.isdir(SRC):
+    if SRC not in sys.path:
+        sys.path.insert(0, SRC)
+else:
+    for name in ("agents", "orchestrator", "utils"):
+        if name not in sys.modules:
+            package = types.ModuleType(name)
+            package.__path__ = [ROOT]
+            sys.modules[name] = package
@@ -1,16 +1,27 @@
 """
 Creative Agent:
-Generates creative suggestions for low-CTR ads.
-If config.use_llm is True, the agent prepares LLM prompts (does not call API by default).
+Generates creative suggestions for low-CTR ads, themed on the phrases that go with
+above-average CTR across the whole dataset (utils.phrase_index).
+If config.use_llm is True, variants come from the configured LLM backend (batched, cached,
+concurrency- and rate-limited; see utils.llm_client); ads the backend fails on keep the templates.
 """
 
+import os
 import random
 from collections import Counter
 from typing import Dict, Any, List
 
+from utils.dataset import load_dataset
+from utils.data_quality import options_from_config
+from utils.llm_client import LLMCreativeClient
+from utils.phrase_index import PhraseIndex
+
 class CreativeAgent:
-    def __init__(self, config: Dict[str, Any] = None):
+    def __init__(self, config: Dict[str, Any] = None, data_path: str = None, phrases: bool = True):
         self.config = config or {}
+        self.data_path = data_path
+        # the phrase index needs every row; incremental runs turn it off and theme on sampled keywords
+        self.use_phrases = phrases
         self.templates = [
             ("Feel the comfort all day", "Discover soft support that moves with you — no marks, all comfort.", "Shop Now"),
             ("Perfect fit, no compromise", "Find your size-forward fit with breathable fabric and gentle support.", "Find Your Fit"),
@@ -19,14 +30,58 @@ class CreativeAgent:
             ("New: Breathable fabric", "Experience breathable material made for long days.", "Explore")
         ]
         random.seed(self.config.get("seed", 42))
+        self.last_llm_stats = None
+        self.phrase_summary = None
+        self._phrases = None
+
+    def phrase_index(self):
+        """
+        Dataset-wide phrase index (built once per dataset version, then loaded); None without data.
+        """
+        if self._phrases is None and self.use_phrases:
+            path = self.data_path or self.config.get("data_path")
+            if not path or not os.path.exists(path):
+                return None
+            try:
+                quality = options_from_config(self.config)
+                df = load_dataset(path, cache_dir=self.config.get("dataset_cache_path"),
+                                  compact=self.config.get("compact_dtypes", False), quality=quality)
+                self._phrases = PhraseIndex.for_dataset(path, df, self.config.get("phrase_index_path"),
+                                                        self.config.get("phrase_ngram_max", 2), quality)
+            except Exception as e:
+                # non-fatal: fall back to keywords of the sampled ads
+                print(f"[creative] phrase index unavailable: {e}")
+                return None
+        return self._phrases
+
+    def llm_variants(self, low: List[Dict[str, Any]]) -> List[Any]:
+        try:
+            with LLMCreativeClient.from_config(self.config) as client:
+                variants, self.last_llm_stats = client.generate(low)
+            return variants
+        except Exception as e:
+            # non-fatal: templates still cover every ad
+            self.last_llm_stats = {"error": f"{type(e).__name__}: {e}"}
+            return [None] * len(low)
 
     def generate(self, data_summary: Dict[str, Any]) -> List[Dict[str, Any]]:
         low = data_summary.get("low_ctr_ads", [])[:12]
-        corpus = []
-        for r in low:
-            msg = r.get("creative_message") or ""
-            corpus += [w.strip(".,!?\"'()").lower() for w in msg.split() if len(w) > 3]
-        top_words = [w for w, _ in Counter(corpus).most_common(8)]
+        index = self.phrase_index()
+        min_rows = self.config.get("phrase_min_rows", 20)
+        if index is not None:
+            best = index.top(8, by="ctr_lift", min_rows=min_rows)
+            top_words = [p["phrase"] for p in best if p["ctr_lift"] > 1]
+            self.phrase_summary = {"overall_ctr": round(index.overall["ctr"], 5), "best": best[:5],
+                                   "worst": index.top(5, by="ctr_lift", ascending=True, min_rows=min_rows)}
+            reason = "Template + high-CTR dataset phrases"
+        else:
+            corpus = []
+            for r in low:
+                msg = r.get("creative_message") or ""
+                corpus += [w.strip(".,!?\"'()").lower() for w in msg.split() if len(w) > 3]
+            top_words = [w for w, _ in Counter(corpus).most_common(8)]
+            reason = "Template + dataset top words"
+        llm = self.llm_variants(low) if self.config.get("use_llm") else [None] * len(low)
 
         out = []
         for i, r in enumerate(low):
@@ -34,20 +89,28 @@ class CreativeAgent:
             original = r.get("creative_message") or ""
             impressions = int(r.get("impressions") or 0)
             ctr = float(r.get("ctr") or 0.0)
-            # Build 3 suggestions using templates and dataset keywords
-            suggestions = []
-            for t in self.templates[:3]:
+            # 3 suggestions: LLM variants when available, else templates + dataset keywords
+            suggestions = [{"headline": v.get("headline"), "message": v.get("message"), "cta": v.get("cta"),
+                            "reason_generated": v.get("reason") or f"LLM ({self.config.get('llm_model')})"}
+                           for v in (llm[i] or [])[:3]]
+            for t in ([] if suggestions else self.templates[:3]):
                 suggestions.append({
                     "headline": t[0],
                     "message": t[1] + ((" Using themes: " + ", ".join(top_words[:3])) if top_words else ""),
                     "cta": t[2],
-                    "reason_generated": "Template + dataset top words"
+                    "reason_generated": reason
                 })
-            out.append({
+            creative = {
                 "campaign": campaign,
                 "original_message": original,
                 "impressions": impressions,
                 "ctr": round(ctr, 4),
                 "suggestions": suggestions
-            })
+            }
+            if index is not None:
+                # phrases of this message that run below the dataset CTR, weakest first
+                weak = [p for p in index.phrase_stats(original) if p["rows"] >= min_rows and p["ctr_lift"] < 1]
+                creative["weak_phrases"] = [{"phrase": p["phrase"], "ctr_lift": round(p["ctr_lift"], 3)}
+                                            for p in sorted(weak, key=lambda p: p["ctr_lift"])[:3]]
+            out.append(creative)
         return out
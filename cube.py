@@ -0,0 +1,244 @@
+"""
+Pre-aggregated OLAP cube over the ads schema:
+One cell per distinct (campaign x adset x day x audience x platform x country) combination,
+stored as COO arrays: a dictionary-encoded int32 code column per dimension (-1 where the
+key is missing) plus one float64 array per additive measure. Cells are sorted by day, so a date range is a contiguous slice.
+
+Queries (slice, roll-up, derived ratios) are masks and bincounts over the cells, never a
+pass over the raw rows. Persisted per dataset version and memory-mapped on load:
+    <cache_dir>/<version>/meta.json          dimensions, dictionaries, measures
+    <cache_dir>/<version>/dim_<name>.npy     int32 codes per cell
+    <cache_dir>/<version>/m_<name>.npy       float64 measure per cell
+where version = sha1(path, size, mtime, dimensions, source dtypes, data-quality options).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset import file_fingerprint
+
+CUBE_VERSION = 2
+DIMENSIONS = ['campaign_name', 'adset_name', 'date', 'audience_type', 'platform', 'country']
+# ctr_sum / roas_sum keep the row means (the pipeline's "average CTR/ROAS") derivable
+MEASURES = ['spend', 'impressions', 'clicks', 'purchases', 'revenue', 'rows', 'ctr_sum', 'roas_sum']
+# measure -> source column (rows counts the rows)
+SOURCES = {'spend': 'spend', 'impressions': 'impressions', 'clicks': 'clicks', 'purchases': 'purchases',
+           'revenue': 'revenue', 'ctr_sum': 'ctr', 'roas_sum': 'roas'}
+RATIOS = {
+    "ctr": ("clicks", "impressions"),
+    "roas": ("revenue", "spend"),
+    "cpc": ("spend", "clicks"),
+    "cpm": ("spend", "impressions", 1000.0),
+    "cvr": ("purchases", "clicks"),
+    "avg_ctr": ("ctr_sum", "rows"),
+    "avg_roas": ("roas_sum", "rows"),
+}
+
+
+class Cube:
+    def __init__(self, dims: List[str], dictionaries: Dict[str, np.ndarray], codes: Dict[str, np.ndarray],
+                 measures: Dict[str, np.ndarray], path: Optional[str] = None):
+        self.dims = dims
+        # dictionaries[d][code] is the value; dates are datetime64[D], sorted ascending
+        self.dictionaries = dictionaries
+        self.codes = codes
+        self.measures = measures
+        self.path = path
+        self._lookup = {d: {v: i for i, v in enumerate(dictionaries[d].tolist())} for d in dims if d != "date"}
+        # first cell of every day (cells are sorted by day), plus the end
+        day = codes["date"] if "date" in codes else np.zeros(0, dtype=np.int32)
+        self.day_starts = np.searchsorted(day, np.arange(len(dictionaries.get("date", [])) + 1))
+
+    def __len__(self) -> int:
+        return len(next(iter(self.measures.values()))) if self.measures else 0
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, dims: Sequence[str] = DIMENSIONS) -> "Cube":
+        """
+        One grouped pass over schema-applied rows (rows without a date are left out). Rows missing
+        another dimension's key get code -1 there: they count in totals but in no group of that dimension.
+        """
+        dims = list(dims)
+        rows = df.loc[df['date'].notna()]
+        dictionaries, row_codes = {}, []
+        for d in dims:
+            if d == "date":
+                days = rows['date'].dt.normalize()
+                values = np.unique(days.to_numpy().astype("datetime64[D]"))
+                dictionaries[d] = values
+                row_codes.append(np.searchsorted(values, days.to_numpy().astype("datetime64[D]")).astype(np.int32))
+            else:
+                codes, uniques = pd.factorize(rows[d].astype(object), sort=True)
+                dictionaries[d] = np.asarray(uniques, dtype=str)
+                row_codes.append(codes.astype(np.int32))
+        frame = {f"k{i}": c for i, c in enumerate(row_codes)}
+        for m in MEASURES:
+            frame[m] = np.ones(len(rows)) if m == "rows" else rows[SOURCES[m]].to_numpy(dtype=np.float64)
+        frame = pd.DataFrame(frame)
+        # date first in the sort order, so every day's cells are contiguous
+        order = [f"k{dims.index('date')}"] + [f"k{i}" for i, d in enumerate(dims) if d != "date"] \
+            if "date" in dims else [f"k{i}" for i in range(len(dims))]
+        cells = frame.groupby(order, sort=True).sum()
+        codes = {d: cells.index.get_level_values(f"k{i}").to_numpy(dtype=np.int32) for i, d in enumerate(dims)}
+        measures = {m: cells[m].to_numpy(dtype=np.float64) for m in MEASURES}
+        return cls(dims, dictionaries, codes, measures)
+
+    @classmethod
+    def for_dataset(cls, path: str, df: pd.DataFrame, cache_dir: Optional[str] = None,
+                    dims: Sequence[str] = DIMENSIONS, quality: Optional[Dict[str, Any]] = None) -> "Cube":
+        """
+        Memory-maps the persisted cube for this dataset version, or builds and persists it.
+        quality: the data-quality options df was loaded with (they change its rows and values).
+        """
+        if not cache_dir:
+            return cls.build(df, dims)
+        fp = file_fingerprint(path, with_hash=False)
+        # compact (float32) and full-precision frames give different sums, so they get separate cubes
+        dtypes = ",".join(str(df[c].dtype) for c in SOURCES.values() if c in df.columns)
+        version = hashlib.sha1(f"{fp['path']}|{fp['size']}|{fp['mtime_ns']}|{','.join(dims)}|{dtypes}|"
+                               f"{json.dumps(quality, sort_keys=True)}".encode("utf-8")).hexdigest()
+        entry = os.path.join(cache_dir, version)
+        if os.path.exists(os.path.join(entry, "meta.json")):
+            try:
+                return cls.load(entry)
+            except Exception:
+                pass
+        cube = cls.build(df, dims)
+        try:
+            cube.save(entry)
+            return cls.load(entry)
+        except Exception as e:
+            # non-fatal: the run still has the in-memory cube
+            print(f"[cube] failed to write {entry}: {e}")
+        return cube
+
+    def save(self, entry: str):
+        tmp = entry + f".tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for d in self.dims:
+            np.save(os.path.join(tmp, f"dim_{d}.npy"), np.ascontiguousarray(self.codes[d]), allow_pickle=False)
+        for m, v in self.measures.items():
+            np.save(os.path.join(tmp, f"m_{m}.npy"), np.ascontiguousarray(v), allow_pickle=False)
+        meta = {"version": CUBE_VERSION, "dims": self.dims, "measures": list(self.measures), "n_cells": len(self),
+                "dictionaries": {d: [str(v) for v in self.dictionaries[d]] for d in self.dims}}
+        with open(os.path.join(tmp, "meta.json"), "w") as fh:
+            json.dump(meta, fh)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+
+    @classmethod
+    def load(cls, entry: str) -> "Cube":
+        with open(os.path.join(entry, "meta.json"), "r") as fh:
+            meta = json.load(fh)
+        if meta.get("version") != CUBE_VERSION:
+            raise ValueError("stale cube")
+        dictionaries = {d: (np.array(v, dtype="datetime64[D]") if d == "date" else np.array(v, dtype=str))
+                        for d, v in meta["dictionaries"].items()}
+        codes = {d: np.load(os.path.join(entry, f"dim_{d}.npy"), mmap_mode="r") for d in meta["dims"]}
+        measures = {m: np.load(os.path.join(entry, f"m_{m}.npy"), mmap_mode="r") for m in meta["measures"]}
+        return cls(meta["dims"], dictionaries, codes, measures, path=entry)
+
+    def __getstate__(self):
+        # a persisted cube pickles as its directory and is re-mapped on unpickle
+        if self.path:
+            return {"path": self.path}
+        return self.__dict__
+
+    def __setstate__(self, state):
+        if set(state) == {"path"}:
+            state = Cube.load(state["path"]).__dict__
+        self.__dict__.update(state)
+
+    def decode(self, dim: str, codes: np.ndarray):
+        values = self.dictionaries[dim][codes]
+        return pd.DatetimeIndex(values.astype("datetime64[ns]")) if dim == "date" else values
+
+    @property
+    def date_range(self) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        days = self.dictionaries.get("date")
+        if days is None or not len(days):
+            return None, None
+        return pd.Timestamp(days[0]), pd.Timestamp(days[-1])
+
+    def _day_slice(self, start=None, end=None, last_days: Optional[int] = None) -> slice:
+        days = self.dictionaries["date"]
+        lo, hi = 0, len(days)
+        if last_days is not None and len(days):
+            lo = int(np.searchsorted(days, days[-1] - np.timedelta64(int(last_days) - 1, "D")))
+        if start is not None:
+            lo = max(lo, int(np.searchsorted(days, np.datetime64(pd.Timestamp(start).date(), "D"))))
+        if end is not None:
+            hi = min(hi, int(np.searchsorted(days, np.datetime64(pd.Timestamp(end).date(), "D"), side="right")))
+        hi = max(hi, lo)
+        return slice(int(self.day_starts[lo]), int(self.day_starts[hi]))
+
+    def slice(self, where: Optional[Dict[str, Any]] = None, start=None, end=None,
+              last_days: Optional[int] = None) -> Tuple[slice, Optional[np.ndarray]]:
+        """
+        Cells matching the filters: a contiguous day range plus an optional mask within it.
+        where maps a dimension to a value or list of values; start/end (inclusive) and last_days
+        (ending at the cube's latest day) restrict dates. Unknown values match nothing.
+        """
+        span = self._day_slice(start, end, last_days) if "date" in self.dims else slice(0, len(self))
+        mask = None
+        for d, values in (where or {}).items():
+            if d not in self.dims or d == "date":
+                raise ValueError(f"unknown cube dimension {d!r} (expected one of {self.dims})")
+            wanted = [self._lookup[d][v] for v in (values if isinstance(values, (list, tuple, set)) else [values])
+                      if v in self._lookup[d]]
+            m = np.isin(self.codes[d][span], np.asarray(wanted, dtype=np.int32))
+            mask = m if mask is None else mask & m
+        return span, mask
+
+    def rollup(self, by: Sequence[str] = (), where: Optional[Dict[str, Any]] = None, start=None, end=None,
+               last_days: Optional[int] = None, ratios: Sequence[str] = tuple(RATIOS)) -> pd.DataFrame:
+        """
+        Measures summed over every dimension not in `by`, for the sliced cells, plus derived
+        ratios (ratio of sums; NaN where the denominator is 0). Indexed by the decoded `by`
+        values (a single-row frame when by is empty); groups with no cells are left out, and so
+        are cells missing a `by` key.
+        """
+        by = list(by)
+        span, mask = self.slice(where, start, end, last_days)
+        if by:
+            keyed = np.all([np.asarray(self.codes[d][span]) >= 0 for d in by], axis=0)
+            mask = keyed if mask is None else mask & keyed
+            if mask.all():
+                mask = None
+        sel = (lambda a: a[span][mask]) if mask is not None else (lambda a: np.asarray(a[span]))
+        if by:
+            columns = [sel(self.codes[d]) for d in by]
+            sizes = [len(self.dictionaries[d]) for d in by]
+            if np.prod(sizes, dtype=np.float64) < 2 ** 62:
+                # one int64 key per cell, so grouping is a unique + bincount
+                groups, inverse = np.unique(np.ravel_multi_index(columns, sizes), return_inverse=True)
+                parts = np.unravel_index(groups, sizes)
+            else:
+                groups, inverse = np.unique(np.stack(columns, axis=1), axis=0, return_inverse=True)
+                parts = groups.T
+            inverse = inverse.ravel()
+            data = {m: np.bincount(inverse, weights=sel(v), minlength=len(groups)) for m, v in self.measures.items()}
+            levels = [self.decode(d, p) for d, p in zip(by, parts)]
+            index = pd.MultiIndex.from_arrays(levels, names=by) if len(by) > 1 else pd.Index(levels[0], name=by[0])
+        else:
+            data = {m: np.array([sel(v).sum()]) for m, v in self.measures.items()}
+            index = pd.RangeIndex(1)
+        frame = pd.DataFrame(data, index=index)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for name in ratios:
+                num, den, *scale = RATIOS[name]
+                frame[name] = np.where(frame[den] > 0, frame[num] / frame[den] * (scale[0] if scale else 1.0), np.nan)
+        return frame
+
+    def total(self, **kwargs) -> Dict[str, float]:
+        """
+        Grand totals and ratios for a slice (same keyword filters as rollup).
+        """
+        return {k: float(v) for k, v in self.rollup((), **kwargs).iloc[0].items()}
@@ -1,35 +1,80 @@
 """
 Data Agent:
 Loads CSV, cleans columns, computes compact summary for downstream agents.
+With quality_checks on, rows are validated in the same pass that converts them (utils.data_quality).
+Large files are summarized in streaming mode: bounded chunks, merged partial aggregates; the
+per-entity daily cells merged along the way stand in for the rows in the later stages.
+In-memory runs also build (or memory-map) the OLAP cube; per-campaign totals are a roll-up of it.
 """
 
+import os
 import pandas as pd
 import numpy as np
+from typing import Dict, Any
+
+from utils.dataset import load_dataset, apply_schema, to_records
+from utils.sketch import QuantileSketch
+from utils.low_ctr import LowCtrView, rank_key, top_positions
+from utils.cube import Cube, DIMENSIONS as CUBE_DIMENSIONS
+from utils.time_index import daily_cells, merge_cells
+from utils.data_quality import options_from_config, validate, merge_reports, quarantine_file, write_quarantine
+
+LOW_CTR_COLUMNS = ['campaign_name','adset_name','creative_message','creative_type','impressions','clicks','ctr','spend','roas','audience_type']
+SUM_COLUMNS = ['spend','impressions','clicks','purchases','revenue']
+
+def weighted_ratios(overall: Dict[str, Any]) -> Dict[str, float]:
+    # impression-weighted CTR and spend-weighted ROAS, recomputed from the raw totals
+    return {"weighted_ctr": overall["total_clicks"] / overall["total_impressions"] if overall["total_impressions"] else 0.0,
+            "weighted_roas": overall["total_revenue"] / overall["total_spend"] if overall["total_spend"] else 0.0}
+
 
 class DataAgent:
-    def __init__(self, path):
+    def __init__(self, path, config: Dict[str, Any] = None):
         self.path = path
+        self.config = config or {}
+        # streaming runs also merge daily cells (with squares) over these grains into summary["cells"]
+        self.cell_grains = None
 
     def load_df(self):
+        # schema (expected columns, dates, numeric coercion) is applied once by the dataset layer
+        return load_dataset(self.path, cache_dir=self.config.get("dataset_cache_path"),
+                            compact=self.config.get("compact_dtypes", False),
+                            quality=options_from_config(self.config))
+
+    def use_streaming(self) -> bool:
+        mode = self.config.get("streaming", "auto")
+        if mode == "auto":
+            threshold_mb = self.config.get("stream_threshold_mb", 1024)
+            return os.path.getsize(self.path) >= threshold_mb * 1024 * 1024
+        return bool(mode)
+
+    def low_ctr_fields(self, view: LowCtrView) -> Dict[str, Any]:
+        # the summary keeps only the best-ranked low_ctr_limit rows as records, so it is
+        # self-contained (no reference to the frame) and cheap to pickle or serialize
+        info = view.to_dict(k=int(self.config.get("low_ctr_limit", 20)))
+        return {"low_ctr_ads": info.pop("top"), "low_ctr": info}
+
+    def load_cube(self, df):
+        dims = [d for d in self.config.get("cube_dimensions") or CUBE_DIMENSIONS if d in df.columns]
         try:
-            df = pd.read_csv(self.path, parse_dates=["date"])
-        except Exception:
-            df = pd.read_csv(self.path, low_memory=False)
-            if "date" in df.columns:
-                df["date"] = pd.to_datetime(df["date"], errors="coerce")
-        return df
+            return Cube.for_dataset(self.path, df, self.config.get("cube_path"), dims,
+                                    quality=options_from_config(self.config))
+        except Exception as e:
+            # non-fatal: summaries fall back to groupbys over the rows
+            print(f"[data_agent] cube unavailable: {e}")
+            return None
 
     def load_and_summarize(self):
+        if self.use_streaming():
+            return self.summarize_streaming()
         df = self.load_df()
-        # ensure expected columns
-        expected = ['campaign_name','adset_name','date','spend','impressions','clicks','ctr','purchases','revenue','roas','creative_type','creative_message','audience_type','platform','country']
-        for c in expected:
-            if c not in df.columns:
-                df[c] = np.nan
-        # numeric coercion
-        for n in ['spend','impressions','clicks','ctr','purchases','revenue','roas']:
-            if n in df.columns:
-                df[n] = pd.to_numeric(df[n], errors='coerce').fillna(0)
+        # validated frames hold only finite values, so the means need no inf filtering
+        if "quality" in df.attrs:
+            average_ctr = float(df['ctr'].astype(np.float64, copy=False).mean() or 0)
+            average_roas = float(df['roas'].astype(np.float64, copy=False).mean() or 0)
+        else:
+            average_ctr = float(df['ctr'].astype(np.float64, copy=False).replace([np.inf, -np.inf], np.nan).dropna().mean() or 0)
+            average_roas = float(df['roas'].astype(np.float64, copy=False).replace([np.inf, -np.inf], np.nan).dropna().mean() or 0)
 
         overall = {
             "date_range": [str(df['date'].min().date()) if 'date' in df.columns else None,
@@ -37,33 +82,221 @@ class DataAgent:
             "total_spend": float(df['spend'].sum()),
             "total_impressions": int(df['impressions'].sum()),
             "total_clicks": int(df['clicks'].sum()),
-            "average_ctr": float(df['ctr'].replace([np.inf, -np.inf], np.nan).dropna().mean() or 0),
+            "average_ctr": average_ctr,
             "total_revenue": float(df['revenue'].sum()),
-            "average_roas": float(df['roas'].replace([np.inf, -np.inf], np.nan).dropna().mean() or 0),
+            "average_roas": average_roas,
             "n_rows": int(len(df))
         }
+        overall.update(weighted_ratios(overall))
 
-        by_campaign = (df.groupby("campaign_name")
-                       .agg(spend=("spend","sum"),
-                            impressions=("impressions","sum"),
-                            clicks=("clicks","sum"),
-                            ctr=("ctr","mean"),
-                            purchases=("purchases","sum"),
-                            revenue=("revenue","sum"),
-                            roas=("roas","mean"))
-                       .reset_index().fillna(0).to_dict(orient="records"))
+        cube = self.load_cube(df) if self.config.get("use_cube", False) else None
+        # the cube leaves out undated rows; only use it when it covers the whole file
+        if cube is not None and "campaign_name" in cube.dims and cube.total(ratios=())["rows"] == len(df):
+            by_campaign = (cube.rollup(["campaign_name"], ratios=["avg_ctr", "avg_roas"])
+                           .rename(columns={"avg_ctr": "ctr", "avg_roas": "roas"})
+                           [['spend','impressions','clicks','ctr','purchases','revenue','roas']])
+            # cube measures are float64; keep the groupby's dtypes (integer counts, compact float32 means)
+            dtypes = {c: np.int64 for c in SUM_COLUMNS if df[c].dtype.kind in "iu"}
+            dtypes.update({c: np.float32 for c in ("ctr", "roas") if df[c].dtype == np.float32})
+            by_campaign = by_campaign.astype(dtypes).reset_index()
+        else:
+            # compact float32 ratios are averaged in float64, then narrowed back like the cube's means
+            rows = df[['campaign_name'] + SUM_COLUMNS].assign(ctr=df['ctr'].astype(np.float64, copy=False),
+                                                              roas=df['roas'].astype(np.float64, copy=False))
+            by_campaign = (rows.groupby("campaign_name", observed=True)
+                           .agg(spend=("spend","sum"),
+                                impressions=("impressions","sum"),
+                                clicks=("clicks","sum"),
+                                ctr=("ctr","mean"),
+                                purchases=("purchases","sum"),
+                                revenue=("revenue","sum"),
+                                roas=("roas","mean"))
+                           .astype({c: np.float32 for c in ("ctr", "roas") if df[c].dtype == np.float32})
+                           .reset_index())
+        by_campaign = to_records(by_campaign, 0)
 
         # low CTR identify
         if 'ctr' in df.columns and not df['ctr'].isnull().all():
             try:
-                q = float(df['ctr'].quantile(0.25))
+                q = float(df['ctr'].quantile(self.config.get("ctr_low_quantile", 0.25)))
             except Exception:
                 q = df['ctr'].mean()
         else:
             q = 0.0
 
-        low_ctr_ads = (df[df['ctr'] <= q]
-                       .loc[:, ['campaign_name','adset_name','creative_message','creative_type','impressions','clicks','ctr','spend','roas','audience_type']]
-                       .fillna("").to_dict(orient="records"))
+        # ranked lazily: consumers take the top-k they need instead of a dict per low-CTR row
+        low_ctr_ads = LowCtrView.from_frame(df, q, self.config.get("low_ctr_rank_by", "impressions"), LOW_CTR_COLUMNS)
+
+        summary = {"overall": overall, "by_campaign": by_campaign, **self.low_ctr_fields(low_ctr_ads),
+                   "raw_head": df.head(5).to_dict(orient="records")}
+        if cube is not None:
+            summary["cube"] = cube
+        if "memory_report" in df.attrs:
+            summary["dataset_memory"] = df.attrs["memory_report"]
+        if "quality" in df.attrs:
+            summary["data_quality"] = df.attrs["quality"]
+        return summary
+
+    def summarize_cells(self, cells: pd.DataFrame, tail: pd.DataFrame):
+        """
+        Incremental-mode summary: totals and per-campaign figures from the checkpointed daily
+        cells (utils.incremental), low-CTR ads and raw_head from the newly read rows only.
+        Averages are row means (ctr_sum / rows), as in the window comparisons.
+        """
+        totals = cells[SUM_COLUMNS + ['ctr_sum', 'roas_sum', 'rows']].sum()
+        dates = cells.index.get_level_values("date")
+        n = float(totals['rows'])
+        overall = {
+            "date_range": [str(dates.min().date()) if len(dates) else None,
+                           str(dates.max().date()) if len(dates) else None],
+            "total_spend": float(totals['spend']),
+            "total_impressions": int(totals['impressions']),
+            "total_clicks": int(totals['clicks']),
+            "average_ctr": float(totals['ctr_sum'] / n) if n else 0.0,
+            "total_revenue": float(totals['revenue']),
+            "average_roas": float(totals['roas_sum'] / n) if n else 0.0,
+            "n_rows": int(n)
+        }
+        overall.update(weighted_ratios(overall))
+
+        by_campaign = cells.groupby(level="campaign_name").sum()
+        by_campaign["ctr"] = by_campaign["ctr_sum"] / by_campaign["rows"].replace(0, np.nan)
+        by_campaign["roas"] = by_campaign["roas_sum"] / by_campaign["rows"].replace(0, np.nan)
+        by_campaign = to_records(by_campaign[['spend','impressions','clicks','ctr','purchases','revenue','roas']]
+                                 .reset_index(), 0)
+
+        rank_by = self.config.get("low_ctr_rank_by", "impressions")
+        if len(tail) and not tail['ctr'].isnull().all():
+            q = float(tail['ctr'].quantile(self.config.get("ctr_low_quantile", 0.25)))
+            low_ctr_ads = LowCtrView.from_frame(tail, q, rank_by, LOW_CTR_COLUMNS)
+        else:
+            low_ctr_ads = LowCtrView.empty(LOW_CTR_COLUMNS, rank_by)
+
+        summary = {"overall": overall, "by_campaign": by_campaign, **self.low_ctr_fields(low_ctr_ads),
+                   "raw_head": tail.head(5).to_dict(orient="records")}
+        if "quality" in tail.attrs:
+            summary["data_quality"] = tail.attrs["quality"]
+        return summary
+
+    def iter_chunks(self, quarantine: bool = False):
+        """
+        Schema-applied chunks. With quality_checks, each chunk is validated (duplicates are only
+        detected within a chunk); with quarantine=True its quarantined rows are written out and the
+        merged report is left in self.quality.
+        """
+        chunk_rows = int(self.config.get("stream_chunk_rows", 250000))
+        options = options_from_config(self.config)
+        path = quarantine_file(options["quarantine_path"], self.path) \
+            if quarantine and options and options.get("quarantine_path") else None
+        if quarantine:
+            self.quality = None
+        offset = 0
+        for i, chunk in enumerate(pd.read_csv(self.path, chunksize=chunk_rows, low_memory=False)):
+            if options is None:
+                yield apply_schema(chunk)
+                continue
+            n = len(chunk)
+            clean, quarantined, report = validate(chunk, **options)
+            if quarantine:
+                if path is not None:
+                    try:
+                        write_quarantine(path, quarantined.assign(source_row=quarantined["source_row"] + offset),
+                                         append=i > 0)
+                        report["quarantine_path"] = path
+                    except Exception as e:
+                        # non-fatal: the report still counts the quarantined rows
+                        print(f"[data_agent] failed to write {path}: {e}")
+                self.quality = merge_reports(self.quality, report)
+            offset += n
+            yield clean
+
+    def summarize_streaming(self):
+        """
+        Same output schema as load_and_summarize, with peak memory bounded by stream_chunk_rows.
+        Pass 1 merges sums/counts, per-campaign accumulators and a CTR quantile sketch (and, with
+        cell_grains set, the daily cells); pass 2 keeps the best-ranked stream_low_ctr_limit rows at or below the approximate cutoff.
+        """
+        totals = dict.fromkeys(SUM_COLUMNS, 0.0)
+        ctr_sum = roas_sum = 0.0
+        ctr_n = roas_n = n_rows = 0
+        date_min, date_max = pd.NaT, pd.NaT
+        by_campaign = None
+        sketch = QuantileSketch(self.config.get("ctr_sketch_accuracy", 0.005))
+        raw_head = []
+        cells = None
+
+        for chunk in self.iter_chunks(quarantine=True):
+            if not raw_head:
+                raw_head = chunk.head(5).to_dict(orient="records")
+            n_rows += len(chunk)
+            for c in SUM_COLUMNS:
+                totals[c] += float(chunk[c].sum())
+            ctr = chunk['ctr'].replace([np.inf, -np.inf], np.nan)
+            roas = chunk['roas'].replace([np.inf, -np.inf], np.nan)
+            ctr_sum += float(ctr.sum())
+            ctr_n += int(ctr.count())
+            roas_sum += float(roas.sum())
+            roas_n += int(roas.count())
+            date_min = chunk['date'].min() if pd.isna(date_min) else min(date_min, chunk['date'].min())
+            date_max = chunk['date'].max() if pd.isna(date_max) else max(date_max, chunk['date'].max())
+            sketch.update(chunk['ctr'].to_numpy())
+
+            part = (chunk.groupby("campaign_name", observed=True)
+                    .agg(spend=("spend","sum"),
+                         impressions=("impressions","sum"),
+                         clicks=("clicks","sum"),
+                         ctr_sum=("ctr","sum"),
+                         ctr_n=("ctr","count"),
+                         purchases=("purchases","sum"),
+                         revenue=("revenue","sum"),
+                         roas_sum=("roas","sum"),
+                         roas_n=("roas","count")))
+            by_campaign = part if by_campaign is None else by_campaign.add(part, fill_value=0)
+            if self.cell_grains:
+                grains = [g for g in self.cell_grains if g in chunk.columns]
+                cells = merge_cells(cells, daily_cells(chunk, grains, squares=True))
+
+        overall = {
+            "date_range": [str(pd.Timestamp(date_min).date()), str(pd.Timestamp(date_max).date())],
+            "total_spend": totals['spend'],
+            "total_impressions": int(totals['impressions']),
+            "total_clicks": int(totals['clicks']),
+            "average_ctr": float(ctr_sum / ctr_n) if ctr_n else 0.0,
+            "total_revenue": totals['revenue'],
+            "average_roas": float(roas_sum / roas_n) if roas_n else 0.0,
+            "n_rows": int(n_rows)
+        }
+        overall.update(weighted_ratios(overall))
+
+        campaigns = []
+        if by_campaign is not None:
+            by_campaign = by_campaign.sort_index()
+            by_campaign["ctr"] = by_campaign["ctr_sum"] / by_campaign["ctr_n"].replace(0, np.nan)
+            by_campaign["roas"] = by_campaign["roas_sum"] / by_campaign["roas_n"].replace(0, np.nan)
+            campaigns = to_records(by_campaign[['spend','impressions','clicks','ctr','purchases','revenue','roas']]
+                                   .reset_index(), 0)
+
+        q = sketch.quantile(self.config.get("ctr_low_quantile", 0.25)) if sketch.count else 0.0
+        limit = int(self.config.get("stream_low_ctr_limit", 1000))
+        rank_by = self.config.get("low_ctr_rank_by", "impressions")
+        best, total = None, 0
+        for chunk in self.iter_chunks():
+            low = chunk.loc[chunk['ctr'] <= q, LOW_CTR_COLUMNS]
+            total += len(low)
+            best = low if best is None else pd.concat([best, low], ignore_index=True)
+            # bounded candidate set; sorted positions keep file order among equal keys
+            keep = np.sort(top_positions(rank_key(best, q, rank_by), limit))
+            best = best.iloc[keep].reset_index(drop=True)
+        if best is None:
+            low_ctr_ads = LowCtrView.empty(LOW_CTR_COLUMNS, rank_by)
+        else:
+            low_ctr_ads = LowCtrView(best, np.arange(len(best)), rank_key(best, q, rank_by), q, rank_by,
+                                     LOW_CTR_COLUMNS, total=total)
 
-        return {"overall": overall, "by_campaign": by_campaign, "low_ctr_ads": low_ctr_ads, "raw_head": df.head(5).to_dict(orient="records")}
+        summary = {"overall": overall, "by_campaign": campaigns, **self.low_ctr_fields(low_ctr_ads),
+                   "raw_head": raw_head}
+        if cells is not None:
+            summary["cells"] = cells
+        if getattr(self, "quality", None) is not None:
+            summary["data_quality"] = self.quality
+        return summary
@@ -0,0 +1,179 @@
+"""
+Data-quality pass:
+One vectorized scan over a freshly read frame, run at parse time instead of apply_schema.
+Each column is converted once, and every check is derived from that conversion:
+    duplicate               exact copy of an earlier row
+    missing_date / bad_date no date / a date that does not parse
+    bad_number              numeric column holding non-numeric text
+    non_finite              inf in a numeric column
+    negative                negative spend, count, revenue or ratio
+    clicks_gt_impressions   more clicks than impressions
+    ctr_out_of_range        ctr above 1
+    ctr_mismatch            ctr disagrees with clicks / impressions
+    roas_mismatch           roas disagrees with revenue / spend
+Each row gets a bitmask of reason codes. Rows with any reason in `quarantine` are removed and
+written, with their values as read, to the quarantine file. Missing, unparseable and
+non-finite numbers become 0, as in apply_schema. With recompute_ratios, ctr and roas are
+recomputed from the raw counts wherever the denominator is positive.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset import EXPECTED_COLUMNS, NUMERIC_COLUMNS
+
+REASONS = ['duplicate', 'missing_date', 'bad_date', 'bad_number', 'non_finite', 'negative',
+           'clicks_gt_impressions', 'ctr_out_of_range', 'ctr_mismatch', 'roas_mismatch']
+BITS = {name: np.uint16(1 << i) for i, name in enumerate(REASONS)}
+DEFAULT_QUARANTINE = ['duplicate', 'missing_date', 'bad_date', 'bad_number', 'negative',
+                      'clicks_gt_impressions', 'ctr_out_of_range']
+# absolute slack for ratios the export rounds (ctr to 4 decimals, roas to 2)
+ROUNDING = {"ctr": 1e-4, "roas": 0.01}
+
+
+def options_from_config(cfg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The load_dataset `quality` argument for a config, or None when quality_checks is off.
+    """
+    if not cfg.get("quality_checks", False):
+        return None
+    unknown = set(cfg.get("quality_quarantine_reasons") or []) - set(REASONS)
+    if unknown:
+        raise ValueError(f"unknown quality_quarantine_reasons {sorted(unknown)} (expected any of {REASONS})")
+    return {"quarantine": sorted(cfg.get("quality_quarantine_reasons") or DEFAULT_QUARANTINE),
+            "recompute_ratios": bool(cfg.get("quality_recompute_ratios", False)),
+            "tolerance": float(cfg.get("quality_ratio_tolerance", 0.05)),
+            "quarantine_path": cfg.get("quality_quarantine_path")}
+
+
+def reason_names(codes: np.ndarray) -> np.ndarray:
+    """
+    "a;b" strings for an array of reason bitmasks.
+    """
+    out = np.full(len(codes), "", dtype=object)
+    for name, bit in BITS.items():
+        hit = (codes & bit) != 0
+        out[hit] = out[hit] + np.where(out[hit] == "", name, ";" + name)
+    return out
+
+
+def validate(df: pd.DataFrame, quarantine: List[str] = DEFAULT_QUARANTINE, recompute_ratios: bool = False,
+             tolerance: float = 0.05, **_) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, Any]]:
+    """
+    (clean frame with the schema applied, quarantined rows as read plus reasons / source_row, report).
+    Mutates df.
+    """
+    n = len(df)
+    codes = np.zeros(n, dtype=np.uint16)
+    missing = [c for c in EXPECTED_COLUMNS if c not in df.columns]
+    for c in missing:
+        df[c] = np.nan
+    codes[df.duplicated(keep="first").to_numpy()] |= BITS["duplicate"]
+
+    date = df["date"]
+    if pd.api.types.is_datetime64_any_dtype(date):
+        parsed_date = date
+        codes[date.isna().to_numpy()] |= BITS["missing_date"]
+    else:
+        parsed_date = pd.to_datetime(date, errors="coerce")
+        # only the rows that did not parse need telling apart: blank (missing) or not a date
+        nat = np.flatnonzero(parsed_date.isna().to_numpy())
+        blank = date.iloc[nat].isna().to_numpy() | (date.iloc[nat].astype(str).str.strip() == "").to_numpy()
+        codes[nat[blank]] |= BITS["missing_date"]
+        codes[nat[~blank]] |= BITS["bad_date"]
+
+    values, dirty = {}, []
+    for c in NUMERIC_COLUMNS:
+        s = df[c]
+        if pd.api.types.is_numeric_dtype(s):
+            v = s.to_numpy(dtype=np.float64)
+        else:
+            v = pd.to_numeric(s, errors="coerce").to_numpy(dtype=np.float64)
+            codes[s.notna().to_numpy() & np.isnan(v)] |= BITS["bad_number"]
+        inf = np.isinf(v)
+        codes[inf] |= BITS["non_finite"]
+        if not pd.api.types.is_numeric_dtype(s) or np.isnan(v).any() or inf.any():
+            v = np.where(np.isfinite(v), v, 0.0)
+            dirty.append(c)
+        codes[v < 0] |= BITS["negative"]
+        values[c] = v
+
+    imps, clicks, spend, revenue = values["impressions"], values["clicks"], values["spend"], values["revenue"]
+    codes[clicks > imps] |= BITS["clicks_gt_impressions"]
+    codes[values["ctr"] > 1] |= BITS["ctr_out_of_range"]
+    derived = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for name, num, den in (("ctr", clicks, imps), ("roas", revenue, spend)):
+            calc = np.where(den > 0, num / den, np.nan)
+            off = np.abs(values[name] - calc) > np.maximum(tolerance * np.abs(calc), ROUNDING[name])
+            codes[~np.isnan(calc) & off] |= BITS[f"{name}_mismatch"]
+            derived[name] = calc
+
+    qmask = np.uint16(sum(int(BITS[r]) for r in quarantine))
+    bad = (codes & qmask) != 0
+    quarantined = df.loc[bad].assign(reasons=reason_names(codes[bad]), source_row=np.flatnonzero(bad))
+
+    for c in dirty:
+        df[c] = values[c]
+    recomputed = {}
+    if recompute_ratios:
+        for name, calc in derived.items():
+            fixed = np.where(np.isnan(calc), values[name], calc)
+            recomputed[name] = int(np.count_nonzero(fixed != values[name]))
+            df[name] = fixed
+    df["date"] = parsed_date
+    clean = df.loc[~bad].reset_index(drop=True) if bad.any() else df
+
+    report = {
+        "rows": int(n), "clean_rows": int(n - bad.sum()), "quarantined": int(bad.sum()),
+        "flagged": {r: int(np.count_nonzero(codes & BITS[r])) for r in REASONS},
+        "quarantine_reasons": list(quarantine), "missing_columns": missing, "recomputed": recomputed,
+    }
+    return clean, quarantined, report
+
+
+def quarantine_file(quarantine_dir: str, data_path: str) -> str:
+    return os.path.join(quarantine_dir, os.path.splitext(os.path.basename(data_path))[0] + ".quarantine.csv")
+
+
+def write_quarantine(path: str, quarantined: pd.DataFrame, append: bool = False):
+    # temp file + rename, so readers never see a half-written quarantine
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if append and os.path.exists(path):
+        quarantined.to_csv(path, mode="a", header=False, index=False)
+        return
+    tmp = f"{path}.tmp-{os.getpid()}"
+    quarantined.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def merge_reports(a: Optional[Dict[str, Any]], b: Dict[str, Any]) -> Dict[str, Any]:
+    if a is None:
+        return b
+    out = dict(a)
+    for k in ("rows", "clean_rows", "quarantined"):
+        out[k] = a[k] + b[k]
+    out["flagged"] = {r: a["flagged"][r] + b["flagged"][r] for r in REASONS}
+    out["recomputed"] = {k: a["recomputed"].get(k, 0) + v for k, v in b["recomputed"].items()}
+    return out
+
+
+def validate_file(df: pd.DataFrame, data_path: str, options: Dict[str, Any]) -> pd.DataFrame:
+    """
+    validate() for a whole file read by the dataset layer: writes the quarantine (when
+    quarantine_path is set) and returns the clean frame with the report in attrs["quality"].
+    """
+    clean, quarantined, report = validate(df, **options)
+    if options.get("quarantine_path"):
+        path = quarantine_file(options["quarantine_path"], data_path)
+        try:
+            write_quarantine(path, quarantined)
+            report["quarantine_path"] = path
+        except Exception as e:
+            # non-fatal: the report still counts the quarantined rows
+            print(f"[data_quality] failed to write {path}: {e}")
+    clean.attrs["quality"] = report
+    return clean
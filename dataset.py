@@ -0,0 +1,267 @@
+"""
+Dataset layer:
+Parses the ads CSV once, applies the schema once, and keeps a columnar on-disk cache
+so repeat runs on unchanged data skip CSV parsing entirely.
+
+Compact mode dictionary-encodes the string columns (creative_message becomes a one-time
+interned table of distinct messages plus int codes) and downcasts numerics
+(count columns to int32, ctr/roas to float32); the memory saved is reported in
+df.attrs["memory_report"].
+
+Cache layout (one directory per source file):
+    <cache_dir>/<sha1(abspath)>/meta.json
+    <cache_dir>/<sha1(abspath)>/<column>.npy              numeric / datetime columns
+    <cache_dir>/<sha1(abspath)>/<column>.codes.npy        string columns (int32 codes)
+    <cache_dir>/<sha1(abspath)>/<column>.categories.npy   string columns (unicode table)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+EXPECTED_COLUMNS = ['campaign_name', 'adset_name', 'date', 'spend', 'impressions', 'clicks', 'ctr',
+                    'purchases', 'revenue', 'roas', 'creative_type', 'creative_message',
+                    'audience_type', 'platform', 'country']
+NUMERIC_COLUMNS = ['spend', 'impressions', 'clicks', 'ctr', 'purchases', 'revenue', 'roas']
+CATEGORICAL_COLUMNS = ['campaign_name', 'adset_name', 'creative_type', 'creative_message',
+                       'audience_type', 'platform', 'country']
+COUNT_COLUMNS = ['impressions', 'clicks', 'purchases']
+RATIO_COLUMNS = ['ctr', 'roas']
+
+CACHE_VERSION = 2
+_HASH_BLOCK = 1 << 20
+
+# in-process memo: (abspath, compact) -> (size, mtime_ns, df); shared by every agent in a run
+_MEMO: Dict[str, Any] = {}
+_LOCK = threading.Lock()
+
+
+def content_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(_HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_fingerprint(path: str, with_hash: bool = True) -> Dict[str, Any]:
+    """
+    Identity of a data file: absolute path, size, mtime and (optionally) content hash.
+    """
+    st = os.stat(path)
+    fp = {"path": os.path.abspath(path), "size": int(st.st_size), "mtime_ns": int(st.st_mtime_ns)}
+    if with_hash:
+        fp["content_hash"] = content_hash(path)
+    return fp
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ensure expected columns, parse dates and coerce numerics (NaN -> 0). Mutates and returns df.
+    """
+    for c in EXPECTED_COLUMNS:
+        if c not in df.columns:
+            df[c] = np.nan
+    if not pd.api.types.is_datetime64_any_dtype(df["date"]):
+        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    for n in NUMERIC_COLUMNS:
+        if not pd.api.types.is_numeric_dtype(df[n]) or df[n].isna().any():
+            df[n] = pd.to_numeric(df[n], errors="coerce").fillna(0)
+    return df
+
+
+def parse_csv(path: str, quality: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    try:
+        df = pd.read_csv(path, parse_dates=["date"], low_memory=False)
+    except Exception:
+        df = pd.read_csv(path, low_memory=False)
+    if quality is None:
+        return apply_schema(df)
+    # the data-quality pass converts each column once, checking it on the way (utils.data_quality)
+    from utils.data_quality import validate_file
+    return validate_file(df, path, quality)
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Categorical strings, int32 counts (when integral and in range) and float32 ratios.
+    Money columns (spend, revenue) stay float64.
+    """
+    out = {}
+    i32 = np.iinfo(np.int32)
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype) or pd.api.types.is_datetime64_any_dtype(s):
+            out[col] = s
+        elif col in COUNT_COLUMNS and pd.api.types.is_numeric_dtype(s):
+            v = s.to_numpy()
+            fits = len(v) == 0 or (np.isfinite(v).all() and v.min() >= i32.min and v.max() <= i32.max
+                                   and (np.mod(v, 1) == 0).all())
+            out[col] = s.astype(np.int32) if fits else s
+        elif col in RATIO_COLUMNS and pd.api.types.is_float_dtype(s):
+            out[col] = s.astype(np.float32)
+        elif col in CATEGORICAL_COLUMNS or (s.dtype == object and s.nunique(dropna=True) <= len(s) // 2):
+            out[col] = s.astype("category")
+        else:
+            out[col] = s
+    compact = pd.DataFrame(out, index=df.index)
+    compact.attrs = dict(df.attrs)
+    return compact
+
+
+def to_records(frame: pd.DataFrame, fill) -> list:
+    # compact mode: categoricals cannot take an arbitrary fill value, and float32 values are
+    # widened through their shortest repr so 0.0091 stays 0.0091 rather than 0.009100000374
+    cats = [c for c in frame.columns if isinstance(frame[c].dtype, pd.CategoricalDtype)]
+    f32 = [c for c in frame.columns if frame[c].dtype == np.float32]
+    if cats or f32:
+        frame = frame.astype({c: object for c in cats})
+        for c in f32:
+            frame[c] = frame[c].to_numpy().astype(str).astype(np.float64)
+    return frame.fillna(fill).to_dict(orient="records")
+
+
+def _cache_dir_for(cache_dir: str, path: str) -> str:
+    return os.path.join(cache_dir, hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest())
+
+
+def _write_cache(entry_dir: str, df: pd.DataFrame, fp: Dict[str, Any], raw_bytes: int,
+                 quality: Optional[Dict[str, Any]] = None):
+    tmp = entry_dir + f".tmp-{os.getpid()}-{threading.get_ident()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    columns = []
+    for i, col in enumerate(df.columns):
+        s = df[col]
+        stem = os.path.join(tmp, f"c{i}")
+        if pd.api.types.is_numeric_dtype(s) or pd.api.types.is_datetime64_any_dtype(s):
+            np.save(stem + ".npy", s.to_numpy(), allow_pickle=False)
+            kind = "array"
+        else:
+            cat = s.array if isinstance(s.dtype, pd.CategoricalDtype) else pd.Categorical(s.astype("string").astype(object))
+            np.save(stem + ".codes.npy", cat.codes.astype(np.int32), allow_pickle=False)
+            np.save(stem + ".categories.npy", np.asarray(cat.categories, dtype=str), allow_pickle=False)
+            kind = "strings"
+        columns.append({"name": str(col), "file": f"c{i}", "kind": kind})
+    with open(os.path.join(tmp, "meta.json"), "w") as fh:
+        json.dump({"version": CACHE_VERSION, "fingerprint": fp, "n_rows": int(len(df)), "raw_bytes": raw_bytes,
+                   "columns": columns, "quality_options": quality, "quality": df.attrs.get("quality")}, fh)
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    os.replace(tmp, entry_dir)
+
+
+def _read_meta(entry_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(entry_dir, "meta.json"), "r") as fh:
+            meta = json.load(fh)
+    except Exception:
+        return None
+    return meta if meta.get("version") == CACHE_VERSION else None
+
+
+def _read_cache(entry_dir: str, meta: Dict[str, Any], as_categorical: bool = False) -> pd.DataFrame:
+    data = {}
+    for col in meta["columns"]:
+        stem = os.path.join(entry_dir, col["file"])
+        if col["kind"] == "array":
+            data[col["name"]] = np.load(stem + ".npy", allow_pickle=False)
+        else:
+            codes = np.load(stem + ".codes.npy", allow_pickle=False)
+            cats = np.load(stem + ".categories.npy", allow_pickle=False).astype(object)
+            if as_categorical:
+                # never materializes one Python string per row
+                data[col["name"]] = pd.Categorical.from_codes(codes, categories=cats)
+                continue
+            values = cats.take(np.where(codes < 0, 0, codes)) if len(cats) else np.empty(len(codes), dtype=object)
+            values[codes < 0] = np.nan
+            data[col["name"]] = values
+    return pd.DataFrame(data)
+
+
+def load_dataset(path: str, cache_dir: Optional[str] = None, compact: bool = False,
+                 quality: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    """
+    Returns the schema-applied DataFrame for path (compact dtypes if compact=True).
+    With quality (utils.data_quality.options_from_config), rows failing the data-quality
+    checks are left out and the report is in df.attrs["quality"].
+
+    Within a process the same frame is shared by every caller until the file changes,
+    so callers must treat it as read-only. With cache_dir set, the parsed columns are
+    stored on disk and reused while path/size/mtime (or, after a touch, the content hash) match.
+    """
+    key = (os.path.abspath(path), bool(compact), json.dumps(quality, sort_keys=True))
+    st = os.stat(path)
+    with _LOCK:
+        hit = _MEMO.get(key)
+        if hit is not None and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+
+        df = None
+        raw_bytes = None
+        if cache_dir:
+            entry_dir = _cache_dir_for(cache_dir, path)
+            meta = _read_meta(entry_dir)
+            fp = file_fingerprint(path, with_hash=False)
+            if meta is not None and meta.get("quality_options") != quality:
+                meta = None
+            if meta is not None:
+                cached = meta["fingerprint"]
+                same_stat = cached["size"] == fp["size"] and cached["mtime_ns"] == fp["mtime_ns"]
+                if not same_stat and cached["size"] == fp["size"]:
+                    # touched but maybe unchanged: fall back to the content hash
+                    fp["content_hash"] = content_hash(path)
+                    if fp["content_hash"] == cached.get("content_hash"):
+                        meta["fingerprint"] = fp
+                        with open(os.path.join(entry_dir, "meta.json"), "w") as fh:
+                            json.dump(meta, fh)
+                        same_stat = True
+                if same_stat:
+                    try:
+                        df = _read_cache(entry_dir, meta, as_categorical=compact)
+                        raw_bytes = meta.get("raw_bytes")
+                        if meta.get("quality") is not None:
+                            df.attrs["quality"] = meta["quality"]
+                    except Exception:
+                        df = None
+            if df is None:
+                df = parse_csv(path, quality)
+                raw_bytes = frame_bytes(df)
+                fp.setdefault("content_hash", content_hash(path))
+                try:
+                    _write_cache(entry_dir, df, fp, raw_bytes, quality)
+                except Exception as e:
+                    # non-fatal: the run still has the parsed frame
+                    print(f"[dataset] failed to write cache: {e}")
+        else:
+            df = parse_csv(path, quality)
+            if compact:
+                raw_bytes = frame_bytes(df)
+
+        if compact:
+            df = compact_frame(df)
+            compact_bytes = frame_bytes(df)
+            raw_bytes = raw_bytes or compact_bytes
+            df.attrs["memory_report"] = {
+                "raw_mb": round(raw_bytes / 2 ** 20, 2),
+                "compact_mb": round(compact_bytes / 2 ** 20, 2),
+                "saved_mb": round((raw_bytes - compact_bytes) / 2 ** 20, 2),
+                "saved_pct": round(100.0 * (raw_bytes - compact_bytes) / raw_bytes, 1) if raw_bytes else 0.0,
+            }
+
+        _MEMO[key] = (st.st_size, st.st_mtime_ns, df)
+        return df
+
+
+def clear_memo():
+    with _LOCK:
+        _MEMO.clear()
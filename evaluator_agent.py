@@ -1,57 +1,176 @@
 """
 Evaluator Agent:
 Validate hypotheses quantitatively, adjust confidence, and add notes.
+All insights are validated at once as arrays; with evaluator_significance on, window insights
+also get Welch t-tests and bootstrap CIs of the ROAS/CTR change (utils.significance), and the
+p-values shrink confidence toward 0.5.
 """
 
+import os
 from typing import List, Dict, Any
 
+import numpy as np
+
+# confidence shrink (toward 0.5) for directional insights whose change cannot be tested, as if p were 0.5
+UNTESTABLE_SHRINK = 0.5
+UNTESTABLE_NOTE = "significance not testable (insufficient days)"
+
+def _evidence_array(insights, *keys, default=np.nan):
+    # first present (non-None) key per insight, as float
+    out = np.full(len(insights), default, dtype=np.float64)
+    for i, ins in enumerate(insights):
+        ev = ins.get("evidence") or {}
+        for k in keys:
+            if ev.get(k) is not None:
+                out[i] = float(ev[k])
+                break
+    return out
+
 class EvaluatorAgent:
-    def __init__(self, config: Dict[str, Any] = None):
+    def __init__(self, config: Dict[str, Any] = None, data_path: str = None):
         self.config = config or {}
         self.roas_drop_pct = self.config.get("roas_drop_pct", 0.15)
         self.ctr_drop_pct = self.config.get("ctr_drop_pct", 0.10)
         self.min_impressions = self.config.get("min_impressions_for_confidence", 1000)
+        self.data_path = data_path
+        self.n_boot = int(self.config.get("bootstrap_resamples", 1000))
+        self.alpha = float(self.config.get("significance_alpha", 0.05))
+        # incremental runs set this to the checkpointed daily cells (with squares) instead of re-reading rows
+        self.cells = None
 
     def validate(self, insights: List[Dict[str, Any]], data_summary: Dict[str, Any]) -> List[Dict[str, Any]]:
-        validated = []
-        for ins in insights:
-            c = dict(ins)  # shallow copy
-            conf = float(c.get("confidence", 0.5))
-            evidence = c.get("evidence", {})
-
-            # If evidence contains roas_pct_change and ctr_pct_change, use thresholds to adjust confidence
-            roas_pct = evidence.get("roas_pct_change")
-            ctr_pct = evidence.get("ctr_pct_change")
-            imps = evidence.get("impressions_last") or evidence.get("impressions_prev") or evidence.get("sample_impressions") or 0
-
-            # boost confidence if impactful and impressions high
-            if roas_pct is not None and ctr_pct is not None:
-                if roas_pct <= -self.roas_drop_pct and ctr_pct <= -self.ctr_drop_pct and imps >= self.min_impressions:
-                    conf = max(conf, 0.85)
-                    c["validation_notes"] = "Strong numeric support: ROAS and CTR both decreased and impressions are high."
-                elif roas_pct <= -self.roas_drop_pct and imps >= self.min_impressions:
-                    conf = max(conf, 0.7)
-                    c["validation_notes"] = "ROAS decreased meaningfully; investigate creatives and audiences."
-                elif roas_pct >= self.roas_drop_pct:
-                    conf = max(conf, 0.65)
-                    c["validation_notes"] = "ROAS increased — positive signal."
-                else:
-                    # ambiguous evidence -> lower confidence
-                    conf = min(conf, 0.5)
-                    c["validation_notes"] = c.get("validation_notes", "") + " Ambiguous numeric signal."
-            else:
-                # fallback low-ctr sample handling
-                sample_ctr = evidence.get("sample_ctr")
-                sample_imps = evidence.get("sample_impressions", 0)
-                if sample_ctr is not None:
-                    if sample_ctr < 0.02 and sample_imps >= self.min_impressions:
-                        conf = max(conf, 0.8)
-                        c["validation_notes"] = "Low CTR on high impressions sample; creative likely underperforming."
-                    elif sample_ctr < 0.03:
-                        conf = max(conf, 0.65)
-                    else:
-                        conf = min(conf, conf)
-
-            c["confidence"] = round(float(conf), 2)
-            validated.append(c)
+        validated = self.apply_rules(insights)
+        path = self.data_path or self.config.get("data_path")
+        if self.config.get("evaluator_significance") and (self.cells is not None or (path and os.path.exists(path))):
+            try:
+                self.attach_significance(validated, path, cells=self.cells)
+            except Exception as e:
+                # non-fatal: rule-based confidence still stands
+                print(f"[evaluator] significance tests skipped: {e}")
+        return validated
+
+    def apply_rules(self, insights: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Threshold rules on the point estimates, evaluated for every insight at once.
+        """
+        validated = [dict(ins) for ins in insights]  # shallow copies
+        conf = np.array([float(c.get("confidence", 0.5)) for c in validated], dtype=np.float64)
+        roas_pct = _evidence_array(validated, "roas_pct_change")
+        ctr_pct = _evidence_array(validated, "ctr_pct_change")
+        evs = [c.get("evidence") or {} for c in validated]
+        imps = np.array([float(ev.get("impressions_last") or ev.get("impressions_prev") or ev.get("sample_impressions")
+                               or 0) for ev in evs])
+        sample_ctr = _evidence_array(validated, "sample_ctr")
+        sample_imps = np.nan_to_num(_evidence_array(validated, "sample_impressions", default=0.0))
+
+        has_window = ~np.isnan(roas_pct) & ~np.isnan(ctr_pct)
+        roas_down = roas_pct <= -self.roas_drop_pct
+        high = imps >= self.min_impressions
+        # window evidence: boost confidence if impactful and impressions high
+        both = has_window & roas_down & (ctr_pct <= -self.ctr_drop_pct) & high
+        roas_only = has_window & ~both & roas_down & high
+        up = has_window & ~both & ~roas_only & (roas_pct >= self.roas_drop_pct)
+        ambiguous = has_window & ~both & ~roas_only & ~up
+        # fallback low-ctr sample handling
+        has_sample = ~has_window & ~np.isnan(sample_ctr)
+        sample_strong = has_sample & (sample_ctr < 0.02) & (sample_imps >= self.min_impressions)
+        sample_low = has_sample & ~sample_strong & (sample_ctr < 0.03)
+
+        conf = np.select([both, roas_only, up, ambiguous, sample_strong, sample_low],
+                         [np.maximum(conf, 0.85), np.maximum(conf, 0.7), np.maximum(conf, 0.65),
+                          np.minimum(conf, 0.5), np.maximum(conf, 0.8), np.maximum(conf, 0.65)], default=conf)
+        notes = {
+            "both": "Strong numeric support: ROAS and CTR both decreased and impressions are high.",
+            "roas_only": "ROAS decreased meaningfully; investigate creatives and audiences.",
+            "up": "ROAS increased — positive signal.",
+            "sample_strong": "Low CTR on high impressions sample; creative likely underperforming.",
+        }
+        for name, mask in (("both", both), ("roas_only", roas_only), ("up", up), ("sample_strong", sample_strong)):
+            for i in np.flatnonzero(mask):
+                validated[i]["validation_notes"] = notes[name]
+        for i in np.flatnonzero(ambiguous):
+            # ambiguous evidence -> lower confidence
+            validated[i]["validation_notes"] = validated[i].get("validation_notes", "") + " Ambiguous numeric signal."
+        for c, v in zip(validated, conf):
+            c["confidence"] = round(float(v), 2)
+        return validated
+
+    def attach_significance(self, validated: List[Dict[str, Any]], data_path: str = None,
+                            cells=None) -> List[Dict[str, Any]]:
+        """
+        Welch t-test and day-block bootstrap CI of the recent-vs-previous ROAS/CTR change for
+        every window insight (grain + entity), computed per grain for all entities at once.
+        Confidence of directional hypotheses becomes 0.5 + (confidence - 0.5) * (1 - p); when a
+        window has too few days for the test, it is shrunk by UNTESTABLE_SHRINK and noted instead.
+        cells (daily_cells(..., squares=True) covering every grain) replaces reading data_path.
+        """
+        from utils.dataset import load_dataset
+        from utils.data_quality import options_from_config
+        from utils.significance import bootstrap_change_ci, welch
+        from utils.time_index import daily_cells, window_labels
+
+        targets = [i for i, c in enumerate(validated) if c.get("grain") and c.get("entity") is not None
+                   and (c.get("evidence") or {}).get("roas_pct_change") is not None]
+        if not targets:
+            return validated
+        grains = sorted({validated[i]["grain"] for i in targets})
+        if cells is None:
+            df = load_dataset(data_path, cache_dir=self.config.get("dataset_cache_path"),
+                              compact=self.config.get("compact_dtypes", False),
+                              quality=options_from_config(self.config))
+            cells = daily_cells(df, grains, squares=True)
+        today = cells.index.get_level_values("date").max()
+        recent = self.config.get("recent_window_days", 14)
+        prev = self.config.get("previous_window_days", 30)
+        level = 100 * (1 - self.alpha)
+
+        for g in grains:
+            daily = cells.groupby(level=[g, "date"], observed=True).sum()
+            window = window_labels(daily.index.get_level_values("date"), recent, prev, today=today)
+            daily = daily[window >= 0]
+            window = window[window >= 0]
+            names, entity_ids = np.unique(daily.index.get_level_values(g).astype(str), return_inverse=True)
+            n = len(names)
+            sums = {}
+            for col in ("rows", "roas_sum", "roas_sq", "ctr_sum", "ctr_sq"):
+                v = daily[col].to_numpy(dtype=np.float64)
+                sums[col] = [np.bincount(entity_ids[window == w], weights=v[window == w], minlength=n) for w in (0, 1)]
+            cis = bootstrap_change_ci({m: daily[f"{m}_sum"].to_numpy(dtype=np.float64) for m in ("roas", "ctr")},
+                                      daily["rows"].to_numpy(dtype=np.float64), entity_ids, window, n,
+                                      n_boot=self.n_boot, alpha=self.alpha, seed=self.config.get("seed", 42))
+            stats = {}
+            for m in ("roas", "ctr"):
+                t = welch(sums[f"{m}_sum"][0], sums[f"{m}_sq"][0], sums["rows"][0],
+                          sums[f"{m}_sum"][1], sums[f"{m}_sq"][1], sums["rows"][1])
+                stats[m] = (t["p"],) + cis[m]
+
+            pos = {e: k for k, e in enumerate(names.tolist())}
+            for i in targets:
+                c = validated[i]
+                k = pos.get(str(c["entity"])) if c["grain"] == g else None
+                if k is None:
+                    continue
+                ev = dict(c.get("evidence") or {})
+                for m in ("roas", "ctr"):
+                    p, lo, hi = (float(a[k]) for a in stats[m])
+                    ev[f"{m}_p_value"] = None if np.isnan(p) else round(p, 6)
+                    ev[f"{m}_change_ci"] = None if np.isnan(lo) else [round(lo, 4), round(hi, 4)]
+                c["evidence"] = ev
+                # only the changes the hypothesis asserts count: ROAS always, CTR when it says CTR fell
+                asserted = ["roas"] + (["ctr"] if "CTR down" in str(c.get("hypothesis")) else [])
+                ps = [ev[f"{m}_p_value"] for m in asserted]
+                if any(p is None for p in ps):
+                    if c.get("confidence", 0) > 0.5:
+                        c["confidence"] = round(0.5 + (c["confidence"] - 0.5) * (1 - UNTESTABLE_SHRINK), 2)
+                    c["validation_notes"] = (c.get("validation_notes", "") or "") + " | " + UNTESTABLE_NOTE
+                    continue
+                if c.get("confidence", 0) <= 0.5:
+                    continue
+                p = max(ps)
+                c["confidence"] = round(0.5 + (c["confidence"] - 0.5) * (1 - p), 2)
+                ci = ev["roas_change_ci"]
+                note = f"Welch p={p:.3g}" + (f", {level:.0f}% CI of ROAS change [{ci[0]:+.1%}, {ci[1]:+.1%}]" if ci else "")
+                if p >= self.alpha:
+                    note += " (not significant)"
+                c["validation_notes"] = (c.get("validation_notes", "") or "") + " | " + note
         return validated
@@ -0,0 +1,169 @@
+"""
+Incremental aggregate checkpoint:
+Per-entity x per-day aggregates (time_index.daily_cells over every configured grain, with sums
+of squares) plus a watermark: the byte offset read up to and the last processed date.
+
+Each run reads only the bytes appended since the last run. Appended rows dated on or after the
+watermark are added to their cells (rows for the watermark day continue it); rows dated before
+it are restatements: each (grain keys x day) cell they cover replaces the stored cell, and every
+other cell of that day is kept, so a late row for one entity touches only that entity. The source is treated as append-only: if it shrank, or
+the bytes before the offset changed, or the grains changed, the checkpoint is rebuilt from
+the full file.
+
+Layout:
+    <checkpoint_dir>/meta.json
+    <checkpoint_dir>/cells.npz    one array per index level (plus a missing-key mask per grain) and measure
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset import apply_schema, load_dataset
+from utils.data_quality import quarantine_file, validate, write_quarantine
+from utils.time_index import daily_cells, merge_cells
+
+CHECKPOINT_VERSION = 2
+_BOUNDARY = 4096
+
+
+def _bytes_hash(path: str, start: int, stop: int) -> str:
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        return hashlib.blake2b(fh.read(max(0, stop - start)), digest_size=16).hexdigest()
+
+
+class AggregateCheckpoint:
+    def __init__(self, path: str, grains: List[str]):
+        self.path = path
+        self.grains = list(grains)
+        self.cells: Optional[pd.DataFrame] = None
+        self.meta: Dict[str, Any] = {}
+
+    @property
+    def watermark(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self.meta["watermark"]) if self.meta.get("watermark") else None
+
+    def load(self) -> bool:
+        try:
+            with open(os.path.join(self.path, "meta.json"), "r") as fh:
+                meta = json.load(fh)
+            if meta.get("version") != CHECKPOINT_VERSION or meta.get("grains") != self.grains:
+                return False
+            with np.load(os.path.join(self.path, "cells.npz"), allow_pickle=False) as z:
+                # grain keys are strings, with missing keys restored from their mask
+                index = pd.MultiIndex.from_arrays(
+                    [pd.Index(z[f"level_{n}"].astype(object)).where(~z[f"missing_{n}"]) if n != "date"
+                     else z[f"level_{n}"] for n in self.grains + ["date"]], names=self.grains + ["date"])
+                self.cells = pd.DataFrame({m: z[f"m_{m}"] for m in meta["measures"]}, index=index)
+        except Exception:
+            return False
+        self.meta = meta
+        return True
+
+    def save(self):
+        tmp = self.path + f".tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        arrays = {f"level_{n}": (self.cells.index.get_level_values(n).to_numpy(dtype=str) if n != "date"
+                                 else self.cells.index.get_level_values(n).to_numpy())
+                  for n in self.grains + ["date"]}
+        arrays.update({f"missing_{n}": self.cells.index.get_level_values(n).isna() for n in self.grains})
+        arrays.update({f"m_{m}": self.cells[m].to_numpy() for m in self.cells.columns})
+        np.savez(os.path.join(tmp, "cells.npz"), **arrays)
+        self.meta.update({"version": CHECKPOINT_VERSION, "grains": self.grains, "measures": list(self.cells.columns)})
+        with open(os.path.join(tmp, "meta.json"), "w") as fh:
+            json.dump(self.meta, fh, indent=2)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(tmp, self.path)
+
+    def _can_resume(self, data_path: str) -> bool:
+        m = self.meta
+        if not m or os.path.abspath(data_path) != m.get("source"):
+            return False
+        size, offset = os.path.getsize(data_path), m["offset"]
+        if size < offset:
+            return False
+        # the header and the bytes just before the offset must be unchanged
+        return (_bytes_hash(data_path, 0, m["header_bytes"]) == m["header_hash"]
+                and _bytes_hash(data_path, max(0, offset - _BOUNDARY), offset) == m["boundary_hash"])
+
+    def _mark(self, data_path: str, offset: int, header_bytes: int, columns: List[str]):
+        dates = self.cells.index.get_level_values("date")
+        self.meta.update({
+            "source": os.path.abspath(data_path), "offset": int(offset), "columns": columns,
+            "header_bytes": int(header_bytes), "header_hash": _bytes_hash(data_path, 0, header_bytes),
+            "boundary_hash": _bytes_hash(data_path, max(0, offset - _BOUNDARY), offset),
+            "watermark": str(dates.max().date()) if len(dates) else None,
+        })
+
+    def rebuild(self, data_path: str, cache_dir: Optional[str] = None,
+                quality: Optional[Dict[str, Any]] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        df = load_dataset(data_path, cache_dir=cache_dir, quality=quality)
+        with open(data_path, "rb") as fh:
+            header_bytes = len(fh.readline())
+        # the full read consumed every byte, including a last line without a newline
+        offset = os.path.getsize(data_path)
+        self.cells = merge_cells(None, daily_cells(df, self.grains, squares=True))
+        self.meta = {}
+        self._mark(data_path, offset, header_bytes, [str(c) for c in pd.read_csv(data_path, nrows=0).columns])
+        return df, {"mode": "full", "rows_read": int(len(df)), "bytes_read": int(os.path.getsize(data_path)),
+                    "new_days": int(self.cells.index.get_level_values("date").nunique()), "restated_days": 0}
+
+    def _validate_tail(self, raw: pd.DataFrame, data_path: str, quality: Dict[str, Any]) -> pd.DataFrame:
+        clean, quarantined, report = validate(raw, **quality)
+        if quality.get("quarantine_path") and len(quarantined):
+            path = quarantine_file(quality["quarantine_path"], data_path)
+            try:
+                write_quarantine(path, quarantined, append=True)
+                report["quarantine_path"] = path
+            except Exception as e:
+                # non-fatal: the report still counts the quarantined rows
+                print(f"[incremental] failed to write {path}: {e}")
+        clean.attrs["quality"] = report
+        return clean
+
+    def ingest(self, data_path: str, cache_dir: Optional[str] = None,
+               quality: Optional[Dict[str, Any]] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Brings the checkpoint up to date with data_path and saves it.
+        Returns the newly read rows (schema applied) and ingest stats.
+        With quality (utils.data_quality options), appended rows failing the checks are left out of
+        the cells and appended to the quarantine; duplicates are only detected within the appended rows.
+        """
+        if not (self.cells is not None or self.load()) or not self._can_resume(data_path):
+            tail, stats = self.rebuild(data_path, cache_dir, quality)
+            self.save()
+            return tail, stats
+
+        offset = self.meta["offset"]
+        with open(data_path, "rb") as fh:
+            fh.seek(offset)
+            data = fh.read()
+        # a line still being written is left for the next run
+        data = data[:data.rfind(b"\n") + 1]
+        raw = (pd.read_csv(io.BytesIO(data), header=None, names=self.meta["columns"], low_memory=False)
+               if data.strip() else pd.DataFrame(columns=self.meta["columns"]))
+        tail = apply_schema(raw) if quality is None else self._validate_tail(raw, data_path, quality)
+        watermark = self.watermark
+        # string keys, like the stored cells, so restated cells match them
+        new = merge_cells(None, daily_cells(tail, self.grains, squares=True))
+        days = pd.DatetimeIndex(new.index.get_level_values("date"))
+        # rows for the watermark day itself continue that day (intraday appends) and are added;
+        # rows for earlier days restate just the cells they cover
+        restated_cells = new.index[days < watermark] if watermark is not None else new.index[:0]
+        restated = restated_cells.get_level_values("date").unique()
+        if len(restated_cells):
+            self.cells = self.cells[~self.cells.index.isin(restated_cells)]
+        self.cells = merge_cells(self.cells, new)
+        self._mark(data_path, offset + len(data), self.meta["header_bytes"], self.meta["columns"])
+        self.save()
+        return tail, {"mode": "tail", "rows_read": int(len(tail)), "bytes_read": int(len(data)),
+                      "new_days": int(pd.Index(days[days > watermark] if watermark is not None else days).nunique()),
+                      "restated_days": int(len(restated)), "restated_cells": int(len(restated_cells))}
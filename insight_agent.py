@@ -5,108 +5,271 @@ Generate hypotheses explaining ROAS/CTR patterns by comparing recent vs previous
 
 import pandas as pd
 import numpy as np
-from datetime import timedelta
 import os
 from typing import Dict, Any, List
 
+from itertools import product
+
+from utils.dataset import load_dataset
+from utils.data_quality import options_from_config
+from utils.time_index import TimeIndex, window_labels
+from utils.memory_store import MemoryStore
+from utils.anomaly import scan as scan_anomalies
+
+# dimensions a window comparison can be run at; "campaign" is the historical default
+GRAINS = ['campaign_name', 'adset_name', 'creative_type', 'audience_type', 'platform', 'country']
+
+NO_CHANGE = ("No clear change", 0.4, "")
+HYPOTHESES = [
+    ("Creative underperformance leading to ROAS drop (CTR down)", 0.75, "ROAS down > threshold and CTR down > threshold"),
+    ("Audience fatigue or targeting drift (spend up or conversions down)", 0.6, "ROAS down > threshold but CTR stable"),
+    ("ROAS improved — optimization or positive creative change", 0.7, "ROAS up > threshold"),
+]
+
+# (detector, direction) -> hypothesis and base confidence for dated anomaly events (utils.anomaly)
+ANOMALY_HYPOTHESES = {
+    ("changepoint", -1): ("{metric} level shift down (changepoint)", 0.6),
+    ("changepoint", 1): ("{metric} level shift up (changepoint)", 0.55),
+    ("ewma", -1): ("{metric} dip vs EWMA baseline", 0.5),
+    ("ewma", 1): ("{metric} spike vs EWMA baseline", 0.45),
+}
+
 class InsightAgent:
-    def __init__(self, config: Dict[str, Any], memory_path: str = None):
+    def __init__(self, config: Dict[str, Any], memory_path: str = None, data_path: str = None):
         self.config = config or {}
         self.recent_days = self.config.get("recent_window_days", 14)
         self.prev_days = self.config.get("previous_window_days", 30)
         self.roas_drop_pct = self.config.get("roas_drop_pct", 0.15)
         self.ctr_drop_pct = self.config.get("ctr_drop_pct", 0.10)
+        self.grains = [g for g in self.config.get("insight_grains", ["campaign_name"]) if g in GRAINS]
         self.memory_path = memory_path
+        self.data_path = data_path
+        # incremental runs set this to the checkpointed daily cells (utils.incremental) instead of re-reading rows
+        self.cells = None
+        # in-memory runs set this to the dataset's OLAP cube (utils.cube); windows are rolled up from it
+        self.cube = None
 
     def read_full_df(self, data_path):
-        try:
-            df = pd.read_csv(data_path, parse_dates=["date"])
-        except Exception:
-            df = pd.read_csv(data_path, low_memory=False)
-            if 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        for c in ['spend','impressions','clicks','ctr','purchases','revenue','roas']:
-            if c in df.columns:
-                df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
-        return df
+        # shared with DataAgent via the dataset layer: parsed once per run, read-only
+        return load_dataset(data_path, cache_dir=self.config.get("dataset_cache_path"),
+                            compact=self.config.get("compact_dtypes", False),
+                            quality=options_from_config(self.config))
 
-    def generate_insights(self, data_summary: Dict[str, Any], plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def window_labels(self, dates: pd.Series) -> np.ndarray:
         """
-        Uses data_summary for quick checks, but reads the full CSV if necessary for time windows.
+        0 = previous window, 1 = recent window, -1 = outside both (anchored at the latest date).
         """
-        # Determine path from config
-        data_path = self.config.get("data_path") or self.config.get("sample_data_path")
-        if os.path.exists(data_path):
-            df = self.read_full_df(data_path)
-        else:
-            # fallback to summary only
-            df = None
+        return window_labels(dates, self.recent_days, self.prev_days)
 
-        insights = []
-        # If we have df, compute campaign-level time-window comparisons
-        if df is not None and 'date' in df.columns:
-            today = df['date'].max()
-            recent_cut = today - pd.Timedelta(days=self.recent_days)
-            prev_cut = recent_cut - pd.Timedelta(days=self.prev_days)
-
-            for camp, g in df.groupby('campaign_name'):
-                g = g.sort_values('date')
-                last = g[g['date'] > recent_cut]
-                prev = g[(g['date'] <= recent_cut) & (g['date'] > prev_cut)]
-                if len(last) < 1 or len(prev) < 1:
-                    continue
-                roas_last = last['roas'].mean()
-                roas_prev = prev['roas'].mean()
-                ctr_last = last['ctr'].mean()
-                ctr_prev = prev['ctr'].mean()
-                spend_last = float(last['spend'].sum())
-                spend_prev = float(prev['spend'].sum())
-                imps_last = int(last['impressions'].sum())
-                imps_prev = int(prev['impressions'].sum())
-
-                roas_change = (roas_last - roas_prev) / (abs(roas_prev) + 1e-9)
-                ctr_change = (ctr_last - ctr_prev) / (abs(ctr_prev) + 1e-9)
+    def classify(self, roas_prev, roas_last, ctr_prev, ctr_last, roas_drop_pct=None, ctr_drop_pct=None) -> np.ndarray:
+        """
+        Vectorized hypothesis rule: index into HYPOTHESES, or -1 for NO_CHANGE.
+        """
+        r = self.roas_drop_pct if roas_drop_pct is None else roas_drop_pct
+        c = self.ctr_drop_pct if ctr_drop_pct is None else ctr_drop_pct
+        roas_down = (roas_prev > 0) & (roas_last < roas_prev * (1 - r))
+        ctr_down = (ctr_prev > 0) & (ctr_last < ctr_prev * (1 - c))
+        roas_up = roas_last > roas_prev * (1 + r)
+        return np.select([roas_down & ctr_down, roas_down, roas_up], [0, 1, 2], default=-1)
 
-                evidence = {
-                    "roas_prev": float(round(roas_prev, 4)),
-                    "roas_last": float(round(roas_last, 4)),
-                    "roas_pct_change": float(round(roas_change, 4)),
-                    "ctr_prev": float(round(ctr_prev, 4)),
-                    "ctr_last": float(round(ctr_last, 4)),
-                    "ctr_pct_change": float(round(ctr_change, 4)),
-                    "spend_prev": round(spend_prev, 2),
-                    "spend_last": round(spend_last, 2),
-                    "impressions_prev": imps_prev,
-                    "impressions_last": imps_last
-                }
+    def window_frame(self, df: pd.DataFrame, grains: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        Recent-vs-previous aggregates for every grain from one grouped pass over the rows.
+        Rows are grouped once into (all grains x window) cells; each grain is a roll-up of those cells.
+        Returns {grain: frame indexed by entity with <measure>_prev / <measure>_last columns}.
+        """
+        window = self.window_labels(df['date'])
+        in_window = window >= 0
+        rows = df.loc[in_window, grains + ['spend', 'impressions', 'ctr', 'roas']]
+        # compact float32 ratios are summed in float64
+        rows = rows.assign(ctr=rows['ctr'].astype(np.float64, copy=False), roas=rows['roas'].astype(np.float64, copy=False))
+        keys = [rows[g] for g in grains] + [pd.Series(window[in_window], index=rows.index, name="window")]
+        cells = (rows.groupby(keys, dropna=False, sort=False, observed=True)
+                 .agg(spend=("spend", "sum"), impressions=("impressions", "sum"),
+                      ctr_sum=("ctr", "sum"), roas_sum=("roas", "sum"), n=("roas", "size")))
+        out = {}
+        for g in grains:
+            # rows missing this grain's key still count towards the other grains, but form no entity here
+            agg = cells.groupby(level=[g, "window"], observed=True, dropna=True).sum().unstack("window")
+            if 0 not in agg.columns.get_level_values("window") or 1 not in agg.columns.get_level_values("window"):
+                out[g] = pd.DataFrame()
+                continue
+            agg = agg.fillna(0)
+            frame = pd.DataFrame(index=agg.index)
+            for w, suffix in ((0, "prev"), (1, "last")):
+                n = agg[("n", w)]
+                frame[f"n_{suffix}"] = n
+                frame[f"roas_{suffix}"] = agg[("roas_sum", w)] / n.where(n > 0)
+                frame[f"ctr_{suffix}"] = agg[("ctr_sum", w)] / n.where(n > 0)
+                frame[f"spend_{suffix}"] = agg[("spend", w)]
+                frame[f"impressions_{suffix}"] = agg[("impressions", w)]
+            out[g] = frame[(frame["n_prev"] > 0) & (frame["n_last"] > 0)]
+        return out
+
+    def window_insights(self, df: pd.DataFrame, grains: List[str]) -> List[Dict[str, Any]]:
+        return self.insights_from_frames(self.window_frame(df, grains))
+
+    def time_indexes(self, grains: List[str]) -> Dict[str, TimeIndex]:
+        """
+        Prefix-sum index per grain from the stored daily cells, ending at their latest day.
+        """
+        dates = self.cells.index.get_level_values("date")
+        return TimeIndex.from_cells(self.cells, grains, dates.min(), dates.max())
 
-                hypothesis = "No clear change"
-                confidence = 0.4
-                notes = ""
-
-                # Detect meaningful ROAS drop
-                if (roas_prev > 0) and (roas_last < roas_prev * (1 - self.roas_drop_pct)):
-                    # check ctr drop
-                    if (ctr_prev > 0) and (ctr_last < ctr_prev * (1 - self.ctr_drop_pct)):
-                        hypothesis = "Creative underperformance leading to ROAS drop (CTR down)"
-                        confidence = 0.75
-                        notes = "ROAS down > threshold and CTR down > threshold"
-                    else:
-                        hypothesis = "Audience fatigue or targeting drift (spend up or conversions down)"
-                        confidence = 0.6
-                        notes = "ROAS down > threshold but CTR stable"
-                elif roas_last > roas_prev * (1 + self.roas_drop_pct):
-                    hypothesis = "ROAS improved — optimization or positive creative change"
-                    confidence = 0.7
-                    notes = "ROAS up > threshold"
+    def cube_indexes(self, grains: List[str]) -> Dict[str, TimeIndex]:
+        """
+        Prefix-sum index per grain from (grain x day) roll-ups of the cube, over its full date range.
+        """
+        start, end = self.cube.date_range
+        return {g: TimeIndex.from_daily(self.cube.rollup([g, "date"], ratios=()), start, end) for g in grains}
 
+    def insights_from_frames(self, frames: Dict[str, pd.DataFrame]) -> List[Dict[str, Any]]:
+        insights = []
+        for g, frame in frames.items():
+            if frame.empty:
+                continue
+            roas_prev, roas_last = frame["roas_prev"].to_numpy(), frame["roas_last"].to_numpy()
+            ctr_prev, ctr_last = frame["ctr_prev"].to_numpy(), frame["ctr_last"].to_numpy()
+            roas_change = (roas_last - roas_prev) / (np.abs(roas_prev) + 1e-9)
+            ctr_change = (ctr_last - ctr_prev) / (np.abs(ctr_prev) + 1e-9)
+            labels = self.classify(roas_prev, roas_last, ctr_prev, ctr_last)
+            spend_prev, spend_last = frame["spend_prev"].to_numpy(), frame["spend_last"].to_numpy()
+            imps_prev, imps_last = frame["impressions_prev"].to_numpy(), frame["impressions_last"].to_numpy()
+            for i, entity in enumerate(frame.index):
+                hypothesis, confidence, notes = HYPOTHESES[labels[i]] if labels[i] >= 0 else NO_CHANGE
+                evidence = {
+                    "roas_prev": float(round(roas_prev[i], 4)),
+                    "roas_last": float(round(roas_last[i], 4)),
+                    "roas_pct_change": float(round(roas_change[i], 4)),
+                    "ctr_prev": float(round(ctr_prev[i], 4)),
+                    "ctr_last": float(round(ctr_last[i], 4)),
+                    "ctr_pct_change": float(round(ctr_change[i], 4)),
+                    "spend_prev": round(float(spend_prev[i]), 2),
+                    "spend_last": round(float(spend_last[i]), 2),
+                    "impressions_prev": int(imps_prev[i]),
+                    "impressions_last": int(imps_last[i])
+                }
                 insights.append({
-                    "campaign": str(camp),
+                    "campaign": str(entity) if g == "campaign_name" else f"{g}={entity}",
+                    "grain": g,
+                    "entity": str(entity),
                     "hypothesis": hypothesis,
                     "evidence": evidence,
                     "confidence": round(confidence, 2),
                     "validation_notes": notes
                 })
+        return insights
+
+    def anomaly_insights(self, indexes: Dict[str, TimeIndex]) -> List[Dict[str, Any]]:
+        """
+        Dated anomaly / changepoint hypotheses over every day of every entity's series, strongest
+        first, at most anomaly_max_events. Confidence grows with |t| or |z| beyond its threshold, by
+        at most 0.25 over the hypothesis' base.
+        """
+        min_t = float(self.config.get("changepoint_min_t", 4.0))
+        z_threshold = float(self.config.get("anomaly_z", 3.0))
+        out = []
+        for g, index in indexes.items():
+            for ev in scan_anomalies(index, self.config):
+                stat, threshold = (ev["t_stat"], min_t) if ev["detector"] == "changepoint" else (ev["z"], z_threshold)
+                hypothesis, base = ANOMALY_HYPOTHESES[(ev["detector"], 1 if stat > 0 else -1)]
+                entity = ev["entity"]
+                evidence = {k: (round(v, 4) if isinstance(v, float) else v) for k, v in ev.items() if k != "entity"}
+                out.append({
+                    "campaign": str(entity) if g == "campaign_name" else f"{g}={entity}",
+                    "grain": g,
+                    "entity": str(entity),
+                    "date": ev["date"],
+                    "hypothesis": hypothesis.format(metric=ev["metric"].upper()),
+                    "evidence": evidence,
+                    "confidence": round(base + min(0.25, 0.05 * (abs(stat) / threshold - 1)), 2),
+                    "validation_notes": f"{ev['detector']} on daily {ev['metric'].upper()}"
+                })
+        out.sort(key=lambda ins: -ins["confidence"])
+        return out[:int(self.config.get("anomaly_max_events", 200))]
+
+    def sweep(self, df: pd.DataFrame = None, grid: Dict[str, List[Any]] = None, grains: List[str] = None) -> Dict[str, Any]:
+        """
+        Evaluate every combination of window lengths and thresholds from one prefix-sum index.
+        Reports hypothesis counts per setting and the entities whose hypothesis differs from the
+        configured baseline. Without df, the index comes from self.cells.
+        """
+        grid = grid or self.config.get("sweep_grid") or {}
+        recent = grid.get("recent_window_days") or [self.recent_days]
+        prev = grid.get("previous_window_days") or [self.prev_days]
+        roas_pcts = grid.get("roas_drop_pct") or [self.roas_drop_pct]
+        ctr_pcts = grid.get("ctr_drop_pct") or [self.ctr_drop_pct]
+        max_changes = int(self.config.get("sweep_max_changes", 50))
+        names = [h[0] for h in HYPOTHESES] + [NO_CHANGE[0]]
+
+        grains = grains or self.grains
+        indexes = TimeIndex.build(df, grains) if df is not None else self.time_indexes(grains)
+        results = []
+        for g, index in indexes.items():
+            base_frame = index.window_frame(self.recent_days, self.prev_days)
+            base = pd.Series(self.classify(base_frame["roas_prev"].to_numpy(), base_frame["roas_last"].to_numpy(),
+                                           base_frame["ctr_prev"].to_numpy(), base_frame["ctr_last"].to_numpy()),
+                             index=base_frame.index)
+            for r_days, p_days in product(recent, prev):
+                frame = index.window_frame(int(r_days), int(p_days))
+                roas_prev, roas_last = frame["roas_prev"].to_numpy(), frame["roas_last"].to_numpy()
+                ctr_prev, ctr_last = frame["ctr_prev"].to_numpy(), frame["ctr_last"].to_numpy()
+                for r_pct, c_pct in product(roas_pcts, ctr_pcts):
+                    labels = pd.Series(self.classify(roas_prev, roas_last, ctr_prev, ctr_last, r_pct, c_pct),
+                                       index=frame.index)
+                    common = labels.index.intersection(base.index)
+                    diff = common[(labels[common] != base[common]).to_numpy()]
+                    counts = np.bincount(labels.to_numpy() % len(names), minlength=len(names))
+                    results.append({
+                        "grain": g,
+                        "params": {"recent_window_days": int(r_days), "previous_window_days": int(p_days),
+                                   "roas_drop_pct": float(r_pct), "ctr_drop_pct": float(c_pct)},
+                        "n_entities": int(len(labels)),
+                        "counts": {n: int(c) for n, c in zip(names, counts)},
+                        "n_changed_vs_baseline": int(len(diff)),
+                        "changed": [{"entity": str(e), "baseline": names[base[e]], "hypothesis": names[labels[e]]}
+                                    for e in diff[:max_changes]]
+                    })
+        return {
+            "baseline": {"recent_window_days": self.recent_days, "previous_window_days": self.prev_days,
+                         "roas_drop_pct": self.roas_drop_pct, "ctr_drop_pct": self.ctr_drop_pct},
+            "results": results
+        }
+
+    def generate_insights(self, data_summary: Dict[str, Any], plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self.apply_memory(self.base_insights(data_summary))
+
+    def base_insights(self, data_summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Uses data_summary for quick checks, but reads the full CSV if necessary for time windows
+        (or rolls the windows up from self.cells in incremental runs, and from self.cube when it
+        covers the grains). A function of the data and config only; memory is applied separately.
+        """
+        # Determine path: the file the run is using, else from config
+        data_path = self.data_path or self.config.get("data_path") or self.config.get("sample_data_path")
+        use_cube = self.cube is not None and len(self.cube) > 0 and all(g in self.cube.dims for g in self.grains)
+        if self.cells is not None or use_cube:
+            df = None
+        elif data_path and os.path.exists(data_path):
+            df = self.read_full_df(data_path)
+        else:
+            # fallback to summary only
+            df = None
+
+        insights = []
+        indexes = None
+        # If we have df, compute window comparisons for every configured grain
+        if self.cells is not None:
+            indexes = self.time_indexes(self.grains)
+        elif use_cube:
+            indexes = self.cube_indexes(self.grains)
+        if indexes is not None:
+            insights = self.insights_from_frames({g: index.window_frame(self.recent_days, self.prev_days)
+                                                  for g, index in indexes.items()})
+        elif df is not None and 'date' in df.columns:
+            insights = self.window_insights(df, self.grains)
+            if self.config.get("anomaly_detection", False):
+                indexes = TimeIndex.build(df, self.grains)
         else:
             # Fallback: produce hypotheses from summary low_ctr_ads
             for row in data_summary.get("low_ctr_ads", [])[:10]:
@@ -122,20 +285,24 @@ class InsightAgent:
                     "confidence": 0.55,
                     "validation_notes": "Derived from low-CTR sample in summary"
                 })
-        # consult memory: nudge confidence for persistent insights
-        if self.memory_path and os.path.exists(self.memory_path):
+        if indexes is not None and self.config.get("anomaly_detection", False):
+            insights += self.anomaly_insights(indexes)
+        return insights
+
+    def apply_memory(self, insights: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # consult memory: nudge confidence for persistent insights, weighted by recency
+        # the legacy JSON memory is imported when the store is first opened
+        legacy = self.config.get("legacy_memory_path")
+        if self.memory_path and (os.path.exists(self.memory_path) or (legacy and os.path.exists(legacy))):
             try:
-                import json
-                with open(self.memory_path, "r") as fh:
-                    mem = json.load(fh)
+                with MemoryStore.from_config(self.memory_path, self.config) as store:
+                    mem = store.lookup_many((ins.get("campaign"), ins.get("hypothesis")) for ins in insights)
             except Exception:
-                mem = []
-            # build lookup of (campaign,hypothesis)
-            mem_keys = {(m.get("campaign"), m.get("hypothesis")): m for m in mem}
+                mem = {}
             for ins in insights:
-                key = (ins.get("campaign"), ins.get("hypothesis"))
-                if key in mem_keys:
-                    # persistent issue -> slightly increase confidence
-                    ins["confidence"] = round(min(0.99, ins.get("confidence", 0.4) + 0.05), 2)
+                rec = mem.get((str(ins.get("campaign")), str(ins.get("hypothesis"))))
+                if rec is not None:
+                    # persistent issue -> slightly increase confidence (less if last seen long ago)
+                    ins["confidence"] = round(min(0.99, ins.get("confidence", 0.4) + 0.05 * rec["weight"]), 2)
                     ins["validation_notes"] = (ins.get("validation_notes", "") or "") + " | persisted across runs in memory"
         return insights
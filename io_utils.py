@@ -1,15 +1,219 @@
 """
 Small IO helpers.
+
+Every artifact is written to a per-process temp file (<path>.tmp-<pid>-<n>) and renamed into
+place when complete, so readers never see a half-written file and concurrent writers of the same
+path do not clobber each other (the last rename wins). RecordWriter streams records as they are produced:
+    json     one array, same layout as json.dump(records, indent=2)
+    jsonl    one record per line, flushed every batch_rows records; while it is written,
+             <path>.partial is a symlink to the temp file, so `tail -F <path>.partial` follows it
+    parquet  one row group per batch_rows records (needs pyarrow); nested values are JSON strings.
+             Columns are the declared `columns`, else every key of the first row group; keys
+             outside them are kept as a JSON object in the _extra column. Types come from the
+             first row group; a column with no value there is stored as JSON text
 """
 
 import json
 import os
+import itertools
+import textwrap
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: parquet artifacts are skipped without it
+    pa = pq = None
+
+FORMATS = ["json", "jsonl", "parquet"]
+# temp-file suffixes, unique per writer within the process
+_SEQ = itertools.count()
+EXTRA_COLUMN = "_extra"
+
+
+def _link_partial(path: str, tmp: str):
+    # <path>.partial -> this writer's temp file (best effort; the newest writer owns the link)
+    link = f"{path}.partial"
+    try:
+        os.symlink(os.path.basename(tmp), f"{tmp}.link")
+        os.replace(f"{tmp}.link", link)
+    except OSError:
+        pass
+
+
+def _unlink_partial(path: str, tmp: str):
+    link = f"{path}.partial"
+    try:
+        if os.readlink(link) == os.path.basename(tmp):
+            os.remove(link)
+    except OSError:
+        pass
+
+
+@contextmanager
+def atomic_open(path, mode="w", tail_link: bool = False):
+    """
+    open() on a per-process temp file next to path, renamed to path on success and removed on
+    error. With tail_link, <path>.partial points at the temp file while it is written.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}-{next(_SEQ)}"
+    fh = open(tmp, mode)
+    if tail_link:
+        _link_partial(path, tmp)
+    try:
+        yield fh
+        fh.close()
+        os.replace(tmp, path)
+    except BaseException:
+        fh.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        if tail_link:
+            _unlink_partial(path, tmp)
+
 
 def write_json(path, obj):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w") as fh:
+    with atomic_open(path) as fh:
         json.dump(obj, fh, indent=2)
 
+
 def read_json(path):
     with open(path, "r") as fh:
         return json.load(fh)
+
+
+def read_jsonl(path):
+    with open(path, "r") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def write_lines(path, lines: Iterable[str]):
+    """
+    Writes lines (without newlines) as they are generated, atomically.
+    """
+    with atomic_open(path) as fh:
+        first = True
+        for line in lines:
+            fh.write(line if first else "\n" + line)
+            first = False
+
+
+class RecordWriter:
+    """
+    Streams JSON-serializable records to path in one format; use as a context manager
+    (the file appears at path only once the block completes).
+    """
+
+    def __init__(self, path: str, fmt: str = "json", batch_rows: int = 1000, columns: Optional[List[str]] = None):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown artifact format {fmt!r} (expected one of {FORMATS})")
+        if fmt == "parquet" and pq is None:
+            raise RuntimeError("parquet artifacts need pyarrow")
+        self.path, self.fmt, self.batch_rows = path, fmt, max(1, int(batch_rows))
+        self.columns = list(columns) if columns else None
+        self.count = 0
+        self._batch: List[Dict[str, Any]] = []
+        self._parquet = None
+        self._schema = None
+        self._ctx = atomic_open(path, "wb" if fmt == "parquet" else "w", tail_link=fmt == "jsonl")
+        self._fh = self._ctx.__enter__()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            self._abort(*exc)
+        return False
+
+    def write(self, record: Dict[str, Any]):
+        if self.fmt == "json":
+            body = textwrap.indent(json.dumps(record, indent=2), "  ")
+            self._fh.write(("[\n" if self.count == 0 else ",\n") + body)
+        elif self.fmt == "jsonl":
+            self._fh.write(json.dumps(record) + "\n")
+            if (self.count + 1) % self.batch_rows == 0:
+                self._fh.flush()
+        else:
+            self._batch.append({k: json.dumps(v) if isinstance(v, (dict, list)) else v for k, v in record.items()})
+            if len(self._batch) >= self.batch_rows:
+                self._flush_parquet()
+        self.count += 1
+
+    def write_many(self, records: Iterable[Dict[str, Any]]) -> "RecordWriter":
+        for record in records:
+            self.write(record)
+        return self
+
+    def _flush_parquet(self):
+        if not self._batch:
+            return
+        if self._schema is None:
+            # the first row group fixes the schema: declared columns, else the union of its keys
+            names = self.columns or list(dict.fromkeys(k for r in self._batch for k in r))
+            inferred = pa.Table.from_pydict({k: [r.get(k) for r in self._batch] for k in names}).schema
+            fields = [pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in inferred]
+            self._schema = pa.schema(fields + [pa.field(EXTRA_COLUMN, pa.string())])
+            self._parquet = pq.ParquetWriter(self._fh, self._schema)
+        names = self._schema.names[:-1]
+        known = set(names)
+        data = {}
+        for f in self._schema:
+            if f.name == EXTRA_COLUMN:
+                extra = [{k: v for k, v in r.items() if k not in known} for r in self._batch]
+                data[f.name] = [json.dumps(e) if e else None for e in extra]
+            elif pa.types.is_string(f.type):
+                data[f.name] = [v if v is None or isinstance(v, str) else json.dumps(v)
+                                for v in (r.get(f.name) for r in self._batch)]
+            else:
+                data[f.name] = [r.get(f.name) for r in self._batch]
+        self._parquet.write_table(pa.Table.from_pydict(data, schema=self._schema))
+        self._batch = []
+
+    def close(self):
+        if self.fmt == "json":
+            self._fh.write("[]" if self.count == 0 else "\n]")
+        elif self.fmt == "parquet":
+            self._flush_parquet()
+            if self._parquet is not None:
+                self._parquet.close()
+        self._ctx.__exit__(None, None, None)
+
+    def _abort(self, *exc):
+        try:
+            self._ctx.__exit__(*exc)
+        except BaseException:
+            pass
+
+
+def write_records(path_stem: str, records: Iterable[Dict[str, Any]], formats: Optional[List[str]] = None,
+                  batch_rows: int = 1000, columns: Optional[List[str]] = None) -> Dict[str, str]:
+    """
+    Writes records to <path_stem>.<fmt> for each format in one pass over records.
+    Returns {fmt: path}; parquet is skipped (with a note) when pyarrow is missing.
+    columns: the parquet columns, when known up front (see RecordWriter).
+    """
+    formats = list(dict.fromkeys(formats or ["json"]))
+    writers = {}
+    try:
+        for fmt in formats:
+            if fmt == "parquet" and pq is None:
+                print(f"[io_utils] pyarrow not installed; skipping {path_stem}.parquet")
+                continue
+            writers[fmt] = RecordWriter(f"{path_stem}.{fmt}", fmt, batch_rows, columns)
+        for record in records:
+            for w in writers.values():
+                w.write(record)
+    except BaseException as e:
+        for w in writers.values():
+            w._abort(type(e), e, e.__traceback__)
+        raise
+    for w in writers.values():
+        w.close()
+    return {fmt: w.path for fmt, w in writers.items()}
@@ -0,0 +1,79 @@
+"""
+Persistent LLM response cache backed by SQLite.
+
+Keyed on a hash of (prompt, model, creative_message): an ad whose message was already
+rewritten with the same prompt and model is served from disk and never sent again.
+WAL mode and a busy timeout make concurrent runs safe.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_responses (
+    key         TEXT PRIMARY KEY,
+    model       TEXT NOT NULL,
+    response    TEXT NOT NULL,
+    created     REAL NOT NULL
+);
+"""
+
+
+def cache_key(prompt: str, model: str, creative_message: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in (prompt, model, creative_message):
+        h.update((part or "").encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(set(keys))
+        out = {}
+        # stay well under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT key, response FROM llm_responses WHERE key IN ({','.join('?' * len(part))})", part).fetchall()
+            out.update({k: json.loads(v) for k, v in rows})
+        return out
+
+    def put_many(self, responses: Dict[str, Any], model: str, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        rows = [(k, model, json.dumps(v), now) for k, v in responses.items()]
+        if rows:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany("INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?, ?)", rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def count(self) -> int:
+        return int(self.conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0])
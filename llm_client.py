@@ -0,0 +1,204 @@
+"""
+Batched LLM creative generation:
+Several ads per prompt, at most max_concurrency requests in flight, a token-bucket rate
+limit on request starts, and a persistent response cache so identical ads are never
+regenerated. Backends are pluggable: "http" talks to any OpenAI-compatible chat completions
+URL, "stub" starts the local deterministic server from utils.llm_stub.
+"""
+
+import asyncio
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.llm_cache import ResponseCache, cache_key
+
+PROMPT = (
+    "You rewrite under-performing Facebook ad creatives for an undergarments brand. "
+    "For every ad in the user's JSON list, write 3 variants: headline <= 8 words, message <= 24 words, "
+    "CTA <= 3 words, and a one-sentence reason. Reply with JSON only: "
+    '{"results": [{"id": <ad id>, "variants": [{"headline", "message", "cta", "reason"}]}]}'
+)
+
+
+class TokenBucket:
+    """
+    Allows `rate` acquisitions per second on average, bursts of up to `burst`.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HttpBackend:
+    name = "http"
+
+    def __init__(self, url: str, api_key: Optional[str] = None, timeout_s: float = 30.0, retries: int = 2,
+                 backoff_s: float = 0.5):
+        self.url = url
+        self.api_key = api_key
+        self.timeout_s = timeout_s
+        self.retries = retries
+        self.backoff_s = backoff_s
+
+    def complete(self, model: str, system: str, user: str) -> str:
+        body = json.dumps({"model": model, "temperature": 0,
+                           "messages": [{"role": "system", "content": system}, {"role": "user", "content": user}]})
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        for attempt in range(self.retries + 1):
+            req = urllib.request.Request(self.url, data=body.encode("utf-8"), headers=headers, method="POST")
+            try:
+                with urllib.request.urlopen(req, timeout=self.timeout_s) as resp:
+                    return json.loads(resp.read())["choices"][0]["message"]["content"]
+            except urllib.error.HTTPError as e:
+                # rate limited or server-side trouble: back off and retry; anything else is final
+                if e.code not in (429, 500, 502, 503, 504) or attempt == self.retries:
+                    raise
+            except urllib.error.URLError:
+                if attempt == self.retries:
+                    raise
+            time.sleep(self.backoff_s * 2 ** attempt)
+
+    def close(self):
+        pass
+
+
+class StubBackend(HttpBackend):
+    name = "stub"
+
+    def __init__(self, latency_s: float = 0.0, failure_rate: float = 0.0, **kwargs):
+        from utils.llm_stub import StubServer
+        self.server = StubServer(latency_s=latency_s, failure_rate=failure_rate).start()
+        super().__init__(self.server.url, **kwargs)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _http_backend(cfg: Dict[str, Any]) -> HttpBackend:
+    return HttpBackend(cfg.get("llm_base_url") or "https://api.openai.com/v1/chat/completions",
+                       api_key=cfg.get("openai_api_key") or os.environ.get("OPENAI_API_KEY"),
+                       timeout_s=cfg.get("llm_timeout_s", 30), retries=cfg.get("llm_retries", 2))
+
+
+def _stub_backend(cfg: Dict[str, Any]) -> StubBackend:
+    return StubBackend(latency_s=cfg.get("llm_stub_latency_ms", 0) / 1000.0, timeout_s=cfg.get("llm_timeout_s", 30),
+                       retries=cfg.get("llm_retries", 2))
+
+
+BACKENDS: Dict[str, Callable[[Dict[str, Any]], Any]] = {"http": _http_backend, "stub": _stub_backend}
+
+
+class LLMCreativeClient:
+    def __init__(self, backend, model: str, prompt: str = PROMPT, cache: Optional[ResponseCache] = None,
+                 batch_size: int = 6, max_concurrency: int = 4, rate_per_s: Optional[float] = None):
+        self.backend = backend
+        self.model = model
+        self.prompt = prompt
+        self.cache = cache
+        self.batch_size = max(1, int(batch_size))
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.rate_per_s = rate_per_s
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any]) -> "LLMCreativeClient":
+        kind = cfg.get("llm_backend") or "http"
+        if kind not in BACKENDS:
+            raise ValueError(f"unknown llm_backend: {kind!r} (expected one of {sorted(BACKENDS)})")
+        if kind == "stub":
+            # the stub is for offline load tests; its copy is canned, not generated
+            print("[llm] llm_backend is 'stub': creative variants come from the local test server, not a model")
+        cache_path = cfg.get("llm_cache_path")
+        return cls(BACKENDS[kind](cfg), cfg.get("llm_model", "gpt-4o"),
+                   cache=ResponseCache(cache_path) if cache_path else None,
+                   batch_size=cfg.get("llm_batch_size", 6), max_concurrency=cfg.get("llm_max_concurrency", 4),
+                   rate_per_s=cfg.get("llm_rate_per_s"))
+
+    def close(self):
+        self.backend.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def generate(self, ads: List[Dict[str, Any]]) -> Tuple[List[Optional[List[Dict[str, Any]]]], Dict[str, Any]]:
+        """
+        Variants per ad (None where the request failed), aligned with ads, plus run stats.
+        """
+        t0 = time.perf_counter()
+        keys = [cache_key(self.prompt, self.model, a.get("creative_message") or "") for a in ads]
+        found = self.cache.get_many(keys) if self.cache is not None else {}
+        hits = sum(k in found for k in keys)
+        # one request item per distinct uncached message
+        todo = {}
+        for key, ad in zip(keys, ads):
+            if key not in found and key not in todo:
+                todo[key] = ad
+        items = list(todo.items())
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        fresh, failed = asyncio.run(self._run(batches)) if batches else ({}, 0)
+        if fresh and self.cache is not None:
+            self.cache.put_many(fresh, self.model)
+        found.update(fresh)
+        stats = {"backend": self.backend.name, "ads": len(ads), "unique_uncached": len(items), "cache_hits": hits, "requests": len(batches),
+                 "failed_requests": failed, "generated": len(fresh), "seconds": round(time.perf_counter() - t0, 4)}
+        return [found.get(k) for k in keys], stats
+
+    async def _run(self, batches) -> Tuple[Dict[str, Any], int]:
+        sem = asyncio.Semaphore(self.max_concurrency)
+        bucket = TokenBucket(self.rate_per_s) if self.rate_per_s else None
+        loop = asyncio.get_running_loop()
+        # blocking HTTP calls get one thread per in-flight request, not the loop's shared default pool
+        pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+
+        async def one(batch):
+            async with sem:
+                if bucket is not None:
+                    await bucket.acquire()
+                user = json.dumps({"ads": [{"id": i, "campaign": ad.get("campaign_name"),
+                                            "creative_message": ad.get("creative_message"), "ctr": ad.get("ctr")}
+                                           for i, (_, ad) in enumerate(batch)]})
+                content = await loop.run_in_executor(pool, self.backend.complete, self.model, self.prompt, user)
+                by_id = {r.get("id"): r.get("variants") for r in json.loads(content).get("results", [])}
+                return {key: by_id[i] for i, (key, _) in enumerate(batch) if by_id.get(i)}
+
+        try:
+            results = await asyncio.gather(*(one(b) for b in batches), return_exceptions=True)
+        finally:
+            pool.shutdown(wait=False)
+        fresh, failed = {}, 0
+        for r in results:
+            if isinstance(r, Exception):
+                # a failed batch only loses its own ads; they fall back to templates
+                failed += 1
+            else:
+                fresh.update(r)
+        return fresh, failed
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Local deterministic stand-in for an OpenAI-compatible chat completions endpoint.
+
+POST /v1/chat/completions with the batch prompt built by utils.llm_client; the reply
+content is {"results": [{"id", "variants": [...]}]} with variants derived from a hash of
+each creative message, so the same input always gets the same output. Optional latency
+and failure rate make throughput and retry behaviour testable offline.
+
+Usage:
+    python src/utils/llm_stub.py --port 8765 --latency-ms 200
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HEADLINES = ["Comfort that keeps up", "All-day softness, zero fuss", "Made to move with you",
+             "Your new everyday favorite", "Fit you forget you're wearing", "Breathe easy all day"]
+CTAS = ["Shop Now", "Find Your Fit", "Try It Today", "Explore", "Get Yours"]
+
+
+def variants_for(message: str, n: int = 3):
+    seed = int.from_bytes(hashlib.blake2b((message or "").encode("utf-8"), digest_size=8).digest(), "big")
+    rng = random.Random(seed)
+    words = [w.strip(".,!?\"'()—").lower() for w in (message or "").split() if len(w) > 3]
+    theme = " ".join(words[:3]) or "everyday comfort"
+    return [{"headline": rng.choice(HEADLINES),
+             "message": f"Rediscover {theme} with a fit made for long days.",
+             "cta": rng.choice(CTAS),
+             "reason": f"Leads with the ad's own theme ({theme}) and a clearer benefit."} for _ in range(n)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = "llm-stub/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        srv = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            req = json.loads(self.rfile.read(length) or b"{}")
+            items = json.loads(req["messages"][-1]["content"])["ads"]
+        except Exception as e:
+            return self._reply(400, {"error": {"message": f"bad request: {e}"}})
+        with srv.lock:
+            srv.requests += 1
+            srv.items += len(items)
+        if srv.latency_s:
+            time.sleep(srv.latency_s)
+        if srv.failure_rate and random.random() < srv.failure_rate:
+            return self._reply(503, {"error": {"message": "stub overloaded"}})
+        results = [{"id": it.get("id"), "variants": variants_for(it.get("creative_message"))} for it in items]
+        content = json.dumps({"results": results})
+        self._reply(200, {"model": req.get("model"), "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                          "usage": {"prompt_tokens": length // 4, "completion_tokens": len(content) // 4}})
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency_s=0.0, failure_rate=0.0):
+        super().__init__((host, port), StubHandler)
+        self.latency_s = latency_s
+        self.failure_rate = failure_rate
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.items = 0
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1/chat/completions"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    srv = StubServer(args.host, args.port, args.latency_ms / 1000.0, args.failure_rate)
+    print(f"[llm-stub] listening on {srv.url}")
+    srv.serve_forever()
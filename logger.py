@@ -1,12 +1,168 @@
 """
-Structured logger that appends JSON events to logs/run_logs.json
+Structured logger that appends JSON-lines events to logs/run_logs.jsonl
+
+Events are buffered and written with a single append per flush, so concurrent runs
+never rewrite each other's history. The file rotates by size and age
+(run_logs.jsonl -> run_logs.jsonl.1 -> ...), with a segment's age taken from its first
+event, so every run agrees on it. Buffered events are flushed at exit.
+`span()` wraps a pipeline stage and logs its duration and peak memory.
 """
 
-import os
+import atexit
 import json
-from datetime import datetime
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - non-POSIX
+    resource = None
+
+LOGS_PATH_DEFAULT = "logs/run_logs.jsonl"
+
+
+class JsonlSink:
+    def __init__(self, path=LOGS_PATH_DEFAULT, buffer_events=50, flush_interval_s=2.0,
+                 max_bytes=50 * 1024 * 1024, backup_count=5, rotate_interval_s=0):
+        self.path = path
+        self.buffer_events = max(1, int(buffer_events))
+        self.flush_interval_s = flush_interval_s
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.rotate_interval_s = rotate_interval_s
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._segment = (None, None)  # (inode, start time) of the current segment
+
+    def write(self, ev):
+        line = json.dumps(ev, default=str) + "\n"
+        with self._lock:
+            self._buffer.append(line)
+            due = time.monotonic() - self._last_flush >= self.flush_interval_s
+            if len(self._buffer) >= self.buffer_events or due:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        data = "".join(self._buffer).encode("utf-8")
+        self._buffer = []
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        fh = self._open_locked()
+        try:
+            if self._should_rotate(fh):
+                self._rotate()
+                self._close_locked(fh)
+                fh = self._open_locked()
+            # one append per flush: lines from concurrent runs never interleave mid-event
+            os.write(fh.fileno(), data)
+        finally:
+            self._close_locked(fh)
+
+    def _open_locked(self):
+        while True:
+            fh = open(self.path, "ab")
+            if fcntl is None:
+                return fh
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                if os.stat(self.path).st_ino == os.fstat(fh.fileno()).st_ino:
+                    return fh
+            except FileNotFoundError:
+                pass
+            # another run rotated the file while we waited for the lock
+            self._close_locked(fh)
+
+    @staticmethod
+    def _close_locked(fh):
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+        fh.close()
+
+    def _should_rotate(self, fh):
+        size = os.fstat(fh.fileno()).st_size
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        return bool(self.rotate_interval_s and size and time.time() - self._segment_start(fh) >= self.rotate_interval_s)
+
+    def _segment_start(self, fh):
+        """
+        Time of the segment's first event, read once per segment file. Falls back to the file's
+        mtime (its last write, so the segment is never rotated early) if that line doesn't parse.
+        """
+        st = os.fstat(fh.fileno())
+        if self._segment[0] != st.st_ino:
+            try:
+                with open(self.path, "rb") as head:
+                    t = json.loads(head.readline())["time"]
+                started = datetime.fromisoformat(t.rstrip("Z")).replace(tzinfo=timezone.utc).timestamp()
+            except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                started = st.st_mtime
+            self._segment = (st.st_ino, started)
+        return self._segment[1]
+
+    def _rotate(self):
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+_SINK = JsonlSink()
+_ECHO = True
+_TRACE_MEMORY = False
+_echo_lock = threading.Lock()
+_span_lock = threading.Lock()
+_span_peaks = {}  # running tracemalloc peak of each open span, by span token
+
+
+def configure(path=None, echo=True, trace_memory=False, **sink_options):
+    """
+    Replace the process-wide sink (flushing the old one). Options map to JsonlSink arguments.
+    """
+    global _SINK, _ECHO, _TRACE_MEMORY
+    _SINK.flush()
+    _SINK = JsonlSink(path or LOGS_PATH_DEFAULT, **sink_options)
+    _ECHO = echo
+    _TRACE_MEMORY = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return _SINK
+
+
+def configure_from_config(cfg):
+    return configure(
+        path=cfg.get("logs_path", LOGS_PATH_DEFAULT),
+        echo=cfg.get("log_echo", True),
+        trace_memory=cfg.get("log_trace_memory", False),
+        buffer_events=cfg.get("log_buffer_events", 50),
+        flush_interval_s=cfg.get("log_flush_interval_s", 2.0),
+        max_bytes=cfg.get("log_max_bytes", 50 * 1024 * 1024),
+        backup_count=cfg.get("log_backup_count", 5),
+        rotate_interval_s=cfg.get("log_rotate_interval_s", 0),
+    )
 
-LOGS_PATH_DEFAULT = "logs/run_logs.json"
 
 def log_event(event: str, payload):
     ev = {
@@ -14,19 +170,76 @@ def log_event(event: str, payload):
         "event": event,
         "payload": payload
     }
-    print(json.dumps(ev))
+    if _ECHO:
+        line = json.dumps(ev, default=str)
+        # one print at a time, so events echoed from concurrent stages stay on their own lines
+        with _echo_lock:
+            print(line)
     try:
-        os.makedirs(os.path.dirname(LOGS_PATH_DEFAULT), exist_ok=True)
-        logs = []
-        if os.path.exists(LOGS_PATH_DEFAULT):
-            try:
-                with open(LOGS_PATH_DEFAULT, "r") as fh:
-                    logs = json.load(fh)
-            except Exception:
-                logs = []
-        logs.append(ev)
-        with open(LOGS_PATH_DEFAULT, "w") as fh:
-            json.dump(logs, fh, indent=2)
+        _SINK.write(ev)
     except Exception as e:
         # non-fatal
         print(f"[logger] failed to write logs: {e}")
+
+
+def flush():
+    try:
+        _SINK.flush()
+    except Exception as e:
+        print(f"[logger] failed to flush logs: {e}")
+
+
+atexit.register(flush)
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+
+
+def _fold_peak_locked():
+    # tracemalloc has one process-wide peak: credit it to every open span before resetting it,
+    # so spans that start, end or nest out of order (threads) still see their own peak
+    peak = tracemalloc.get_traced_memory()[1]
+    for token, running in _span_peaks.items():
+        _span_peaks[token] = max(running, peak)
+    tracemalloc.reset_peak()
+
+
+@contextmanager
+def span(stage: str, **payload):
+    """
+    Time a pipeline stage and log a STAGE_SPAN event with its duration and memory:
+    peak_rss_mb is the process high-water mark at exit and rss_growth_mb how much the stage raised it;
+    with log_trace_memory on, py_peak_mb is the stage's own peak of Python/NumPy allocations.
+    Concurrent spans share the process, so their memory figures overlap.
+    """
+    tracing = _TRACE_MEMORY and tracemalloc.is_tracing()
+    token = object()
+    if tracing:
+        with _span_lock:
+            _fold_peak_locked()
+            _span_peaks[token] = 0
+    rss_before = _max_rss_mb()
+    t0 = time.perf_counter()
+    status = "ok"
+    try:
+        yield payload
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        rec = {"stage": stage, "status": status, "duration_s": round(time.perf_counter() - t0, 4)}
+        rss_after = _max_rss_mb()
+        if rss_after is not None:
+            rec["peak_rss_mb"] = rss_after
+            rec["rss_growth_mb"] = round(rss_after - rss_before, 2)
+        if tracing:
+            with _span_lock:
+                _fold_peak_locked()
+                peak = _span_peaks.pop(token)
+            rec["py_peak_mb"] = round(peak / (1024 * 1024), 2)
+        rec.update(payload)
+        log_event("STAGE_SPAN", rec)
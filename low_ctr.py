@@ -0,0 +1,124 @@
+"""
+Lazy ranked view of the low-CTR ads:
+Holds only the row positions at or below the CTR cutoff plus one ranking key per row;
+consumers pull the top-k they need (partial selection, no full sort) as dicts or arrays.
+Keys are computed from the ranking columns' arrays, so the low-CTR rows themselves are never copied.
+
+Ranking (descending):
+    impressions     reach of the under-performing ad
+    wasted_spend    spend * (cutoff - ctr) / cutoff, the share of spend the CTR shortfall stands for
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset import to_records
+
+RANK_KEYS = ("impressions", "wasted_spend")
+# columns each ranking reads
+RANK_COLUMNS = {"impressions": ("impressions",), "wasted_spend": ("ctr", "spend")}
+
+
+def rank_key(frame, cutoff: float, rank_by: str = "impressions") -> np.ndarray:
+    # frame: a DataFrame or a dict of column arrays holding (at least) the ranking's columns
+    if rank_by not in RANK_KEYS:
+        raise ValueError(f"unknown low-CTR ranking: {rank_by!r} (expected one of {RANK_KEYS})")
+    if rank_by == "impressions":
+        key = np.asarray(frame['impressions'], dtype=np.float64)
+    else:
+        ctr = np.asarray(frame['ctr'], dtype=np.float64)
+        shortfall = (cutoff - ctr) / cutoff if cutoff > 0 else np.ones(len(ctr))
+        key = np.asarray(frame['spend'], dtype=np.float64) * shortfall
+    return np.where(np.isfinite(key), key, -np.inf)
+
+
+def top_positions(key: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k largest keys, largest first; ties keep row order.
+    """
+    k = max(0, min(int(k), len(key)))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(key):
+        # partial selection of the kth largest; rows tied with it are taken in row order
+        kth = -np.partition(-key, k - 1)[k - 1]
+        above = np.flatnonzero(key > kth)
+        idx = np.concatenate([above, np.flatnonzero(key == kth)[:k - len(above)]])
+    else:
+        idx = np.arange(len(key))
+    return idx[np.lexsort((idx, -key[idx]))]
+
+
+class LowCtrView:
+    def __init__(self, frame: pd.DataFrame, rows: np.ndarray, key: np.ndarray, cutoff: float,
+                 rank_by: str = "impressions", columns: Optional[List[str]] = None, total: Optional[int] = None):
+        # frame is shared and read-only; rows are positions into it, key[i] ranks rows[i]
+        self.frame = frame
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.key = key
+        self.cutoff = float(cutoff)
+        self.rank_by = rank_by
+        self.columns = list(columns or frame.columns)
+        # rows at or below the cutoff in the data (streaming keeps only the best-ranked of them)
+        self.total = int(len(self.rows) if total is None else total)
+        self._order = np.empty(0, dtype=np.int64)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, cutoff: float, rank_by: str = "impressions",
+                   columns: Optional[List[str]] = None) -> "LowCtrView":
+        rows = np.flatnonzero(df['ctr'].to_numpy() <= cutoff)
+        # only the ranking columns are gathered, one array each, at the low-CTR positions
+        key = rank_key({c: df[c].to_numpy()[rows] for c in RANK_COLUMNS.get(rank_by, ())}, cutoff, rank_by)
+        return cls(df, rows, key, cutoff, rank_by, columns)
+
+    @classmethod
+    def empty(cls, columns: List[str], rank_by: str = "impressions") -> "LowCtrView":
+        return cls(pd.DataFrame(columns=columns), np.empty(0, dtype=np.int64), np.empty(0), 0.0, rank_by, columns)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def order(self, k: int) -> np.ndarray:
+        # the longest ranking computed so far is kept; shorter requests reuse its prefix
+        k = min(int(k), len(self.rows))
+        if k > len(self._order):
+            self._order = top_positions(self.key, k)
+        return self._order[:k]
+
+    def _frame_at(self, order: np.ndarray) -> pd.DataFrame:
+        # rows and columns are selected together, so only the k ranked rows of the view's columns are copied
+        return self.frame.iloc[self.rows[order], self.frame.columns.get_indexer(self.columns)]
+
+    def top(self, k: int) -> pd.DataFrame:
+        return self._frame_at(self.order(k))
+
+    def records(self, k: int) -> List[Dict[str, Any]]:
+        return to_records(self.top(k), "")
+
+    def arrays(self, k: int) -> Dict[str, np.ndarray]:
+        positions = self.rows[self.order(k)]
+        return {c: self.frame[c].take(positions).to_numpy() for c in self.columns}
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            ranked = self.order(len(self))[item] if step < 0 else self.order(stop)[start:stop:step]
+            return to_records(self._frame_at(ranked), "")
+        i = int(item) + (len(self) if int(item) < 0 else 0)
+        if not 0 <= i < len(self):
+            raise IndexError("low-CTR view index out of range")
+        return to_records(self._frame_at(self.order(i + 1)[i:]), "")[0]
+
+    def __iter__(self):
+        # full iteration is the one case that ranks every row; records are still built per block
+        self.order(len(self))
+        for start in range(0, len(self), 1000):
+            yield from self[start:start + 1000]
+
+    def to_dict(self, k: int = 10) -> Dict[str, Any]:
+        """
+        Small serializable form for logs and JSON: counts, cutoff and the top k rows.
+        """
+        return {"count": self.total, "cutoff": self.cutoff, "rank_by": self.rank_by, "top": self.records(k)}
@@ -0,0 +1,222 @@
+"""
+Persistent insight memory backed by SQLite, keyed on (campaign, hypothesis).
+
+Records are upserted in one transaction per run, expire after ttl_days without being
+seen, and their confidence decays with a half-life measured from last_seen. WAL mode and
+a busy timeout make concurrent runs safe; expiry keeps the file size flat over time.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+Key = Tuple[str, str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS insight_memory (
+    campaign    TEXT NOT NULL,
+    hypothesis  TEXT NOT NULL,
+    confidence  REAL NOT NULL,
+    first_seen  REAL NOT NULL,
+    last_seen   REAL NOT NULL,
+    hits        INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (campaign, hypothesis)
+);
+CREATE INDEX IF NOT EXISTS insight_memory_last_seen ON insight_memory (last_seen);
+CREATE TABLE IF NOT EXISTS memory_migrations (
+    source      TEXT PRIMARY KEY,
+    imported_at REAL NOT NULL,
+    records     INTEGER NOT NULL
+);
+"""
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+
+def _parse_iso(s: Optional[str]) -> Optional[float]:
+    if not s:
+        return None
+    try:
+        return datetime.fromisoformat(s.rstrip("Z")).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+
+class MemoryStore:
+    def __init__(self, path: str, ttl_days: float = 90, half_life_days: float = 14, timeout: float = 30.0):
+        self.path = path
+        self.ttl_s = float(ttl_days) * 86400 if ttl_days else None
+        self.half_life_s = float(half_life_days) * 86400 if half_life_days else None
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_config(cls, path: str, cfg: Dict[str, Any]) -> "MemoryStore":
+        """
+        Opens the store and, on first use, imports cfg["legacy_memory_path"] (see import_json),
+        so memory is complete before any run reads it.
+        """
+        store = cls(path, ttl_days=cfg.get("memory_ttl_days", 90), half_life_days=cfg.get("memory_half_life_days", 14))
+        legacy = cfg.get("legacy_memory_path")
+        if legacy and os.path.exists(legacy):
+            try:
+                store.import_json(legacy)
+            except Exception:
+                store.close()
+                raise
+        return store
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def weight(self, last_seen: float, now: float) -> float:
+        """
+        Decay factor in (0, 1]: 0.5 per half-life since last_seen.
+        """
+        if not self.half_life_s:
+            return 1.0
+        return 0.5 ** (max(0.0, now - last_seen) / self.half_life_s)
+
+    def _select(self, keys: List[Key]) -> Dict[Key, tuple]:
+        if not keys:
+            return {}
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_keys (campaign TEXT, hypothesis TEXT)")
+        self.conn.execute("DELETE FROM lookup_keys")
+        self.conn.executemany("INSERT INTO lookup_keys VALUES (?, ?)", keys)
+        rows = self.conn.execute(
+            "SELECT m.campaign, m.hypothesis, m.confidence, m.first_seen, m.last_seen, m.hits "
+            "FROM insight_memory m JOIN lookup_keys k "
+            "ON m.campaign = k.campaign AND m.hypothesis = k.hypothesis").fetchall()
+        return {(r[0], r[1]): r[2:] for r in rows}
+
+    def lookup_many(self, keys: Iterable[Key], now: Optional[float] = None) -> Dict[Key, Dict[str, Any]]:
+        """
+        Bulk lookup; expired records are skipped and confidence is decayed to `now`.
+        """
+        now = time.time() if now is None else now
+        keys = list({(str(c), str(h)) for c, h in keys})
+        self.conn.execute("BEGIN")
+        try:
+            found = self._select(keys)
+        finally:
+            self.conn.execute("COMMIT")
+        out = {}
+        for key, (conf, first_seen, last_seen, hits) in found.items():
+            if self.ttl_s and now - last_seen > self.ttl_s:
+                continue
+            w = self.weight(last_seen, now)
+            out[key] = {"campaign": key[0], "hypothesis": key[1], "confidence": round(conf * w, 4),
+                        "stored_confidence": conf, "weight": round(w, 4), "hits": hits,
+                        "first_seen": _iso(first_seen), "last_seen": _iso(last_seen)}
+        return out
+
+    def upsert_many(self, records: Iterable[Dict[str, Any]], now: Optional[float] = None) -> int:
+        """
+        Insert or refresh records ({campaign, hypothesis, confidence[, last_seen]}).
+        Refreshed records keep max(decayed stored confidence, new confidence).
+        Runs as one write transaction, then drops expired rows.
+        """
+        now = time.time() if now is None else now
+        latest = self._collapse(records, now)
+        if not latest:
+            self.expire(now)
+            return 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            n = self._upsert(latest, now)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return n
+
+    @staticmethod
+    def _collapse(records: Iterable[Dict[str, Any]], now: float) -> Dict[Key, Tuple[float, float]]:
+        # {key: (max confidence, latest last_seen)} over the records
+        latest: Dict[Key, Tuple[float, float]] = {}
+        for r in records:
+            key = (str(r.get("campaign")), str(r.get("hypothesis")))
+            seen = _parse_iso(r.get("last_seen")) or now
+            conf = float(r.get("confidence") or 0)
+            prev = latest.get(key)
+            latest[key] = (max(conf, prev[0]) if prev else conf, max(seen, prev[1]) if prev else seen)
+        return latest
+
+    def _upsert(self, latest: Dict[Key, Tuple[float, float]], now: float) -> int:
+        # inside a write transaction
+        existing = self._select(list(latest))
+        rows = []
+        for key, (conf, seen) in latest.items():
+            old = existing.get(key)
+            if old is not None and self.ttl_s and seen - old[2] > self.ttl_s:
+                old = None  # expired: start over
+            if old is not None:
+                old_conf, first_seen, last_seen, hits = old
+                conf = max(conf, old_conf * self.weight(last_seen, seen))
+                rows.append((key[0], key[1], conf, min(first_seen, seen), max(last_seen, seen), hits + 1))
+            else:
+                rows.append((key[0], key[1], conf, seen, seen, 1))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO insight_memory (campaign, hypothesis, confidence, first_seen, last_seen, hits) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        if self.ttl_s:
+            self.conn.execute("DELETE FROM insight_memory WHERE last_seen < ?", (now - self.ttl_s,))
+        return len(rows)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        if not self.ttl_s:
+            return 0
+        now = time.time() if now is None else now
+        cur = self.conn.execute("DELETE FROM insight_memory WHERE last_seen < ?", (now - self.ttl_s,))
+        return cur.rowcount
+
+    def count(self) -> int:
+        return int(self.conn.execute("SELECT COUNT(*) FROM insight_memory").fetchone()[0])
+
+    def import_json(self, json_path: str, now: Optional[float] = None) -> int:
+        """
+        One-off migration of the legacy short_term_memory.json list, then renamed to *.migrated.
+        The import is recorded in memory_migrations in the same transaction, so concurrent runs
+        import the file exactly once; a file another run has already renamed counts as migrated.
+        """
+        now = time.time() if now is None else now
+        source = os.path.abspath(json_path)
+        n = 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = self.conn.execute("SELECT 1 FROM memory_migrations WHERE source = ?", (source,)).fetchone()
+            if not done:
+                try:
+                    with open(json_path, "r") as fh:
+                        records = json.load(fh)
+                except FileNotFoundError:
+                    records = None
+                if records is not None:
+                    n = self._upsert(self._collapse(records, now), now)
+                    self.conn.execute("INSERT INTO memory_migrations (source, imported_at, records) VALUES (?, ?, ?)",
+                                      (source, now, n))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        try:
+            os.replace(json_path, json_path + ".migrated")
+        except FileNotFoundError:
+            pass
+        return n
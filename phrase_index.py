@@ -0,0 +1,193 @@
+"""
+Inverted phrase index over creative_message:
+Tokens and n-grams of every distinct message, mapped to the rows that ran it, with
+impression-weighted CTR and spend-weighted ROAS per phrase. Only distinct messages are
+tokenized; per-phrase metrics are bincounts over the (phrase, message) CSR entries.
+
+Persisted as <cache_dir>/<sha1(path, size, mtime, quality options)>-n<max_n>.npz, so it is built
+once per dataset version and rebuilt when the file or the data-quality options change.
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset import file_fingerprint
+
+INDEX_VERSION = 1
+STOPWORDS = frozenset("a an and are at be by for from in is it its of on or our that the this to with you your "
+                      "you'll you’ll we will all now new just so up than".split())
+_TOKEN = re.compile(r"[a-z0-9]+(?:['’][a-z]+)?")
+
+
+def tokenize(message: str) -> List[str]:
+    # exports mix ASCII and typographic hyphens; both split words
+    text = (message or "").lower().replace("‑", "-").replace("‐", "-")
+    return _TOKEN.findall(text)
+
+
+def phrases(tokens: List[str], max_n: int = 2) -> List[str]:
+    out = []
+    for n in range(1, max_n + 1):
+        for i in range(len(tokens) - n + 1):
+            gram = tokens[i:i + n]
+            # skip grams that start or end on a stopword, and unigrams of length < 3
+            if gram[0] in STOPWORDS or gram[-1] in STOPWORDS or (n == 1 and len(gram[0]) < 3):
+                continue
+            out.append(" ".join(gram))
+    return list(dict.fromkeys(out))
+
+
+class PhraseIndex:
+    def __init__(self, vocab: np.ndarray, indptr: np.ndarray, messages: np.ndarray, msg_rows_indptr: np.ndarray,
+                 msg_rows: np.ndarray, stats: Dict[str, np.ndarray], overall: Dict[str, float], max_n: int = 2):
+        self.vocab = vocab
+        self.max_n = max_n
+        self.lookup = {p: i for i, p in enumerate(vocab.tolist())}
+        # CSR phrase -> message ids, and message id -> row ids
+        self.indptr = indptr
+        self.messages = messages
+        self.msg_rows_indptr = msg_rows_indptr
+        self.msg_rows = msg_rows
+        self.stats = stats
+        self.overall = overall
+        self._table = None
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, max_n: int = 2) -> "PhraseIndex":
+        codes, uniques = pd.factorize(df['creative_message'].astype(object).where(df['creative_message'].notna(), ""))
+        codes = codes.astype(np.int64)
+        n_msg = len(uniques)
+        # message -> phrase entries, built from distinct messages only
+        vocab: Dict[str, int] = {}
+        entry_phrase, entry_msg = [], []
+        for m, text in enumerate(uniques):
+            for p in phrases(tokenize(str(text)), max_n):
+                entry_phrase.append(vocab.setdefault(p, len(vocab)))
+                entry_msg.append(m)
+        entry_phrase = np.asarray(entry_phrase, dtype=np.int64)
+        entry_msg = np.asarray(entry_msg, dtype=np.int64)
+
+        # transpose to phrase -> messages (CSR)
+        order = np.lexsort((entry_msg, entry_phrase))
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(entry_phrase, minlength=len(vocab)), out=indptr[1:])
+        messages = entry_msg[order].astype(np.int32)
+
+        # message -> rows (stable: row ids ascending within a message)
+        row_order = np.argsort(codes, kind="stable")
+        msg_rows_indptr = np.zeros(n_msg + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=n_msg), out=msg_rows_indptr[1:])
+
+        impressions = df['impressions'].to_numpy(dtype=np.float64)
+        spend = df['spend'].to_numpy(dtype=np.float64)
+        per_msg = {
+            "rows": np.bincount(codes, minlength=n_msg).astype(np.float64),
+            "impressions": np.bincount(codes, weights=impressions, minlength=n_msg),
+            "ctr_x_impr": np.bincount(codes, weights=df['ctr'].to_numpy(dtype=np.float64) * impressions, minlength=n_msg),
+            "spend": np.bincount(codes, weights=spend, minlength=n_msg),
+            "roas_x_spend": np.bincount(codes, weights=df['roas'].to_numpy(dtype=np.float64) * spend, minlength=n_msg),
+        }
+        stats = {k: np.bincount(entry_phrase, weights=v[entry_msg], minlength=len(vocab)) for k, v in per_msg.items()}
+        stats["messages"] = np.diff(indptr).astype(np.float64)
+        total_impr, total_spend = impressions.sum(), spend.sum()
+        overall = {"ctr": float(per_msg["ctr_x_impr"].sum() / total_impr) if total_impr else 0.0,
+                   "roas": float(per_msg["roas_x_spend"].sum() / total_spend) if total_spend else 0.0}
+        return cls(np.array(list(vocab), dtype=str), indptr, messages, msg_rows_indptr,
+                   row_order.astype(np.int64), stats, overall, max_n)
+
+    @classmethod
+    def for_dataset(cls, path: str, df: pd.DataFrame, cache_dir: Optional[str] = None, max_n: int = 2,
+                    quality: Optional[Dict[str, Any]] = None) -> "PhraseIndex":
+        """
+        Loads the persisted index for this dataset version, or builds and persists it.
+        quality: the data-quality options df was loaded with (they change its rows and values).
+        """
+        if not cache_dir:
+            return cls.build(df, max_n)
+        fp = file_fingerprint(path, with_hash=False)
+        version = hashlib.sha1(f"{fp['path']}|{fp['size']}|{fp['mtime_ns']}|{json.dumps(quality, sort_keys=True)}"
+                               .encode("utf-8")).hexdigest()
+        file = os.path.join(cache_dir, f"{version}-n{max_n}.npz")
+        if os.path.exists(file):
+            try:
+                return cls.load(file)
+            except Exception:
+                pass
+        index = cls.build(df, max_n)
+        try:
+            index.save(file)
+        except Exception as e:
+            # non-fatal: the run still has the built index
+            print(f"[phrase_index] failed to write {file}: {e}")
+        return index
+
+    def save(self, file: str):
+        os.makedirs(os.path.dirname(file) or ".", exist_ok=True)
+        tmp = file + f".tmp-{os.getpid()}.npz"
+        np.savez(tmp, version=INDEX_VERSION, max_n=self.max_n, vocab=self.vocab, indptr=self.indptr,
+                 messages=self.messages, msg_rows_indptr=self.msg_rows_indptr, msg_rows=self.msg_rows,
+                 overall=np.array([self.overall["ctr"], self.overall["roas"]]),
+                 **{f"stat_{k}": v for k, v in self.stats.items()})
+        os.replace(tmp, file)
+
+    @classmethod
+    def load(cls, file: str) -> "PhraseIndex":
+        with np.load(file, allow_pickle=False) as z:
+            if int(z["version"]) != INDEX_VERSION:
+                raise ValueError("stale phrase index")
+            stats = {k[5:]: z[k] for k in z.files if k.startswith("stat_")}
+            return cls(z["vocab"], z["indptr"], z["messages"], z["msg_rows_indptr"], z["msg_rows"], stats,
+                       {"ctr": float(z["overall"][0]), "roas": float(z["overall"][1])}, int(z["max_n"]))
+
+    def __len__(self) -> int:
+        return len(self.vocab)
+
+    def rows(self, phrase: str) -> np.ndarray:
+        """
+        Row ids of every ad whose message contains phrase (ascending).
+        """
+        i = self.lookup.get(phrase)
+        if i is None:
+            return np.empty(0, dtype=np.int64)
+        msgs = self.messages[self.indptr[i]:self.indptr[i + 1]]
+        parts = [self.msg_rows[self.msg_rows_indptr[m]:self.msg_rows_indptr[m + 1]] for m in msgs]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+    def table(self) -> pd.DataFrame:
+        if self._table is not None:
+            return self._table
+        s = self.stats
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ctr = np.where(s["impressions"] > 0, s["ctr_x_impr"] / s["impressions"], np.nan)
+            roas = np.where(s["spend"] > 0, s["roas_x_spend"] / s["spend"], np.nan)
+        self._table = pd.DataFrame({
+            "phrase": self.vocab, "messages": s["messages"].astype(np.int64), "rows": s["rows"].astype(np.int64),
+            "impressions": s["impressions"], "spend": s["spend"], "ctr": ctr, "roas": roas,
+            "ctr_lift": ctr / self.overall["ctr"] if self.overall["ctr"] else np.nan,
+            "roas_lift": roas / self.overall["roas"] if self.overall["roas"] else np.nan,
+        })
+        return self._table
+
+    def top(self, k: int = 10, by: str = "ctr_lift", ascending: bool = False, min_rows: int = 20) -> List[Dict[str, Any]]:
+        """
+        Best (or, ascending, worst) phrases by a table column, among phrases seen in >= min_rows rows.
+        """
+        t = self.table()
+        t = t[(t["rows"] >= min_rows) & t[by].notna()]
+        t = t.sort_values([by, "impressions"], ascending=[ascending, False]).head(k)
+        return t.round({"ctr": 5, "roas": 3, "ctr_lift": 3, "roas_lift": 3, "spend": 2}).to_dict(orient="records")
+
+    def phrase_stats(self, message: str) -> List[Dict[str, Any]]:
+        """
+        Indexed phrases of one message with their dataset-wide performance.
+        """
+        ids = [self.lookup[p] for p in phrases(tokenize(message), self.max_n) if p in self.lookup]
+        if not ids:
+            return []
+        return self.table().iloc[ids].to_dict(orient="records")
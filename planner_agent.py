@@ -1,6 +1,7 @@
 """
 Planner Agent:
 Decomposes user query into a structured list of tasks.
+Each task lists the task ids it depends on, so the orchestrator can run independent tasks concurrently.
 """
 
 from typing import Dict, Any
@@ -9,18 +10,24 @@ class PlannerAgent:
     def __init__(self):
         pass
 
-    def generate_plan(self, query: str) -> Dict[str, Any]:
+    def generate_plan(self, query: str, sweep: bool = False) -> Dict[str, Any]:
         """
-        Returns a small plan JSON describing tasks.
+        Returns a small plan JSON describing tasks and their dependencies.
         """
         plan = {
             "original_query": query,
             "tasks": [
-                {"id": "t1", "action": "load_and_summarize_data", "priority": 1},
-                {"id": "t2", "action": "generate_insights", "priority": 2},
-                {"id": "t3", "action": "validate_insights", "priority": 3},
-                {"id": "t4", "action": "generate_creatives", "priority": 4},
-                {"id": "t5", "action": "persist_and_report", "priority": 5}
+                {"id": "t1", "action": "load_and_summarize_data", "priority": 1, "depends_on": []},
+                {"id": "t2", "action": "generate_insights", "priority": 2, "depends_on": ["t1"]},
+                {"id": "t3", "action": "validate_insights", "priority": 3, "depends_on": ["t2"]},
+                {"id": "t4", "action": "generate_creatives", "priority": 4, "depends_on": ["t1"]},
+                {"id": "t5", "action": "persist_and_report", "priority": 5, "depends_on": ["t3", "t4"]},
+                {"id": "t6", "action": "persist_insights", "priority": 5, "depends_on": ["t3"]}
             ]
         }
+        if sweep:
+            plan["tasks"].append({"id": "t7", "action": "sweep_windows", "priority": 3, "depends_on": ["t1"]})
+            # the report includes the sweep
+            by_id = {t["id"]: t for t in plan["tasks"]}
+            by_id["t5"]["depends_on"].append("t7")
         return plan
@@ -0,0 +1,166 @@
+"""
+Content-addressed cache of pipeline stage results, backed by SQLite.
+
+An entry's key hashes everything the stage output depends on: the stage name, the data
+file's content hash, the query, the seed, the config keys the stage (and its inputs) read,
+and optionally a digest of its input. Changing a creative setting therefore misses only the
+creative stage. Values are pickled; entries expire after max_age_s and the least recently
+used ones are evicted once the file holds more than max_bytes.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from utils.dataset import content_hash
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stage_results (
+    key         TEXT PRIMARY KEY,
+    stage       TEXT NOT NULL,
+    value       BLOB NOT NULL,
+    bytes       INTEGER NOT NULL,
+    created     REAL NOT NULL,
+    last_used   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stage_results_last_used ON stage_results (last_used);
+CREATE TABLE IF NOT EXISTS data_hashes (
+    path        TEXT PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    hash        TEXT NOT NULL
+);
+"""
+
+
+def digest(obj: Any) -> str:
+    """
+    Stable hash of a JSON-like value (dict keys sorted; non-JSON leaves via str).
+    """
+    text = json.dumps(obj, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def config_subset(cfg: Dict[str, Any], keys: Iterable[str]) -> Dict[str, Any]:
+    return {k: cfg.get(k) for k in sorted(set(keys))}
+
+
+class ResultCache:
+    def __init__(self, path: str, max_bytes: Optional[int] = None, max_age_s: Optional[float] = None,
+                 timeout: float = 30.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        # stages of one run share the connection from the task graph's threads
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, path: str, cfg: Dict[str, Any]) -> "ResultCache":
+        max_mb = cfg.get("result_cache_max_mb")
+        max_days = cfg.get("result_cache_max_age_days")
+        return cls(path, max_bytes=int(max_mb * 1024 * 1024) if max_mb else None,
+                   max_age_s=float(max_days) * 86400 if max_days else None)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def data_hash(self, path: str) -> str:
+        """
+        Content hash of a data file; rehashed only when its size or mtime changed.
+        """
+        st = os.stat(path)
+        apath = os.path.abspath(path)
+        with self._lock:
+            row = self.conn.execute("SELECT size, mtime_ns, hash FROM data_hashes WHERE path = ?",
+                                    (apath,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+        h = content_hash(path)
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO data_hashes VALUES (?, ?, ?, ?)",
+                              (apath, int(st.st_size), int(st.st_mtime_ns), h))
+        return h
+
+    @staticmethod
+    def key(stage: str, **parts: Any) -> str:
+        return digest({"stage": stage, **parts})
+
+    def lookup(self, key: str, now: Optional[float] = None) -> Tuple[bool, Any]:
+        """
+        (True, value) for a live entry, else (False, None).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self.conn.execute("SELECT value, created FROM stage_results WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.max_age_s and now - row[1] > self.max_age_s):
+            return False, None
+        try:
+            value = pickle.loads(row[0])
+        except Exception:
+            # written by an incompatible version: treat as a miss, the next put replaces it
+            return False, None
+        with self._lock:
+            self.conn.execute("UPDATE stage_results SET last_used = ? WHERE key = ?", (now, key))
+        return True, value
+
+    def put(self, key: str, stage: str, value: Any, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO stage_results VALUES (?, ?, ?, ?, ?, ?)",
+                              (key, stage, sqlite3.Binary(blob), len(blob), now, now))
+        self.evict(now)
+        return len(blob)
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """
+        Drops expired entries, then least recently used ones until under max_bytes.
+        Returns the number of entries removed.
+        """
+        now = time.time() if now is None else now
+        removed = 0
+        with self._lock:
+            if self.max_age_s:
+                removed += self.conn.execute("DELETE FROM stage_results WHERE created < ?",
+                                             (now - self.max_age_s,)).rowcount
+            if self.max_bytes:
+                total = self._size_bytes()
+                if total > self.max_bytes:
+                    doomed = []
+                    for key, size in self.conn.execute("SELECT key, bytes FROM stage_results ORDER BY last_used").fetchall():
+                        if total <= self.max_bytes:
+                            break
+                        doomed.append((key,))
+                        total -= size
+                    self.conn.executemany("DELETE FROM stage_results WHERE key = ?", doomed)
+                    removed += len(doomed)
+        return removed
+
+    def _size_bytes(self) -> int:
+        return int(self.conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM stage_results").fetchone()[0])
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._size_bytes()
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self.conn.execute("SELECT COUNT(*) FROM stage_results").fetchone()[0])
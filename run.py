@@ -24,125 +24,395 @@ from agents.data_agent import DataAgent
 from agents.insight_agent import InsightAgent
 from agents.evaluator_agent import EvaluatorAgent
 from agents.creative_agent import CreativeAgent
-from utils.logger import log_event
-from utils.io_utils import write_json, read_json
+from utils.logger import log_event, configure_from_config, flush as flush_logs
+from utils.io_utils import write_json, write_lines, write_records
+from utils.memory_store import MemoryStore
+from utils.task_graph import TaskGraphExecutor
+from utils.incremental import AggregateCheckpoint
+from utils.result_cache import ResultCache, config_subset, digest
+from utils.sampler import build_from_config as build_sample
+from utils.data_quality import options_from_config as quality_options
+
+# bump when a stage's code changes its output, so cached results from older code are not reused
+RESULT_CACHE_VERSION = 7
+# config keys each cached stage's output depends on (including through the stages it reads)
+DATA_KEYS = ["compact_dtypes", "streaming", "stream_threshold_mb", "stream_chunk_rows", "stream_low_ctr_limit",
+             "ctr_low_quantile", "low_ctr_rank_by", "low_ctr_limit", "ctr_sketch_accuracy", "use_cube",
+             "cube_dimensions", "quality_checks", "quality_quarantine_reasons", "quality_ratio_tolerance", "quality_recompute_ratios",
+             "quality_quarantine_path", "insight_grains"]
+INSIGHT_KEYS = DATA_KEYS + ["recent_window_days", "previous_window_days", "roas_drop_pct", "ctr_drop_pct",
+                            "anomaly_detection", "anomaly_ewma_halflife_days",
+                            "anomaly_min_history_days", "anomaly_z", "changepoint_min_segment_days",
+                            "changepoint_min_t", "changepoint_max_splits", "anomaly_max_events"]
+STAGE_CONFIG_KEYS = {
+    "load_and_summarize_data": DATA_KEYS,
+    "generate_insights": INSIGHT_KEYS,
+    "validate_insights": INSIGHT_KEYS + ["min_impressions_for_confidence", "evaluator_significance",
+                                         "bootstrap_resamples", "significance_alpha"],
+    "generate_creatives": DATA_KEYS + ["use_llm", "llm_model", "llm_backend", "llm_base_url", "phrase_ngram_max",
+                                       "phrase_min_rows"],
+    "sweep_windows": INSIGHT_KEYS + ["sweep_grid", "sweep_max_changes"],
+}
 
 def load_config(path):
     with open(path, "r") as fh:
         return yaml.safe_load(fh)
 
-def append_memory(memory_path, validated_insights, threshold=0.5):
-    existing = []
-    if os.path.exists(memory_path):
-        try:
-            existing = read_json(memory_path)
-        except Exception:
-            existing = []
-    now = datetime.utcnow().isoformat() + "Z"
-    for ins in validated_insights:
-        if ins.get("confidence", 0) >= threshold:
-            rec = {
-                "campaign": ins.get("campaign"),
-                "hypothesis": ins.get("hypothesis"),
-                "confidence": ins.get("confidence"),
-                "last_seen": now
-            }
-            # dedupe
-            found = False
-            for r in existing:
-                if r.get("campaign") == rec["campaign"] and r.get("hypothesis") == rec["hypothesis"]:
-                    # update
-                    r["last_seen"] = now
-                    r["confidence"] = max(r.get("confidence", 0), rec["confidence"])
-                    found = True
-                    break
-            if not found:
-                existing.append(rec)
-    write_json(memory_path, existing)
-
-def run_pipeline(config_path="config/config.yaml", query="Analyze ROAS drop", sample=False, seed=None):
-    cfg = load_config(config_path)
+def append_memory(memory_path, validated_insights, threshold=0.5, cfg=None):
+    records = [{"campaign": ins.get("campaign"), "hypothesis": ins.get("hypothesis"), "confidence": ins.get("confidence")}
+               for ins in validated_insights if ins.get("confidence", 0) >= threshold]
+    with MemoryStore.from_config(memory_path, cfg or {}) as store:
+        store.upsert_many(records)
+
+def llm_result_cacheable(stats):
+    """
+    Creatives are cached only when no LLM ran or every batch succeeded on the http backend: template
+    fallbacks after a transient failure, or stub copy, must not be replayed by later runs.
+    """
+    if not stats:
+        return True
+    return not stats.get("error") and not stats.get("failed_requests") and stats.get("backend") == "http"
+
+def report_breakdowns(cube, dims, last_days):
+    """
+    {dim: [{value, spend, revenue, roas, ctr}]} over the cube's last `last_days` days, by spend.
+    """
+    out = {}
+    for dim in dims:
+        if cube is None or dim not in cube.dims or dim == "date":
+            continue
+        frame = cube.rollup([dim], last_days=last_days, ratios=["roas", "ctr"]).sort_values("spend", ascending=False)
+        out[dim] = [{"value": v, "spend": float(r.spend), "revenue": float(r.revenue), "roas": float(r.roas),
+                     "ctr": float(r.ctr)} for v, r in zip(frame.index, frame.itertuples())]
+    return out
+
+def record_columns(records):
+    # every key of every record (window and anomaly insights carry different fields), in first-seen order
+    return list(dict.fromkeys(k for r in records for k in r))
+
+def report_limits(cfg):
+    """
+    Top-N truncation for the report's long sections (None shows everything).
+    """
+    return {"insights": cfg.get("report_top_insights"), "creatives": cfg.get("report_top_creatives", 6),
+            "breakdown_rows": cfg.get("report_top_breakdown_rows")}
+
+def _top(items, n, key=None):
+    # the n highest-ranked items (by key, else the first n), kept in their original order
+    if n is None or len(items) <= n:
+        return list(items)
+    if key is None:
+        return list(items[:n])
+    keep = sorted(sorted(range(len(items)), key=lambda i: key(items[i]), reverse=True)[:n])
+    return [items[i] for i in keep]
+
+def _summary_section(start, data_summary):
+    yield "# Agentic Facebook Performance Analyst — Run Report"
+    yield f"Run time (UTC): {start}\n"
+    overall = data_summary.get("overall", {})
+    yield "## Data Summary"
+    yield f"- Date range: {overall.get('date_range')}"
+    yield f"- Total spend: ${overall.get('total_spend', 0):.2f}"
+    yield f"- Total impressions: {overall.get('total_impressions', 0):,}"
+    yield f"- Average CTR: {overall.get('average_ctr', 0):.4f}"
+    yield f"- Average ROAS: {overall.get('average_roas', 0):.3f}"
+    yield f"- Impression-weighted CTR: {overall.get('weighted_ctr', 0):.4f}"
+    yield f"- Spend-weighted ROAS: {overall.get('weighted_roas', 0):.3f}\n"
+
+def _quality_section(quality):
+    if not quality:
+        return
+    yield "## Data Quality"
+    yield f"- Rows checked: {quality['rows']:,}; quarantined: {quality['quarantined']:,}"
+    flagged = ", ".join(f"{k}: {v:,}" for k, v in quality["flagged"].items() if v)
+    yield f"- Flagged: {flagged or 'none'}"
+    if quality.get("recomputed"):
+        yield "- Recomputed from raw counts: " + ", ".join(f"{k} ({v:,} rows)" for k, v in quality["recomputed"].items())
+    if quality.get("missing_columns"):
+        yield f"- Missing columns: {', '.join(quality['missing_columns'])}"
+    if quality.get("quarantine_path"):
+        yield f"- Quarantine: {quality['quarantine_path']}"
+    yield ""
+
+def _breakdown_section(breakdowns, breakdown_days, top_rows):
+    if not breakdowns:
+        return
+    yield f"## Breakdowns (last {breakdown_days} days)"
+    for dim, rows in breakdowns.items():
+        items = ", ".join(f"{r['value']} ${r['spend']:,.0f} (ROAS {r['roas']:.2f}, CTR {r['ctr']:.4f})"
+                          for r in _top(rows, top_rows))
+        more = f" (+{len(rows) - top_rows} more)" if top_rows is not None and len(rows) > top_rows else ""
+        yield f"- By {dim}: {items}{more}"
+    yield ""
+
+def _insight_section(validated, top_insights):
+    yield "## Insights"
+    for ins in _top(validated, top_insights, key=lambda i: i.get("confidence") or 0):
+        yield f"### Campaign: {ins.get('campaign')}"
+        yield f"- Hypothesis: {ins.get('hypothesis')}"
+        yield f"- Confidence: {ins.get('confidence')}"
+        yield f"- Evidence: {ins.get('evidence')}\n"
+    if top_insights is not None and len(validated) > top_insights:
+        yield f"_{len(validated) - top_insights:,} lower-confidence insights not shown; see insights.json_\n"
+
+def _sweep_section(sweep_result):
+    if not sweep_result:
+        return
+    yield "## Window / Threshold Sweep"
+    for r in sweep_result["results"]:
+        counts = ", ".join(f"{k}: {v}" for k, v in r["counts"].items() if v)
+        yield f"- {r['grain']} {r['params']}: {counts} (changed vs baseline: {r['n_changed_vs_baseline']})"
+    yield ""
+
+def _phrase_section(phrases):
+    if not phrases:
+        return
+    yield "## Creative Phrases (impression-weighted CTR vs dataset average)"
+    yield f"- Dataset CTR: {phrases['overall_ctr']:.4f}"
+    for label, key in (("Above average", "best"), ("Below average", "worst")):
+        items = ", ".join(f"\"{p['phrase']}\" x{p['ctr_lift']:.2f} (ROAS {p['roas']:.2f})" for p in phrases[key])
+        yield f"- {label}: {items}"
+    yield ""
+
+def _creative_section(creatives, top_creatives):
+    yield "## Creative Suggestions (sample)"
+    for c in _top(creatives, top_creatives):
+        yield f"### Campaign: {c.get('campaign')}"
+        yield f"- Original message: {c.get('original_message')}"
+        yield "- Suggestions:"
+        for s in c.get("suggestions", []):
+            yield f"  - Headline: {s.get('headline')}"
+            yield f"    Message: {s.get('message')}"
+            yield f"    CTA: {s.get('cta')}"
+        yield "\n"
+
+def write_report(path, start, data_summary, validated, creatives, sweep_result=None, phrases=None, breakdowns=None,
+                 breakdown_days=None, limits=None):
+    """
+    Human-friendly report. Sections are generators, rendered line by line straight into the
+    (atomically replaced) file; limits (see report_limits) truncates the long ones to their top N.
+    """
+    limits = dict({"insights": None, "creatives": 6, "breakdown_rows": None}, **(limits or {}))
+    sections = [
+        _summary_section(start, data_summary),
+        _quality_section(data_summary.get("data_quality")),
+        _breakdown_section(breakdowns, breakdown_days, limits["breakdown_rows"]),
+        _insight_section(validated, limits["insights"]),
+        _sweep_section(sweep_result),
+        _phrase_section(phrases),
+        _creative_section(creatives, limits["creatives"]),
+    ]
+    write_lines(path, (line for section in sections for line in section))
+
+def run_pipeline(config_path="config/config.yaml", query="Analyze ROAS drop", sample=False, seed=None, sweep=False,
+                 config=None, overrides=None, incremental=None, use_cache=True):
+    """
+    Runs the full agent graph. `config` (an already-loaded dict) skips reading config_path;
+    `overrides` is merged on top, and an explicit overrides["data_path"] is always used as-is.
+    With incremental (default: config `incremental`), only rows appended since the last run are
+    read; windows and totals come from the aggregate checkpoint at checkpoint_path.
+    Stage results are reused from result_cache_path unless use_cache is False (or incremental).
+    Returns a compact run summary.
+    """
+    cfg = dict(config) if config is not None else load_config(config_path)
+    cfg.update(overrides or {})
+    if incremental is None:
+        incremental = bool(cfg.get("incremental", False))
     if seed is None:
         seed = cfg.get("seed", 42)
     random.seed(seed)
 
-    data_path = cfg.get("sample_data_path") if (sample or cfg.get("use_sample_default")) else cfg.get("data_path")
+    if (overrides or {}).get("data_path"):
+        data_path = overrides["data_path"]
+    else:
+        data_path = cfg.get("sample_data_path") if (sample or cfg.get("use_sample_default")) else cfg.get("data_path")
+        if data_path == cfg.get("sample_data_path") and data_path and not os.path.exists(data_path) \
+                and cfg.get("data_path") and os.path.exists(cfg["data_path"]):
+            # first sample run: draw the stratified sample from the full export
+            report = build_sample(cfg)
+            print(f"[run] built {data_path} ({report['rows']['sample']} of {report['rows']['full']} rows); "
+                  f"drift: {report['relative_error']}")
     reports_path = cfg.get("reports_path", "reports")
-    logs_path = cfg.get("logs_path", "logs/run_logs.json")
-    memory_path = cfg.get("memory_path", "memory/short_term_memory.json")
+    logs_path = cfg.get("logs_path", "logs/run_logs.jsonl")
+    memory_path = cfg.get("memory_path", "memory/insight_memory.sqlite")
 
     os.makedirs(reports_path, exist_ok=True)
     os.makedirs(os.path.dirname(logs_path), exist_ok=True)
     os.makedirs(os.path.dirname(memory_path), exist_ok=True)
+    configure_from_config(cfg)
 
     start = datetime.utcnow().isoformat() + "Z"
     log_event("START_RUN", {"query": query, "data_path": data_path, "time": start, "seed": seed})
 
     # Planner
     planner = PlannerAgent()
-    plan = planner.generate_plan(query)
+    plan = planner.generate_plan(query, sweep=sweep)
     log_event("PLAN_CREATED", plan)
 
-    # Data Agent
-    data_agent = DataAgent(data_path)
-    data_summary = data_agent.load_and_summarize()
-    log_event("DATA_SUMMARY", {"overall": data_summary.get("overall", {})})
-
-    # Insight Agent
-    insight_agent = InsightAgent(cfg, memory_path=memory_path)
-    insights = insight_agent.generate_insights(data_summary, plan)
-    log_event("INSIGHTS_GENERATED", {"count": len(insights)})
-
-    # Evaluator
-    evaluator = EvaluatorAgent(cfg)
-    validated = evaluator.validate(insights, data_summary)
-    log_event("INSIGHTS_VALIDATED", {"count": len(validated)})
-
-    # Persist validated insights to reports
-    write_json(os.path.join(reports_path, "insights.json"), validated)
-
-    # Append to memory (short-term)
-    append_memory(memory_path, validated, threshold=cfg.get("confidence_persist_threshold", 0.5))
-
-    # Creative Agent
-    creative_agent = CreativeAgent(cfg)
-    creatives = creative_agent.generate(data_summary)
-    write_json(os.path.join(reports_path, "creatives.json"), creatives)
-    log_event("CREATIVES_GENERATED", {"count": len(creatives)})
-
-    # Build a human-friendly report
-    report_md = []
-    report_md.append("# Agentic Facebook Performance Analyst — Run Report")
-    report_md.append(f"Run time (UTC): {start}\n")
-    overall = data_summary.get("overall", {})
-    report_md.append("## Data Summary")
-    report_md.append(f"- Date range: {overall.get('date_range')}")
-    report_md.append(f"- Total spend: ${overall.get('total_spend', 0):.2f}")
-    report_md.append(f"- Total impressions: {overall.get('total_impressions', 0):,}")
-    report_md.append(f"- Average CTR: {overall.get('average_ctr', 0):.4f}")
-    report_md.append(f"- Average ROAS: {overall.get('average_roas', 0):.3f}\n")
-    report_md.append("## Insights")
-    for ins in validated:
-        report_md.append(f"### Campaign: {ins.get('campaign')}")
-        report_md.append(f"- Hypothesis: {ins.get('hypothesis')}")
-        report_md.append(f"- Confidence: {ins.get('confidence')}")
-        report_md.append(f"- Evidence: {ins.get('evidence')}\n")
-    report_md.append("## Creative Suggestions (sample)")
-    for c in creatives[:6]:
-        report_md.append(f"### Campaign: {c.get('campaign')}")
-        report_md.append(f"- Original message: {c.get('original_message')}")
-        report_md.append("- Suggestions:")
-        for s in c.get("suggestions", []):
-            report_md.append(f"  - Headline: {s.get('headline')}")
-            report_md.append(f"    Message: {s.get('message')}")
-            report_md.append(f"    CTA: {s.get('cta')}")
-        report_md.append("\n")
-    with open(os.path.join(reports_path, "report.md"), "w") as fh:
-        fh.write("\n".join(report_md))
+    data_agent = DataAgent(data_path, cfg)
+    insight_agent = InsightAgent(cfg, memory_path=memory_path, data_path=data_path)
+    evaluator = EvaluatorAgent(cfg, data_path=data_path)
+    # streaming runs never load the whole file: insights, significance and the sweep come from the
+    # daily cells merged while streaming, and the dataset-wide phrase index is skipped
+    streaming = not incremental and bool(data_path) and os.path.exists(data_path) and data_agent.use_streaming()
+    cell_grains = list(dict.fromkeys(["campaign_name"] + insight_agent.grains))
+    if streaming:
+        data_agent.cell_grains = cell_grains
+    creative_agent = CreativeAgent(cfg, data_path=data_path, phrases=not (incremental or streaming))
+
+    # incremental runs depend on the checkpoint's history, not just the file, so they bypass the cache
+    cache_path = cfg.get("result_cache_path")
+    cache = None
+    if use_cache and cache_path and not incremental and data_path and os.path.exists(data_path):
+        try:
+            cache = ResultCache.from_config(cache_path, cfg)
+            data_hash = cache.data_hash(data_path)
+        except Exception as e:
+            # non-fatal: the run just computes everything
+            print(f"[run] result cache unavailable: {e}")
+            cache = None
+    cache_hits = {}
+
+    def cached(stage, compute, pack=None, inputs=None, cacheable=None):
+        """
+        Stage output from the result cache, or compute() (stored as pack(output)) on a miss.
+        A computed output is not stored when cacheable(output) is false.
+        """
+        if cache is None:
+            return compute()
+        key = ResultCache.key(stage, version=RESULT_CACHE_VERSION, data=data_hash, query=query, seed=seed,
+                              config=config_subset(cfg, STAGE_CONFIG_KEYS[stage]), inputs=inputs)
+        hit, value = cache.lookup(key)
+        if not hit:
+            value = compute()
+            try:
+                if cacheable is None or cacheable(value):
+                    cache.put(key, stage, pack(value) if pack else value)
+            except Exception as e:
+                print(f"[run] result cache write failed for {stage}: {e}")
+        cache_hits[stage] = hit
+        log_event("STAGE_CACHE", {"stage": stage, "hit": hit, "key": key})
+        return value
+
+    # insights / creatives artifacts: <reports_path>/<name>.<fmt> per format, streamed record by record
+    formats = cfg.get("artifact_formats") or ["json"]
+    batch_rows = int(cfg.get("artifact_batch_rows", 1000))
+
+    # Each plan action reads the outputs of the tasks it depends on
+    def load_and_summarize_data(out):
+        if incremental:
+            checkpoint = AggregateCheckpoint(cfg.get("checkpoint_path", "checkpoints/aggregates"), cell_grains)
+            tail, stats = checkpoint.ingest(data_path, cache_dir=cfg.get("dataset_cache_path"),
+                                            quality=quality_options(cfg))
+            log_event("INCREMENTAL_INGEST", {**stats, "watermark": checkpoint.meta.get("watermark"),
+                                             "cells": int(len(checkpoint.cells))})
+            insight_agent.cells = evaluator.cells = checkpoint.cells
+            data_summary = data_agent.summarize_cells(checkpoint.cells, tail)
+        else:
+            data_summary = cached("load_and_summarize_data", data_agent.load_and_summarize)
+            insight_agent.cube = data_summary.get("cube")
+            if data_summary.get("cells") is not None:
+                insight_agent.cells = evaluator.cells = data_summary["cells"]
+        log_event("DATA_SUMMARY", {"overall": data_summary.get("overall", {}),
+                                   "low_ctr": dict(data_summary["low_ctr"], top=data_summary["low_ctr_ads"][:3])})
+        if "dataset_memory" in data_summary:
+            log_event("DATASET_MEMORY", data_summary["dataset_memory"])
+        if "data_quality" in data_summary:
+            log_event("DATA_QUALITY", data_summary["data_quality"])
+        return data_summary
+
+    def generate_insights(out):
+        # memory changes between runs, so it is applied on top of the cached window insights
+        insights = insight_agent.apply_memory(
+            cached("generate_insights", lambda: insight_agent.base_insights(out["load_and_summarize_data"])))
+        log_event("INSIGHTS_GENERATED", {"count": len(insights)})
+        return insights
+
+    def validate_insights(out):
+        validated = cached("validate_insights",
+                           lambda: evaluator.validate(out["generate_insights"], out["load_and_summarize_data"]),
+                           inputs=digest(out["generate_insights"]))
+        log_event("INSIGHTS_VALIDATED", {"count": len(validated)})
+        return validated
+
+    def generate_creatives(out):
+        def compute():
+            creatives = creative_agent.generate(out["load_and_summarize_data"])
+            return {"creatives": creatives, "phrase_summary": creative_agent.phrase_summary,
+                    "llm": creative_agent.last_llm_stats}
+        result = cached("generate_creatives", compute, cacheable=lambda r: llm_result_cacheable(r["llm"]))
+        creatives = result["creatives"]
+        creative_agent.phrase_summary, creative_agent.last_llm_stats = result["phrase_summary"], result["llm"]
+        log_event("CREATIVES_GENERATED", {"count": len(creatives), "llm": creative_agent.last_llm_stats})
+        return creatives
+
+    def sweep_windows(out):
+        # Optional window/threshold sweep over the prefix-sum index
+        sweep_result = cached("sweep_windows", lambda: insight_agent.sweep(
+            None if incremental or streaming else insight_agent.read_full_df(data_path)))
+        write_json(os.path.join(reports_path, "sweep.json"), sweep_result)
+        log_event("SWEEP_COMPLETE", {"settings": len(sweep_result["results"])})
+        return sweep_result
+
+    def persist_insights(out):
+        # Persist validated insights to reports, then append to memory (short-term)
+        validated = out["validate_insights"]
+        paths = write_records(os.path.join(reports_path, "insights"), validated, formats, batch_rows,
+                              columns=record_columns(validated))
+        log_event("ARTIFACTS_WRITTEN", {"artifact": "insights", "records": len(validated), "paths": paths})
+        append_memory(memory_path, validated, threshold=cfg.get("confidence_persist_threshold", 0.5), cfg=cfg)
+
+    def persist_and_report(out):
+        paths = write_records(os.path.join(reports_path, "creatives"), out["generate_creatives"], formats, batch_rows,
+                              columns=record_columns(out["generate_creatives"]))
+        log_event("ARTIFACTS_WRITTEN", {"artifact": "creatives", "records": len(out["generate_creatives"]), "paths": paths})
+        days = cfg.get("recent_window_days", 14)
+        breakdowns = report_breakdowns(out["load_and_summarize_data"].get("cube"), cfg.get("report_breakdowns") or [], days)
+        write_report(os.path.join(reports_path, "report.md"), start, out["load_and_summarize_data"],
+                     out["validate_insights"], out["generate_creatives"], out.get("sweep_windows"),
+                     creative_agent.phrase_summary, breakdowns, days, report_limits(cfg))
+
+    handlers = {
+        "load_and_summarize_data": load_and_summarize_data,
+        "generate_insights": generate_insights,
+        "validate_insights": validate_insights,
+        "generate_creatives": generate_creatives,
+        "sweep_windows": sweep_windows,
+        "persist_insights": persist_insights,
+        "persist_and_report": persist_and_report,
+    }
+    executor = TaskGraphExecutor(max_workers=cfg.get("max_parallel_tasks", 4))
+    try:
+        execution = executor.run(plan["tasks"], handlers)
+    finally:
+        if cache is not None:
+            cache.close()
+    log_event("PLAN_EXECUTED", {"tasks": execution["tasks"], "wall_s": execution["wall_s"]})
+    validated = execution["outputs"].get("validate_insights") or []
+    creatives = execution["outputs"].get("generate_creatives") or []
 
     end = datetime.utcnow().isoformat() + "Z"
     log_event("RUN_COMPLETE", {"insights": len(validated), "creatives": len(creatives), "start": start, "end": end})
+    flush_logs()
+    failed = [t for t in execution["tasks"] if t["status"] != "ok"]
+    if failed:
+        raise RuntimeError(f"Run finished with failed or skipped tasks: {failed}")
     print(f"Run complete. Reports in {reports_path}. Logs in {logs_path}. Memory in {memory_path}.")
+    hypotheses = {}
+    for ins in validated:
+        hypotheses[ins.get("hypothesis")] = hypotheses.get(ins.get("hypothesis"), 0) + 1
+    return {
+        "data_path": data_path,
+        "reports_path": reports_path,
+        "overall": execution["outputs"]["load_and_summarize_data"].get("overall", {}),
+        "insights": len(validated),
+        "hypotheses": hypotheses,
+        "creatives": len(creatives),
+        "tasks": execution["tasks"],
+        "cache_hits": cache_hits,
+        "start": start,
+        "end": end
+    }
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -150,5 +420,10 @@ if __name__ == "__main__":
     parser.add_argument("--config", default="config/config.yaml")
     parser.add_argument("--sample", action="store_true", help="Use sample data for reproducible, fast runs")
     parser.add_argument("--seed", type=int, default=None, help="Override config seed")
+    parser.add_argument("--sweep", action="store_true", help="Evaluate the sweep_grid of windows/thresholds")
+    parser.add_argument("--incremental", action="store_true", default=None,
+                        help="Only read rows appended since the last run (aggregate checkpoint)")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every stage; skip the result cache")
     args = parser.parse_args()
-    run_pipeline(config_path=args.config, query=args.query, sample=args.sample, seed=args.seed)
+    run_pipeline(config_path=args.config, query=args.query, sample=args.sample, seed=args.seed, sweep=args.sweep,
+                 incremental=args.incremental, use_cache=not args.no_cache)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Stratified sample of a full export, built in one streaming pass:
+Every row gets a uniform random key (seeded, so the same file and seed give the same sample).
+Per campaign x week stratum the min_per_stratum lowest-key rows are kept first, so every campaign
+and week is represented; the remaining n - kept rows are the lowest-key rows overall, which is a
+uniform sample and keeps the strata roughly proportional. The sample is always n rows: when the
+per-stratum minimums alone exceed n, the n lowest-key of them are kept (a stratum's lowest key is
+likelier low the larger it is, so big strata win) and a warning says so. Only the candidates are
+held in memory (strata x min_per_stratum + n rows), never the whole file.
+
+Rows are written in file order with their original columns, and the drift of the sample's aggregates
+against the full file (accumulated in the same pass) is reported.
+
+Usage:
+    python src/utils/sampler.py --config config/config.yaml [--data full.csv] [--out sample.csv] [--rows 500]
+"""
+
+import os
+import sys
+import json
+import argparse
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+import yaml
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.dataset import apply_schema
+from utils.logger import log_event, configure_from_config, flush as flush_logs
+
+# per-stratum accumulators compared between the full file and the sample
+SUMS = ['spend', 'impressions', 'clicks', 'revenue', 'ctr', 'roas']
+STRATA = ['_campaign', '_week']
+
+
+def _strata(parsed: pd.DataFrame) -> Dict[str, np.ndarray]:
+    # Monday-based week as days since the epoch (1970-01-01 was a Thursday); -1 when undated
+    days = parsed['date'].to_numpy().astype("datetime64[D]").astype(np.int64)
+    week = np.where(parsed['date'].isna().to_numpy(), -1, days - (days + 3) % 7)
+    return {"_campaign": parsed['campaign_name'].astype(str).to_numpy(), "_week": week}
+
+
+def _accumulate(acc: Optional[pd.DataFrame], parsed: pd.DataFrame, strata: Dict[str, np.ndarray]) -> pd.DataFrame:
+    part = parsed[SUMS].astype(np.float64).assign(rows=1.0, **strata).groupby(STRATA, sort=False).sum()
+    return part if acc is None else acc.add(part, fill_value=0)
+
+
+def _minimums(pool: pd.DataFrame, per_stratum: int) -> np.ndarray:
+    # pool sorted by key: the bottom-per_stratum keys within each stratum
+    return (pool.groupby(STRATA, sort=False).cumcount() < per_stratum).to_numpy()
+
+
+def _reduce(pool: pd.DataFrame, per_stratum: int, n: int) -> pd.DataFrame:
+    # candidates: bottom-per_stratum keys within each stratum, plus the bottom-n keys overall
+    pool = pool.sort_values("_key", kind="stable")
+    keep = _minimums(pool, per_stratum)
+    keep[:n] = True
+    return pool[keep]
+
+
+def _select(pool: pd.DataFrame, per_stratum: int, n: int) -> pd.DataFrame:
+    # per-stratum minimums first (lowest keys first if they alone exceed n), then the
+    # lowest-key remaining rows up to n in total
+    guaranteed = _minimums(pool, per_stratum)
+    filled = pool[guaranteed].head(n)
+    return pd.concat([filled, pool[~guaranteed].head(n - len(filled))])
+
+
+def drift(full: pd.DataFrame, sample: pd.DataFrame) -> Dict[str, Any]:
+    """
+    How far the sample's aggregates are from the full file's. full / sample: SUMS + rows per
+    (campaign, week) stratum. Relative errors for the headline metrics, total variation distance
+    for the campaign and week mixes, and coverage of campaigns / weeks / strata.
+    """
+    def headline(t):
+        n = t["rows"] or np.nan
+        return {"average_ctr": t["ctr"] / n, "average_roas": t["roas"] / n,
+                "ctr": t["clicks"] / t["impressions"] if t["impressions"] else np.nan,
+                "roas": t["revenue"] / t["spend"] if t["spend"] else np.nan}
+
+    def mix(frame, level, col):
+        s = frame.groupby(level=level)[col].sum()
+        return s / s.sum() if s.sum() else s
+
+    f, s = headline(full.sum()), headline(sample.sum())
+    out = {"rows": {"full": int(full["rows"].sum()), "sample": int(sample["rows"].sum())},
+           "relative_error": {k: round(float((s[k] - f[k]) / f[k]), 6) if f[k] else None for k in f}}
+    for name, level in (("campaign", "_campaign"), ("week", "_week")):
+        for col in ("rows", "spend"):
+            a, b = mix(full, level, col), mix(sample, level, col)
+            out.setdefault("tvd", {})[f"{name}_{col}"] = round(float(a.subtract(b, fill_value=0).abs().sum() / 2), 6)
+        out.setdefault("coverage", {})[name] = round(len(mix(sample, level, "rows")) / max(len(mix(full, level, "rows")), 1), 6)
+    out["coverage"]["strata"] = round(len(sample) / max(len(full), 1), 6)
+    return out
+
+
+def build_sample(data_path: str, out_path: str, n: int = 500, seed: int = 42, min_per_stratum: int = 1,
+                 chunk_rows: int = 250000) -> Dict[str, Any]:
+    """
+    Writes the stratified sample of data_path to out_path (atomically) and returns its drift report.
+    """
+    rng = np.random.default_rng(seed)
+    pool, full, offset, header = None, None, 0, None
+    # dates are kept as read, so sampled rows are written back in the file's own date format
+    for raw in pd.read_csv(data_path, chunksize=chunk_rows, dtype={"date": str}, low_memory=False):
+        header = list(raw.columns)
+        parsed = apply_schema(raw.copy())
+        strata = _strata(parsed)
+        full = _accumulate(full, parsed, strata)
+        part = raw.assign(_key=rng.random(len(raw)), _row=np.arange(offset, offset + len(raw)), **strata)
+        offset += len(raw)
+        pool = _reduce(part if pool is None else pd.concat([pool, part], ignore_index=True), min_per_stratum, n)
+    if pool is None:
+        raise ValueError(f"{data_path} has no rows")
+
+    sample = _select(pool, min_per_stratum, n).sort_values("_row")
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp = f"{out_path}.tmp-{os.getpid()}"
+    sample[header].to_csv(tmp, index=False)
+    os.replace(tmp, out_path)
+
+    parsed = apply_schema(sample[header].copy())
+    report = drift(full, _accumulate(None, parsed, {k: sample[k].to_numpy() for k in STRATA}))
+    report.update({"data_path": data_path, "sample_path": out_path, "seed": seed, "min_per_stratum": min_per_stratum,
+                   "strata": int(len(full))})
+    if len(full) * min_per_stratum > n:
+        report["note"] = (f"{len(full)} strata x {min_per_stratum} exceeds sample_rows={n}; "
+                          f"{report['coverage']['strata']:.0%} of strata kept")
+        print(f"[sampler] {report['note']}")
+    log_event("SAMPLE_BUILT", report)
+    return report
+
+
+def build_from_config(cfg: Dict[str, Any], data_path: str = None, out_path: str = None, n: int = None,
+                      seed: int = None) -> Dict[str, Any]:
+    return build_sample(data_path or cfg.get("data_path"), out_path or cfg.get("sample_data_path"),
+                        n=int(n or cfg.get("sample_rows", 500)),
+                        seed=int(seed if seed is not None else cfg.get("seed", 42)),
+                        min_per_stratum=int(cfg.get("sample_min_per_stratum", 1)),
+                        chunk_rows=int(cfg.get("stream_chunk_rows", 250000)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--data", default=None, help="Full export (default: data_path)")
+    parser.add_argument("--out", default=None, help="Sample CSV (default: sample_data_path)")
+    parser.add_argument("--rows", type=int, default=None, help="Sample size (default: sample_rows)")
+    parser.add_argument("--seed", type=int, default=None, help="Override config seed")
+    args = parser.parse_args()
+    with open(args.config, "r") as fh:
+        cfg = yaml.safe_load(fh) or {}
+    configure_from_config(dict(cfg, log_echo=False))
+    report = build_from_config(cfg, args.data, args.out, args.rows, args.seed)
+    flush_logs()
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Analysis server: keeps the dataset and its per-grain daily cells / prefix-sum indexes warm
+in one long-lived process, so window comparisons with different windows, thresholds, grains
+and row filters are answered without re-reading the CSV.
+
+Usage:
+    python src/orchestrator/server.py --config config/config.yaml --port 8780 [--sample]
+
+Endpoints (JSON):
+    GET  /health    status, data version, number of loads
+    GET  /summary   DataAgent summary of the loaded file (top low-CTR ads included)
+    POST /query     {"query", "recent_window_days", "previous_window_days", "roas_drop_pct",
+                     "ctr_drop_pct", "min_impressions_for_confidence", "grains": [...],
+                     "filters": {column: value | [values]}, "significance": bool, "limit": n}
+    POST /reload    force a reload
+
+The file's size and mtime are checked on every request; a changed file is reloaded before
+answering. Filtered cells are built once per (filter set, grain) and kept in a small LRU.
+"""
+
+import os
+import sys
+import json
+import argparse
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Ensure src package path so local imports work when running as script
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from agents.data_agent import DataAgent
+from agents.insight_agent import GRAINS, InsightAgent
+from agents.evaluator_agent import EvaluatorAgent
+from orchestrator.run import load_config
+from utils.dataset import clear_memo, load_dataset
+from utils.data_quality import options_from_config
+from utils.logger import log_event, configure_from_config, flush as flush_logs
+from utils.time_index import TimeIndex, daily_cells
+
+# request keys that override the config for one query, with their types
+OVERRIDES = {"recent_window_days": int, "previous_window_days": int, "roas_drop_pct": float, "ctr_drop_pct": float,
+             "min_impressions_for_confidence": float, "bootstrap_resamples": int, "significance_alpha": float}
+
+
+class AnalysisService:
+    def __init__(self, cfg, data_path):
+        self.cfg = cfg
+        self.data_path = data_path
+        self.state = None
+        self.loads = 0
+        self._lock = threading.Lock()
+        self._filtered = OrderedDict()
+        self.max_filtered = int(cfg.get("server_filter_cache", 64))
+
+    def _version(self):
+        st = os.stat(self.data_path)
+        return {"size": int(st.st_size), "mtime_ns": int(st.st_mtime_ns)}
+
+    @staticmethod
+    def _cells(df, grains, date_range):
+        # one (grain x day) roll-up per grain: far fewer cells than one grouping over every grain at once
+        cells = {g: daily_cells(df, [g], squares=True) for g in grains}
+        start, end = date_range
+        return cells, {g: TimeIndex.from_daily(c, start, end) for g, c in cells.items()}
+
+    def load(self):
+        t0 = time.perf_counter()
+        version = self._version()
+        clear_memo()
+        df = load_dataset(self.data_path, cache_dir=self.cfg.get("dataset_cache_path"),
+                          compact=self.cfg.get("compact_dtypes", False), quality=options_from_config(self.cfg))
+        summary = DataAgent(self.data_path, self.cfg).load_and_summarize()
+        grains = [g for g in GRAINS if g in df.columns]
+        # windows always end at the file's latest day, filtered or not
+        date_range = (df['date'].min(), df['date'].max())
+        cells, indexes = self._cells(df, grains, date_range)
+        self.state = {"version": version, "df": df, "summary": summary, "grains": grains, "cells": cells,
+                      "indexes": indexes, "date_range": date_range, "load_s": round(time.perf_counter() - t0, 4)}
+        self._filtered.clear()
+        self.loads += 1
+        log_event("SERVER_LOAD", {"data_path": self.data_path, "rows": int(len(df)), **version,
+                                  "load_s": self.state["load_s"]})
+        flush_logs()
+        return self.state
+
+    def ensure_fresh(self, force=False):
+        state = self.state
+        if not force and state is not None and state["version"] == self._version():
+            return state
+        with self._lock:
+            # another request may have reloaded while this one waited
+            if force or self.state is None or self.state["version"] != self._version():
+                return self.load()
+            return self.state
+
+    def filtered(self, state, filters, grains):
+        """
+        (cells, indexes) for the rows matching filters, built per grain on first use.
+        """
+        out = ({}, {})
+        todo = []
+        with self._lock:
+            for g in grains:
+                key = json.dumps([filters, g], sort_keys=True)
+                hit = self._filtered.get(key)
+                if hit is not None and hit[0] is state:
+                    self._filtered.move_to_end(key)
+                    out[0][g], out[1][g] = hit[1]
+                else:
+                    todo.append(g)
+        if todo:
+            df = state["df"]
+            mask = np.ones(len(df), dtype=bool)
+            for col, values in filters.items():
+                mask &= df[col].astype(object).isin(values).to_numpy()
+            cells, indexes = self._cells(df.loc[mask], todo, state["date_range"])
+            with self._lock:
+                for g in todo:
+                    out[0][g], out[1][g] = cells[g], indexes[g]
+                    self._filtered[json.dumps([filters, g], sort_keys=True)] = (state, (cells[g], indexes[g]))
+                while len(self._filtered) > self.max_filtered:
+                    self._filtered.popitem(last=False)
+        return out
+
+    def parse(self, params, state):
+        cfg = dict(self.cfg)
+        for k, typ in OVERRIDES.items():
+            if params.get(k) is not None:
+                try:
+                    cfg[k] = typ(params[k])
+                except (TypeError, ValueError):
+                    raise ValueError(f"{k} must be {typ.__name__}")
+        grains = params.get("grains") or cfg.get("insight_grains") or ["campaign_name"]
+        unknown = [g for g in grains if g not in state["grains"]]
+        if unknown:
+            raise ValueError(f"unknown grains {unknown} (expected any of {state['grains']})")
+        filters = {}
+        for col, values in (params.get("filters") or {}).items():
+            if col not in state["df"].columns:
+                raise ValueError(f"unknown filter column {col!r}")
+            filters[col] = sorted(str(v) for v in (values if isinstance(values, list) else [values]))
+        return cfg, list(grains), filters
+
+    def analyze(self, params):
+        t0 = time.perf_counter()
+        state = self.ensure_fresh()
+        cfg, grains, filters = self.parse(params, state)
+        cells, indexes = self.filtered(state, filters, grains) if filters else (state["cells"], state["indexes"])
+        agent = InsightAgent(dict(cfg, insight_grains=grains))
+        insights = agent.insights_from_frames({g: indexes[g].window_frame(agent.recent_days, agent.prev_days)
+                                               for g in grains})
+        evaluator = EvaluatorAgent(cfg)
+        validated = evaluator.apply_rules(insights)
+        if params.get("significance"):
+            for g in grains:
+                evaluator.attach_significance([c for c in validated if c.get("grain") == g], cells=cells[g])
+        if params.get("limit"):
+            validated = sorted(validated, key=lambda c: -c.get("confidence", 0))[:int(params["limit"])]
+        return {
+            "query": params.get("query", "Analyze ROAS drop"),
+            "data_path": self.data_path,
+            "data_version": state["version"],
+            "params": {**{k: cfg.get(k) for k in OVERRIDES}, "grains": grains, "filters": filters},
+            "overall": state["summary"].get("overall", {}),
+            "n_insights": len(validated),
+            "insights": validated,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3),
+        }
+
+    def summary(self):
+        state = self.ensure_fresh()
+        s = state["summary"]
+        out = {"overall": s.get("overall", {}), "by_campaign": s.get("by_campaign", []),
+               "low_ctr": dict(s["low_ctr"], top=s["low_ctr_ads"][:10]), "grains": state["grains"], "data_version": state["version"]}
+        if "dataset_memory" in s:
+            out["dataset_memory"] = s["dataset_memory"]
+        return out
+
+
+class AnalysisHandler(BaseHTTPRequestHandler):
+    server_version = "fb-analyst/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, fn):
+        try:
+            self._reply(200, fn())
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+        except Exception as e:
+            self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        svc = self.server.service
+        if self.path == "/health":
+            return self._handle(lambda: {"status": "ok", "data_path": svc.data_path, "loads": svc.loads,
+                                         "data_version": svc.state["version"] if svc.state else None})
+        if self.path == "/summary":
+            return self._handle(svc.summary)
+        self._reply(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        svc = self.server.service
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(params, dict):
+                raise ValueError("body must be a JSON object")
+        except ValueError as e:
+            return self._reply(400, {"error": f"bad request: {e}"})
+        if self.path == "/query":
+            return self._handle(lambda: svc.analyze(params))
+        if self.path == "/reload":
+            return self._handle(lambda: {"loads": svc.loads, "load_s": svc.ensure_fresh(force=True)["load_s"]})
+        self._reply(404, {"error": f"unknown path {self.path}"})
+
+
+class AnalysisServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, service, host="127.0.0.1", port=0):
+        super().__init__((host, port), AnalysisHandler)
+        self.service = service
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--data", default=None, help="CSV to serve (default: data_path / sample_data_path)")
+    parser.add_argument("--sample", action="store_true", help="Serve sample_data_path")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    args = parser.parse_args()
+    cfg = load_config(args.config)
+    configure_from_config(cfg)
+    data_path = args.data or (cfg.get("sample_data_path") if (args.sample or cfg.get("use_sample_default"))
+                              else cfg.get("data_path"))
+    service = AnalysisService(cfg, data_path)
+    service.load()
+    srv = AnalysisServer(service, args.host or cfg.get("server_host", "127.0.0.1"),
+                         args.port if args.port is not None else cfg.get("server_port", 8780))
+    print(f"[server] {data_path} loaded in {service.state['load_s']}s; listening on {srv.url}")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        flush_logs()
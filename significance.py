@@ -0,0 +1,147 @@
+"""
+Vectorized significance tests for recent-vs-previous window comparisons:
+Welch t-tests from per-window sums / sums of squares, and day-block bootstrap confidence
+intervals for the relative change of a ratio metric. Everything is array-at-a-time, one
+element per hypothesis; no SciPy dependency (the t distribution goes through a vectorized
+regularized incomplete beta function).
+"""
+
+import math
+import warnings
+from typing import Dict, Tuple
+
+import numpy as np
+
+_lgamma = np.frompyfunc(math.lgamma, 1, 1)
+_TINY = 1e-300
+
+
+def _betacf(a, b, x, max_iter=2000, eps=1e-12):
+    # modified Lentz continued fraction for I_x(a, b), evaluated for whole arrays at once
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = np.ones_like(x)
+    d = 1.0 - qab * x / qap
+    d = 1.0 / np.where(np.abs(d) < _TINY, _TINY, d)
+    h = d.copy()
+    for m in range(1, max_iter + 1):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / np.where(np.abs(d) < _TINY, _TINY, d)
+        c = 1.0 + aa / c
+        c = np.where(np.abs(c) < _TINY, _TINY, c)
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / np.where(np.abs(d) < _TINY, _TINY, d)
+        c = 1.0 + aa / c
+        c = np.where(np.abs(c) < _TINY, _TINY, c)
+        delta = d * c
+        h *= delta
+        if np.all(np.abs(delta - 1.0) < eps):
+            break
+    return h
+
+
+def betainc(a, b, x) -> np.ndarray:
+    """
+    Regularized incomplete beta I_x(a, b) for arrays (NaN where inputs are NaN).
+    """
+    a, b, x = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (a, b, x)))
+    out = np.full(x.shape, np.nan)
+    ok = np.isfinite(a) & np.isfinite(b) & np.isfinite(x) & (a > 0) & (b > 0)
+    out[ok & (x <= 0)] = 0.0
+    out[ok & (x >= 1)] = 1.0
+    mid = ok & (x > 0) & (x < 1)
+    if mid.any():
+        a, b, x = a[mid], b[mid], x[mid]
+        ln_bt = (_lgamma(a + b) - _lgamma(a) - _lgamma(b)).astype(np.float64) + a * np.log(x) + b * np.log1p(-x)
+        bt = np.exp(ln_bt)
+        # the continued fraction converges fast on one side of the mean; use symmetry for the other
+        direct = x < (a + 1.0) / (a + b + 2.0)
+        res = np.empty_like(x)
+        if direct.any():
+            res[direct] = bt[direct] * _betacf(a[direct], b[direct], x[direct]) / a[direct]
+        if (~direct).any():
+            r = ~direct
+            res[r] = 1.0 - bt[r] * _betacf(b[r], a[r], 1.0 - x[r]) / b[r]
+        out[mid] = np.clip(res, 0.0, 1.0)
+    return out
+
+
+def t_two_sided_p(t, dof) -> np.ndarray:
+    """
+    P(|T| >= |t|) for Student's t with dof degrees of freedom.
+    """
+    t = np.asarray(t, dtype=np.float64)
+    dof = np.asarray(dof, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = dof / (dof + t * t)
+    return betainc(dof / 2.0, 0.5, x)
+
+
+def welch(sum_a, sq_a, n_a, sum_b, sq_b, n_b) -> Dict[str, np.ndarray]:
+    """
+    Welch's unequal-variance t-test of mean(b) - mean(a) from per-group sums, sums of squares
+    and counts. Groups with fewer than 2 rows, or no variance on either side, get NaN.
+    """
+    sum_a, sq_a, n_a, sum_b, sq_b, n_b = (np.asarray(v, dtype=np.float64)
+                                          for v in (sum_a, sq_a, n_a, sum_b, sq_b, n_b))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_a, mean_b = sum_a / n_a, sum_b / n_b
+        var_a = np.maximum(sq_a - n_a * mean_a ** 2, 0.0) / (n_a - 1)
+        var_b = np.maximum(sq_b - n_b * mean_b ** 2, 0.0) / (n_b - 1)
+        se_a, se_b = var_a / n_a, var_b / n_b
+        se = np.sqrt(se_a + se_b)
+        t = (mean_b - mean_a) / se
+        dof = (se_a + se_b) ** 2 / (se_a ** 2 / (n_a - 1) + se_b ** 2 / (n_b - 1))
+    bad = (n_a < 2) | (n_b < 2) | ~(se > 0)
+    t = np.where(bad, np.nan, t)
+    dof = np.where(bad, np.nan, dof)
+    return {"t": t, "dof": dof, "p": t_two_sided_p(t, dof)}
+
+
+def bootstrap_change_ci(nums: Dict[str, np.ndarray], den: np.ndarray, group: np.ndarray, window: np.ndarray,
+                        n_groups: int, n_boot: int = 1000, alpha: float = 0.05, seed: int = 42,
+                        chunk: int = 250) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Percentile CI of (sum(num)/sum(den))_recent / (sum(num)/sum(den))_previous - 1 per group,
+    for every num in nums (all resampled with the same draws).
+
+    Inputs are day cells (group id, window 0/1, nums, den); days are resampled with replacement
+    within each (group, window), which keeps within-day correlation intact. A resample of s days
+    is a multinomial count vector, so all groups with s days in a window are resampled by one
+    (groups x s) @ (s x resamples) product; count vectors are shared across those groups, which
+    leaves each group's own bootstrap distribution (and CI) unchanged. NaN where a window has no days.
+    """
+    rng = np.random.default_rng(seed)
+    key = np.asarray(group, dtype=np.int64) * 2 + np.asarray(window, dtype=np.int64)
+    order = np.argsort(key, kind="stable")
+    cols = {name: np.asarray(v, dtype=np.float64)[order] for name, v in nums.items()}
+    cols["_den"] = np.asarray(den, dtype=np.float64)[order]
+    sizes = np.bincount(key, minlength=2 * n_groups)
+    starts = np.cumsum(sizes) - sizes
+    by_size = [(s_, np.flatnonzero(sizes == s_)) for s_ in np.unique(sizes[sizes > 0])]
+
+    changes = {name: np.empty((n_groups, n_boot)) for name in nums}
+    for b0 in range(0, n_boot, chunk):
+        bc = min(chunk, n_boot - b0)
+        sums = {name: np.full((2 * n_groups, bc), np.nan) for name in cols}
+        for s_, keys in by_size:
+            counts = rng.multinomial(s_, np.full(s_, 1.0 / s_), size=bc).astype(np.float64)
+            cells = starts[keys][:, None] + np.arange(s_)
+            for name, v in cols.items():
+                sums[name][keys] = v[cells] @ counts.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for name in nums:
+                ratio = (sums[name] / sums["_den"]).reshape(n_groups, 2, bc)
+                changes[name][:, b0:b0 + bc] = ratio[:, 1] / ratio[:, 0] - 1.0
+    out = {}
+    with warnings.catch_warnings():
+        # all-NaN rows (empty windows) are expected and stay NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for name, ch in changes.items():
+            ch[~np.isfinite(ch)] = np.nan
+            lo, hi = np.nanpercentile(ch, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=1)
+            out[name] = (lo, hi)
+    return out
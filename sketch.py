@@ -0,0 +1,89 @@
+"""
+Mergeable approximate quantile sketch (log-bucketed, DDSketch style).
+
+Every value is mapped to a bucket whose width is proportional to its magnitude, so
+quantile estimates carry a bounded *relative* error (``relative_accuracy``). Sketches
+built on separate chunks merge by adding bucket counts, which is what the streaming
+DataAgent relies on.
+"""
+
+import math
+from typing import Dict
+
+import numpy as np
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _add_buckets(self, target: Dict[int, int], values: np.ndarray):
+        if not len(values):
+            return
+        idx = np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+        keys, counts = np.unique(idx, return_counts=True)
+        for k, c in zip(keys.tolist(), counts.tolist()):
+            target[k] = target.get(k, 0) + c
+
+    def update(self, values):
+        """
+        Add an array of values (NaN and inf are ignored).
+        """
+        v = np.asarray(values, dtype=np.float64)
+        v = v[np.isfinite(v)]
+        if not len(v):
+            return self
+        self._add_buckets(self.positive, v[v > 0])
+        self._add_buckets(self.negative, -v[v < 0])
+        self.zero_count += int(np.count_nonzero(v == 0))
+        self.count += int(len(v))
+        self.min = min(self.min, float(v.min()))
+        self.max = max(self.max, float(v.max()))
+        return self
+
+    def merge(self, other: "QuantileSketch"):
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        for k, c in other.positive.items():
+            self.positive[k] = self.positive.get(k, 0) + c
+        for k, c in other.negative.items():
+            self.negative[k] = self.negative.get(k, 0) + c
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _bucket_value(self, k: int) -> float:
+        # midpoint (in relative terms) of bucket (gamma^(k-1), gamma^k]
+        return 2 * self.gamma ** k / (self.gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return float("nan")
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = 0
+        for k in sorted(self.negative, reverse=True):
+            seen += self.negative[k]
+            if seen > rank:
+                return max(self.min, -self._bucket_value(k))
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for k in sorted(self.positive):
+            seen += self.positive[k]
+            if seen > rank:
+                return min(self.max, self._bucket_value(k))
+        return self.max
@@ -0,0 +1,125 @@
+"""
+Synthetic ads data generator with the same schema as synthetic_fb_ads_undergarments.csv.
+
+Rows are spread over n_days; each row is one (campaign, adset) delivery on a day with a
+creative, audience, platform and country. A fraction of campaigns gets an injected ROAS
+and/or CTR drop from drop_start_day onward; those are returned (and written next to the
+CSV as <name>.truth.json) so detectors can be checked against ground truth.
+Rows are generated and written in chunks, so 10M+ row files need little memory.
+"""
+
+import json
+import os
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+CREATIVE_TYPES = np.array(["Image", "Video", "UGC", "Carousel"])
+AUDIENCES = np.array(["Broad", "Lookalike", "Retargeting", "Interest"])
+PLATFORMS = np.array(["Facebook", "Instagram"])
+COUNTRIES = np.array(["US", "UK", "CA", "AU", "IN"])
+ADSET_SUFFIXES = ["Retarget", "Broad", "LAL 1%", "Interest", "Advantage+"]
+
+_LINES = ["Men ComfortMax", "Women Cotton Classics", "Seamless Everyday", "Bold Colors", "Premium Modal",
+          "Athleisure Cooling", "Fit & Lift", "Summer Invisible", "Signature Soft", "Studio Sports"]
+_HOOKS = ["Breathable organic cotton that moves with you", "No ride-up guarantee", "Cooling mesh panels for workouts",
+          "Invisible under everything", "Softest waistband we've made", "All-day support without wires",
+          "Moisture-wicking comfort", "Tagless, itch-free fit"]
+_OFFERS = ["limited offer", "back in stock", "new colors just dropped", "buy 3 get 1 free", "free shipping today",
+           "20% off this week"]
+_PRODUCTS = ["briefs", "boxers", "bralettes", "trunks", "thongs", "sports bras"]
+
+
+def _messages(n: int, rng: np.random.Generator) -> np.ndarray:
+    out = set()
+    while len(out) < n:
+        out.add(f"{rng.choice(_HOOKS)} — {rng.choice(_OFFERS)} on {rng.choice(_PRODUCTS)}.")
+        if len(out) >= len(_HOOKS) * len(_OFFERS) * len(_PRODUCTS):
+            break
+    msgs = sorted(out)
+    # beyond the template space, number the variants
+    msgs += [f"{msgs[i % len(msgs)][:-1]} (v{i})." for i in range(len(msgs), n)]
+    return np.array(msgs[:n])
+
+
+def generate(path: str, n_rows: int = 10000, n_campaigns: int = 20, adsets_per_campaign: int = 4, n_days: int = 90,
+             n_messages: int = 60, start_date: str = "2025-01-01", drop_fraction: float = 0.25,
+             drop_start_day: int = None, roas_drop: float = 0.35, ctr_drop: float = 0.2, seed: int = 42,
+             chunk_rows: int = 500000) -> Dict[str, Any]:
+    """
+    Writes a CSV of n_rows rows to path and returns the ground truth of injected drops.
+    """
+    rng = np.random.default_rng(seed)
+    campaigns = np.array([f"{_LINES[i % len(_LINES)]} {'Launch' if i < len(_LINES) else f'Wave {i // len(_LINES)}'}"
+                          for i in range(n_campaigns)])
+    adsets = np.array([f"Adset-{j + 1} {ADSET_SUFFIXES[j % len(ADSET_SUFFIXES)]}" for j in range(adsets_per_campaign)])
+    messages = _messages(n_messages, rng)
+    drop_start_day = int(n_days * 2 // 3) if drop_start_day is None else int(drop_start_day)
+    n_drops = int(round(n_campaigns * drop_fraction))
+    dropped = rng.choice(n_campaigns, size=n_drops, replace=False) if n_drops else np.array([], dtype=int)
+    # half of the drops are creative (CTR falls too), the rest ROAS-only
+    ctr_dropped = dropped[: len(dropped) // 2]
+    is_dropped = np.zeros(n_campaigns, dtype=bool)
+    is_dropped[dropped] = True
+    is_ctr_dropped = np.zeros(n_campaigns, dtype=bool)
+    is_ctr_dropped[ctr_dropped] = True
+    # per-campaign baselines
+    base_ctr = rng.uniform(0.008, 0.022, n_campaigns)
+    base_cvr = rng.uniform(0.01, 0.03, n_campaigns)
+    base_cpm = rng.uniform(2.0, 6.0, n_campaigns)
+    aov = rng.uniform(25.0, 60.0, n_campaigns)
+    start = np.datetime64(start_date, "D")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    written = 0
+    with open(tmp, "w") as fh:
+        while written < n_rows:
+            n = min(chunk_rows, n_rows - written)
+            row_ids = np.arange(written, written + n)
+            # rows are spread evenly over the days, in date order
+            day = (row_ids * n_days // n_rows).astype(np.int64)
+            camp = rng.integers(0, n_campaigns, n)
+            adset = rng.integers(0, adsets_per_campaign, n)
+            after = day >= drop_start_day
+            ctr = base_ctr[camp] * rng.lognormal(0, 0.25, n)
+            ctr = np.where(after & is_ctr_dropped[camp], ctr * (1 - ctr_drop), ctr)
+            impressions = np.maximum(1000, rng.lognormal(11.5, 0.8, n)).astype(np.int64)
+            clicks = rng.binomial(impressions, np.clip(ctr, 0, 1))
+            cvr = base_cvr[camp] * rng.lognormal(0, 0.3, n)
+            cvr = np.where(after & is_dropped[camp], cvr * (1 - roas_drop), cvr)
+            purchases = rng.binomial(clicks, np.clip(cvr, 0, 1))
+            spend = np.round(impressions / 1000 * base_cpm[camp] * rng.lognormal(0, 0.15, n), 2)
+            revenue = np.round(purchases * aov[camp] * rng.lognormal(0, 0.1, n), 2)
+            chunk = pd.DataFrame({
+                "campaign_name": campaigns[camp],
+                "adset_name": adsets[adset],
+                "date": (start + day).astype("datetime64[D]"),
+                "spend": spend,
+                "impressions": impressions,
+                "clicks": clicks.astype(np.float64),
+                "ctr": np.round(clicks / impressions, 4),
+                "purchases": purchases,
+                "revenue": revenue,
+                "roas": np.round(np.divide(revenue, spend, out=np.zeros(n), where=spend > 0), 2),
+                "creative_type": CREATIVE_TYPES[rng.integers(0, len(CREATIVE_TYPES), n)],
+                "creative_message": messages[rng.integers(0, len(messages), n)],
+                "audience_type": AUDIENCES[rng.integers(0, len(AUDIENCES), n)],
+                "platform": PLATFORMS[rng.integers(0, len(PLATFORMS), n)],
+                "country": COUNTRIES[rng.integers(0, len(COUNTRIES), n)],
+            })
+            chunk.to_csv(fh, header=(written == 0), index=False)
+            written += n
+    os.replace(tmp, path)
+
+    truth = {
+        "n_rows": int(n_rows), "n_days": int(n_days), "seed": seed,
+        "drop_start_date": str(start + drop_start_day),
+        "roas_drops": sorted(campaigns[dropped].tolist()),
+        "ctr_drops": sorted(campaigns[ctr_dropped].tolist()),
+        "roas_drop": roas_drop, "ctr_drop": ctr_drop,
+    }
+    with open(os.path.splitext(path)[0] + ".truth.json", "w") as fh:
+        json.dump(truth, fh, indent=2)
+    return truth
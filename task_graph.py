@@ -0,0 +1,95 @@
+"""
+Task graph executor:
+Runs a PlannerAgent plan as a dependency graph on a thread pool. A task starts as soon as
+everything it depends on has succeeded; a failed task only skips its own dependents.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List
+
+from utils.logger import span
+
+
+def resolve_dependencies(tasks: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Task id -> ids it depends on. Plans without "depends_on" run in priority order.
+    Raises ValueError on unknown dependencies or cycles.
+    """
+    ids = [t["id"] for t in tasks]
+    if len(set(ids)) != len(ids):
+        raise ValueError("duplicate task ids in plan")
+    if all("depends_on" not in t for t in tasks):
+        ordered = sorted(tasks, key=lambda t: t.get("priority", 0))
+        return {t["id"]: ([ordered[i - 1]["id"]] if i else []) for i, t in enumerate(ordered)}
+    deps = {t["id"]: list(t.get("depends_on") or []) for t in tasks}
+    for tid, ds in deps.items():
+        unknown = [d for d in ds if d not in deps]
+        if unknown:
+            raise ValueError(f"task {tid} depends on unknown tasks {unknown}")
+    # Kahn's algorithm, only to reject cycles up front
+    remaining = {tid: set(ds) for tid, ds in deps.items()}
+    while remaining:
+        ready = [tid for tid, ds in remaining.items() if not ds]
+        if not ready:
+            raise ValueError(f"dependency cycle among tasks {sorted(remaining)}")
+        for tid in ready:
+            del remaining[tid]
+        for ds in remaining.values():
+            ds.difference_update(ready)
+    return deps
+
+
+class TaskGraphExecutor:
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max(1, int(max_workers))
+
+    def run(self, tasks: List[Dict[str, Any]], handlers: Dict[str, Callable[[Dict[str, Any]], Any]]) -> Dict[str, Any]:
+        """
+        handlers maps a task action to fn(outputs) -> output, where outputs holds the results of
+        finished tasks keyed by action. Returns {"outputs", "tasks": per-task status/timing, "wall_s"}.
+        """
+        deps = resolve_dependencies(tasks)
+        by_id = {t["id"]: t for t in tasks}
+        missing = [t["action"] for t in tasks if t["action"] not in handlers]
+        if missing:
+            raise ValueError(f"no handler for actions {missing}")
+
+        outputs: Dict[str, Any] = {}
+        report = {tid: {"id": tid, "action": by_id[tid]["action"], "status": "pending"} for tid in deps}
+        pending = set(deps)
+        running = {}
+        t0 = time.perf_counter()
+
+        def execute(tid):
+            task = by_id[tid]
+            started = time.perf_counter()
+            with span(task["action"], task_id=tid):
+                result = handlers[task["action"]](outputs)
+            return result, started - t0, time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for tid in sorted(pending, key=lambda i: by_id[i].get("priority", 0)):
+                    states = [report[d]["status"] for d in deps[tid]]
+                    if any(s in ("failed", "skipped") for s in states):
+                        report[tid]["status"] = "skipped"
+                        pending.discard(tid)
+                    elif all(s == "ok" for s in states):
+                        report[tid]["status"] = "running"
+                        running[pool.submit(execute, tid)] = tid
+                        pending.discard(tid)
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    tid = running.pop(fut)
+                    try:
+                        result, start_s, duration_s = fut.result()
+                    except Exception as e:
+                        report[tid].update(status="failed", error=f"{type(e).__name__}: {e}")
+                        continue
+                    outputs[by_id[tid]["action"]] = result
+                    report[tid].update(status="ok", start_s=round(start_s, 4), duration_s=round(duration_s, 4))
+
+        return {"outputs": outputs, "tasks": [report[t["id"]] for t in tasks], "wall_s": round(time.perf_counter() - t0, 4)}
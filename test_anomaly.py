@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from utils.anomaly import changepoints, scan
+from utils.time_index import TimeIndex
+
+
+def _frame():
+    rng = np.random.default_rng(0)
+    rows = []
+    for i, d in enumerate(pd.date_range("2025-01-01", periods=90)):
+        for camp, roas in (("A", 1.0 if 50 <= i < 60 else 3.0), ("B", 2.0), ("C", 4.0 if i == 70 else 2.0)):
+            roas += rng.normal(0, 0.1)
+            rows.append({"campaign_name": camp, "date": d, "spend": 10.0, "impressions": 1000, "clicks": 10,
+                         "purchases": 1, "revenue": 10 * roas, "ctr": 0.01, "roas": roas})
+    return pd.DataFrame(rows)
+
+
+def test_dated_dip_recovery_and_spike():
+    index = TimeIndex.build(_frame(), ["campaign_name"])["campaign_name"]
+    events = scan(index, {})
+    shifts = {(e["entity"], e["date"], e["after"] < e["before"]) for e in events if e["detector"] == "changepoint"}
+    # a collapse 30 days before the end that recovered: both edges are dated
+    assert shifts == {("A", "2025-02-20", True), ("A", "2025-03-02", False)}
+    spikes = [e for e in events if e["detector"] == "ewma" and e["entity"] == "C" and e["z"] > 0]
+    assert [e["date"] for e in spikes] == ["2025-03-12"]
+    assert not [e for e in events if e["entity"] == "B" and e["detector"] == "changepoint"]
+
+
+def test_changepoints_skip_unobserved_days():
+    x = np.full((2, 40), 2.0) + np.random.default_rng(1).normal(0, 0.05, (2, 40))
+    x[0, 20:] -= 1.0
+    x[:, 5:10] = np.nan
+    found = changepoints(x, min_segment=5, min_t=4.0, min_shift=0.15, max_splits=2)
+    assert found["series"].tolist() == [0] and found["day"].tolist() == [20]
@@ -0,0 +1,57 @@
+import multiprocessing as mp
+import time
+
+import pytest
+
+from orchestrator.batch import consolidate, load_manifest, run_pool
+
+
+def _sleepy(account, seconds):
+    time.sleep(seconds.get(account["account_id"], 0))
+    return {"account_id": account["account_id"], "status": "ok", "duration_s": 0}
+
+
+def test_load_manifest_formats(tmp_path):
+    cfg = {"account_data_template": "data/accounts/{account_id}.csv"}
+    yaml_manifest = tmp_path / "accounts.yaml"
+    yaml_manifest.write_text("accounts:\n  - data/a.csv\n  - account_id: b\n  - {account_id: c, data_path: x/c.csv, query: q}\n")
+    assert load_manifest(str(yaml_manifest), cfg) == [
+        {"account_id": "a", "data_path": "data/a.csv", "query": None},
+        {"account_id": "b", "data_path": "data/accounts/b.csv", "query": None},
+        {"account_id": "c", "data_path": "x/c.csv", "query": "q"},
+    ]
+    text_manifest = tmp_path / "accounts.txt"
+    text_manifest.write_text("# exports\ndata/a.csv\n\ndata/b.csv\n")
+    assert [a["account_id"] for a in load_manifest(str(text_manifest), {})] == ["a", "b"]
+    text_manifest.write_text("one/a.csv\ntwo/a.csv\n")
+    with pytest.raises(ValueError, match="duplicate"):
+        load_manifest(str(text_manifest), {})
+
+
+def test_consolidate_blends_only_successful_accounts():
+    results = [
+        {"account_id": "a", "status": "ok", "hypotheses": {"h1": 2},
+         "overall": {"total_spend": 100.0, "total_revenue": 300.0, "total_impressions": 1000, "total_clicks": 10}},
+        {"account_id": "b", "status": "ok", "hypotheses": {"h1": 1, "h2": 1},
+         "overall": {"total_spend": 100.0, "total_revenue": 100.0, "total_impressions": 3000, "total_clicks": 50}},
+        {"account_id": "c", "status": "failed", "error": "FileNotFoundError: x"},
+    ]
+    summary = consolidate(results)
+    assert summary["accounts"] == 3 and summary["succeeded"] == 2
+    assert summary["failed"] == [{"account_id": "c", "error": "FileNotFoundError: x"}]
+    assert summary["blended_roas"] == 2.0 and summary["blended_ctr"] == 0.015
+    assert summary["hypotheses"] == {"h1": 3, "h2": 1}
+
+
+@pytest.mark.skipif("fork" not in mp.get_all_start_methods(), reason="needs fork")
+def test_timeouts_are_per_account_and_do_not_add_up():
+    ctx = mp.get_context("fork")
+    accounts = [{"account_id": a, "data_path": None} for a in ["slow1", "slow2", "fast1", "fast2"]]
+    t0 = time.time()
+    # both workers get stuck, so the pool is replaced for the accounts that have not started
+    results = {r["account_id"]: r for r in run_pool(ctx, accounts, _sleepy, ({"slow1": 60, "slow2": 60},),
+                                                    workers=2, timeout_s=1)}
+    assert time.time() - t0 < 10
+    assert results["slow1"]["status"] == results["slow2"]["status"] == "failed"
+    assert "TimeoutError" in results["slow1"]["error"]
+    assert results["fast1"]["status"] == results["fast2"]["status"] == "ok"
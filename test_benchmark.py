@@ -0,0 +1,21 @@
+import json
+
+from orchestrator.benchmark import STAGES, bench_size, compare, dataset_for
+
+
+def test_bench_size_times_every_stage_and_compares(tmp_path, capsys):
+    path = dataset_for(3000, str(tmp_path / "data"), 1, 6, 2, 30, 20)
+    assert dataset_for(3000, str(tmp_path / "data"), 1, 6, 2, 30, 20) == path  # generated once
+    cfg = {"dataset_cache_path": None, "phrase_index_path": None, "cube_path": None, "quality_checks": False}
+    reports = tmp_path / "reports"
+    reports.mkdir()
+    res = bench_size(cfg, path, 3000, 2, str(reports), trace_memory=True)
+    assert res["rows"] == 3000 and res["repeat"] == 2 and set(res["stages"]) == set(STAGES)
+    assert all(v["seconds_min"] <= v["seconds_median"] and v["peak_mb"] >= 0 for v in res["stages"].values())
+    assert res["counts"]["insights"] > 0 and (reports / "report.md").exists()
+
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"environment": {"git_rev": "abc"}, "results": [res]}))
+    compare({"results": [res]}, str(baseline))
+    out = capsys.readouterr().out
+    assert "rev abc" in out and all(s in out for s in STAGES)
@@ -0,0 +1,88 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from agents.data_agent import DataAgent
+from agents.insight_agent import InsightAgent
+from utils.cube import Cube
+from utils.dataset import apply_schema
+
+
+def _frame(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "campaign_name": rng.choice(["A", "B", "C"], n), "adset_name": rng.choice(["x", "y"], n),
+        "date": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 30, n), unit="D"),
+        "spend": rng.uniform(1, 100, n), "impressions": rng.integers(100, 5000, n), "clicks": rng.integers(0, 50, n),
+        "ctr": rng.uniform(0, 0.05, n), "purchases": rng.integers(0, 5, n), "revenue": rng.uniform(0, 300, n),
+        "roas": rng.uniform(0, 5, n), "audience_type": rng.choice(["Broad", "Lookalike"], n),
+        "platform": rng.choice(["Facebook", "Instagram"], n), "country": rng.choice(["US", "UK", "IN"], n),
+    })
+    return apply_schema(df)
+
+
+def test_rollups_match_groupbys():
+    df = _frame()
+    cube = Cube.build(df)
+    got = cube.rollup(["platform"], where={"country": ["US", "UK"]}, last_days=14)
+    rows = df[df["country"].isin(["US", "UK"]) & (df["date"] > df["date"].max() - pd.Timedelta(days=14))]
+    want = rows.groupby("platform")[["spend", "revenue", "clicks"]].sum()
+    assert np.allclose(got[["spend", "revenue", "clicks"]], want)
+    assert np.allclose(got["roas"], want["revenue"] / want["spend"])
+
+    daily = cube.rollup(["campaign_name", "date"], start="2025-01-05", end="2025-01-06")
+    assert set(daily.index.get_level_values("date")) <= {pd.Timestamp("2025-01-05"), pd.Timestamp("2025-01-06")}
+    assert np.isclose(daily["spend"].sum(), df.loc[df["date"].between("2025-01-05", "2025-01-06"), "spend"].sum())
+    assert np.isclose(cube.total()["avg_ctr"], df["ctr"].mean())
+    assert cube.total(where={"country": "FR"})["rows"] == 0
+
+
+def test_persisted_cube_is_memory_mapped_and_reused(tmp_path):
+    data = str(tmp_path / "ads.csv")
+    df = _frame()
+    df.to_csv(data, index=False)
+    cube = Cube.for_dataset(data, df, str(tmp_path / "cubes"))
+    assert isinstance(cube.measures["spend"], np.memmap)
+    again = Cube.for_dataset(data, df, str(tmp_path / "cubes"))
+    assert again.path == cube.path and len(again) == len(cube)
+    # pickles as its directory, not its arrays
+    restored = pickle.loads(pickle.dumps(again))
+    assert len(pickle.dumps(again)) < 1000
+    assert restored.total()["spend"] == cube.total()["spend"]
+    # data-quality options change the frame, so they get their own cube
+    recomputed = Cube.for_dataset(data, df.assign(ctr=df["clicks"] / df["impressions"]), str(tmp_path / "cubes"),
+                                  quality={"recompute_ratios": True})
+    assert recomputed.path != cube.path
+    assert np.isclose(recomputed.total()["avg_ctr"], (df["clicks"] / df["impressions"]).mean())
+
+
+def test_missing_keys_count_in_totals_but_form_no_group(tmp_path):
+    df = _frame()
+    df.loc[::7, "campaign_name"] = np.nan
+    df.loc[::5, "adset_name"] = np.nan
+    cube = Cube.build(df)
+    assert cube.total()["rows"] == len(df)
+    by_campaign = cube.rollup(["campaign_name"])
+    assert list(by_campaign.index) == ["A", "B", "C"]
+    assert np.allclose(by_campaign["spend"], df.groupby("campaign_name")["spend"].sum())
+
+    # insights from the cube match the groupby path entity for entity
+    agent = InsightAgent({"recent_window_days": 7, "previous_window_days": 14,
+                          "insight_grains": ["campaign_name", "adset_name"]})
+    expected = agent.window_frame(df, agent.grains)
+    agent.cube = cube
+    for g, index in agent.cube_indexes(agent.grains).items():
+        frame = index.window_frame(7, 14)
+        assert list(frame.index) == list(expected[g].index)
+        assert np.allclose(frame["roas_last"], expected[g]["roas_last"])
+
+    data = str(tmp_path / "ads.csv")
+    df.to_csv(data, index=False)
+    summaries = [DataAgent(data, {"streaming": False, "use_cube": use_cube}).load_and_summarize()
+                 for use_cube in (True, False)]
+    assert [r["campaign_name"] for r in summaries[0]["by_campaign"]] == ["A", "B", "C"]
+    for a, b in zip(*(s["by_campaign"] for s in summaries)):
+        assert all(np.isclose(a[k], b[k]) for k in a if k != "campaign_name")
+    # the cube is opt-in
+    assert "cube" in summaries[0] and "cube" not in DataAgent(data, {"streaming": False}).load_and_summarize()
@@ -0,0 +1,101 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from agents.data_agent import DataAgent
+from utils.time_index import daily_cells, merge_cells
+
+CONFIG = {"streaming": False, "use_cube": False, "low_ctr_limit": 3}
+
+
+def _write(path, n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    impressions = rng.integers(100, 5000, n)
+    clicks = rng.integers(0, 50, n)
+    spend = rng.uniform(1, 100, n).round(2)
+    revenue = rng.uniform(0, 300, n).round(2)
+    pd.DataFrame({
+        "campaign_name": rng.choice(["A", "B", "C"], n), "adset_name": rng.choice(["x", "y"], n),
+        "date": (pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 28, n), unit="D")).strftime("%Y-%m-%d"),
+        "spend": spend, "impressions": impressions, "clicks": clicks, "ctr": (clicks / impressions).round(4),
+        "purchases": rng.integers(0, 5, n), "revenue": revenue, "roas": (revenue / spend).round(2),
+        "creative_type": "Image", "creative_message": "soft cotton", "audience_type": "Broad",
+        "platform": "Facebook", "country": "US",
+    }).to_csv(path, index=False)
+
+
+def test_summary_is_self_contained(tmp_path):
+    data = str(tmp_path / "ads.csv")
+    _write(data)
+    summary = DataAgent(data, CONFIG).load_and_summarize()
+    # only the best-ranked records are kept, not a view over the whole frame
+    assert isinstance(summary["low_ctr_ads"], list) and len(summary["low_ctr_ads"]) == 3
+    assert summary["low_ctr"]["count"] >= 3 and summary["low_ctr"]["rank_by"] == "impressions"
+    impressions = [r["impressions"] for r in summary["low_ctr_ads"]]
+    assert impressions == sorted(impressions, reverse=True)
+    assert json.loads(json.dumps(summary, default=str))["low_ctr_ads"][0]["campaign_name"] in "ABC"
+
+
+def test_low_ctr_limit_is_separate_from_the_streaming_candidate_set(tmp_path):
+    data = str(tmp_path / "ads.csv")
+    _write(data)
+    config = dict(CONFIG, low_ctr_limit=4, stream_low_ctr_limit=2)
+    assert len(DataAgent(data, config).load_and_summarize()["low_ctr_ads"]) == 4
+    streamed = DataAgent(data, dict(config, streaming=True, stream_chunk_rows=37)).load_and_summarize()
+    assert len(streamed["low_ctr_ads"]) == 2
+
+
+def test_streaming_summary_matches_in_memory_and_serializes(tmp_path):
+    data = str(tmp_path / "ads.csv")
+    _write(data)
+    full = DataAgent(data, CONFIG).load_and_summarize()
+    streamed = DataAgent(data, dict(CONFIG, streaming=True, stream_chunk_rows=37)).load_and_summarize()
+    restored = json.loads(json.dumps(streamed, default=str))
+    assert restored["by_campaign"] == json.loads(json.dumps(streamed["by_campaign"]))
+    assert [r["campaign_name"] for r in restored["by_campaign"]] == ["A", "B", "C"]
+    for a, b in zip(full["by_campaign"], streamed["by_campaign"]):
+        assert a.keys() == b.keys()
+        assert all(np.isclose(a[k], b[k]) for k in a if k != "campaign_name")
+
+    empty = str(tmp_path / "empty.csv")
+    pd.read_csv(data, nrows=0).to_csv(empty, index=False)
+    summary = DataAgent(empty, dict(CONFIG, streaming=True)).load_and_summarize()
+    assert summary["by_campaign"] == [] and summary["overall"]["n_rows"] == 0
+
+
+def test_streaming_merges_the_daily_cells_of_every_chunk(tmp_path):
+    data = str(tmp_path / "ads.csv")
+    _write(data)
+    agent = DataAgent(data, dict(CONFIG, streaming=True, stream_chunk_rows=37))
+    agent.cell_grains = ["campaign_name", "adset_name"]
+    cells = agent.load_and_summarize()["cells"]
+    expected = merge_cells(None, daily_cells(agent.load_df(), agent.cell_grains, squares=True))
+    pd.testing.assert_frame_equal(cells, expected[cells.columns], check_dtype=False)
+
+
+def test_compact_summary_matches_full_precision(tmp_path):
+    data = str(tmp_path / "ads.csv")
+    _write(data, n=2000)
+    full = DataAgent(data, dict(CONFIG, compact_dtypes=False)).load_and_summarize()
+    compact = DataAgent(data, dict(CONFIG, compact_dtypes=True)).load_and_summarize()
+    for k, v in full["overall"].items():
+        if isinstance(v, float):
+            assert np.isclose(compact["overall"][k], v, rtol=1e-6), k
+        else:
+            assert compact["overall"][k] == v, k
+    for a, b in zip(full["by_campaign"], compact["by_campaign"]):
+        assert all(np.isclose(a[k], b[k], rtol=1e-6) for k in a if k != "campaign_name")
+    assert [r["ctr"] for r in compact["low_ctr_ads"]] == [r["ctr"] for r in full["low_ctr_ads"]]
+    assert compact["dataset_memory"]["saved_mb"] > 0
+
+
+def test_validated_compact_averages_accumulate_in_float64(tmp_path):
+    data = str(tmp_path / "ads.csv")
+    _write(data, n=2000)
+    agent = DataAgent(data, dict(CONFIG, compact_dtypes=True, quality_checks=True))
+    overall = agent.load_and_summarize()["overall"]
+    df = agent.load_df()
+    assert df["ctr"].dtype == np.float32 and "quality" in df.attrs
+    assert overall["average_ctr"] == float(df["ctr"].astype(np.float64).mean())
+    assert overall["average_roas"] == float(df["roas"].astype(np.float64).mean())
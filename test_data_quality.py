@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from utils.data_quality import DEFAULT_QUARANTINE, validate, options_from_config
+from utils.dataset import load_dataset, clear_memo
+
+ROWS = [
+    # campaign, date, spend, impressions, clicks, ctr, purchases, revenue, roas
+    ["A", "2025-01-01", "10", "1000", "20", "0.02", "1", "30", "3.0"],        # clean
+    ["A", "2025-01-01", "10", "1000", "20", "0.02", "1", "30", "3.0"],        # duplicate
+    ["A", "", "10", "1000", "20", "0.02", "1", "30", "3.0"],                  # missing_date
+    ["A", "not a date", "10", "1000", "20", "0.02", "1", "30", "3.0"],        # bad_date
+    ["B", "2025-01-02", "ten", "1000", "20", "0.02", "1", "30", "3.0"],       # bad_number
+    ["B", "2025-01-02", "-5", "1000", "20", "0.02", "1", "30", "3.0"],        # negative
+    ["B", "2025-01-03", "10", "100", "200", "0.02", "1", "30", "3.0"],        # clicks_gt_impressions (+ ctr_mismatch)
+    ["B", "2025-01-03", "10", "1000", "20", "0.5", "1", "30", "3.0"],         # ctr_mismatch (flagged only)
+    ["C", "2025-01-04", "20", "2000", "30", "0.015", "2", "100", "2.0"],      # roas_mismatch (flagged only)
+    ["C", "2025-01-05", "5", "500", "5", "0.01", "0", "10", "2.0"],           # clean
+]
+COLUMNS = ["campaign_name", "date", "spend", "impressions", "clicks", "ctr", "purchases", "revenue", "roas"]
+
+
+def _frame():
+    return pd.DataFrame(ROWS, columns=COLUMNS).replace("", np.nan)
+
+
+def test_single_scan_flags_and_quarantines_each_reason():
+    clean, quarantined, report = validate(_frame())
+    assert report["rows"] == 10 and report["quarantined"] == 6 and report["clean_rows"] == 4
+    assert list(quarantined["source_row"]) == [1, 2, 3, 4, 5, 6]
+    assert list(quarantined["reasons"]) == ["duplicate", "missing_date", "bad_date", "bad_number", "negative",
+                                            "clicks_gt_impressions;ctr_mismatch"]
+    # quarantined rows keep their values as read
+    assert quarantined["spend"].iloc[3] == "ten"
+    assert report["flagged"]["ctr_mismatch"] == 2 and report["flagged"]["roas_mismatch"] == 1
+    # mismatches are only flagged by default, and the clean frame has the schema applied
+    assert len(clean) == 4 and clean["spend"].dtype.kind == "f" and str(clean["date"].dtype).startswith("datetime64")
+    assert clean["ctr"].tolist() == [0.02, 0.5, 0.015, 0.01]
+
+
+def test_recompute_ratios_from_raw_counts():
+    clean, _, report = validate(_frame(), quarantine=DEFAULT_QUARANTINE, recompute_ratios=True)
+    assert np.allclose(clean["ctr"], clean["clicks"] / clean["impressions"])
+    assert np.allclose(clean["roas"], clean["revenue"] / clean["spend"])
+    assert report["recomputed"]["ctr"] >= 1 and report["recomputed"]["roas"] >= 1
+
+
+def test_load_dataset_writes_quarantine_and_caches_report(tmp_path):
+    data = str(tmp_path / "ads.csv")
+    _frame().to_csv(data, index=False)
+    options = options_from_config({"quality_checks": True, "quality_quarantine_path": str(tmp_path / "q")})
+    cache = str(tmp_path / "cache")
+    clear_memo()
+    df = load_dataset(data, cache_dir=cache, quality=options)
+    assert len(df) == 4 and df.attrs["quality"]["quarantined"] == 6
+    quarantined = pd.read_csv(tmp_path / "q" / "ads.quarantine.csv")
+    assert len(quarantined) == 6 and "reasons" in quarantined.columns
+
+    # from the on-disk cache, with the report restored; without quality the full file is read
+    clear_memo()
+    again = load_dataset(data, cache_dir=cache, quality=options)
+    assert len(again) == 4 and again.attrs["quality"] == df.attrs["quality"]
+    clear_memo()
+    assert len(load_dataset(data, cache_dir=cache)) == 10
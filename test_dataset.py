@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from utils import dataset
+
+CSV = """campaign_name,adset_name,date,spend,impressions,clicks,ctr,purchases,revenue,roas,creative_type,creative_message,audience_type,platform,country
+A,s1,2025-01-01,10.5,1000,20,0.02,2,50,4.76,Image,Soft cotton,Broad,Facebook,US
+B,s2,2025-01-02,bad,500,,0.01,1,10,1.0,Video,,Lookalike,Instagram,UK
+"""
+
+def test_cache_roundtrip_skips_parsing(tmp_path, monkeypatch):
+    path = tmp_path / "ads.csv"
+    path.write_text(CSV)
+    cache_dir = str(tmp_path / "cache")
+
+    first = dataset.load_dataset(str(path), cache_dir=cache_dir)
+    assert first["spend"].tolist() == [10.5, 0.0]
+    assert first["clicks"].tolist() == [20.0, 0.0]
+
+    dataset.clear_memo()
+    monkeypatch.setattr(dataset, "parse_csv", lambda p: (_ for _ in ()).throw(AssertionError("parsed again")))
+    second = dataset.load_dataset(str(path), cache_dir=cache_dir)
+    assert second["campaign_name"].tolist() == ["A", "B"]
+    assert second["creative_message"].isna().tolist() == [False, True]
+    assert second["date"].dt.strftime("%Y-%m-%d").tolist() == ["2025-01-01", "2025-01-02"]
+
+
+def test_compact_frame_downcasts_and_records_widen_back():
+    df = pd.DataFrame({"campaign_name": ["A", "B", "A"], "spend": [1.25, 2.5, 3.0],
+                       "impressions": [1000.0, 2000.0, 3000.0], "clicks": [1.0, 2.5, 3.0],
+                       "ctr": [0.0091, 0.02, 0.001], "roas": [1.5, 2.0, 0.25]})
+    compact = dataset.compact_frame(df)
+    assert isinstance(compact["campaign_name"].dtype, pd.CategoricalDtype)
+    assert compact["impressions"].dtype == np.int32
+    assert compact["clicks"].dtype == np.float64  # not integral: left as is
+    assert compact["ctr"].dtype == compact["roas"].dtype == np.float32
+    assert compact["spend"].dtype == np.float64  # money stays float64
+    records = dataset.to_records(compact, 0)
+    assert records[0]["ctr"] == 0.0091 and records[0]["campaign_name"] == "A"
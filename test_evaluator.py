@@ -1,4 +1,4 @@
-from src.agents.evaluator_agent import EvaluatorAgent
+from agents.evaluator_agent import EvaluatorAgent
 
 def test_evaluator_low_ctr_boosts_confidence():
     cfg = {"roas_drop_pct": 0.15, "ctr_drop_pct": 0.10, "min_impressions_for_confidence": 1000}
@@ -13,3 +13,18 @@ def test_evaluator_low_ctr_boosts_confidence():
     ]
     validated = evalr.validate(insights, {})
     assert validated[0]["confidence"] >= 0.8
+
+def test_untestable_significance_shrinks_confidence_and_says_so():
+    import pandas as pd
+    from utils.time_index import daily_cells
+
+    # one day in each window: no variance, so the Welch test cannot run
+    df = pd.DataFrame({"campaign_name": ["A", "A"], "date": pd.to_datetime(["2025-01-20", "2025-02-10"]),
+                       "spend": [100.0, 100.0], "impressions": [1000, 1000], "clicks": [20, 10],
+                       "purchases": [5, 2], "revenue": [300.0, 100.0], "ctr": [0.02, 0.01], "roas": [3.0, 1.0]})
+    insight = {"grain": "campaign_name", "entity": "A", "hypothesis": "ROAS down", "confidence": 0.9,
+               "evidence": {"roas_pct_change": -0.67}, "validation_notes": ""}
+    out = EvaluatorAgent({}).attach_significance([insight], cells=daily_cells(df, ["campaign_name"], squares=True))
+    assert out[0]["evidence"]["roas_p_value"] is None
+    assert out[0]["confidence"] == 0.7
+    assert out[0]["validation_notes"].endswith("significance not testable (insufficient days)")
@@ -0,0 +1,84 @@
+import pandas as pd
+
+from utils.dataset import clear_memo
+from utils.incremental import AggregateCheckpoint
+
+COLUMNS = ["campaign_name", "date", "spend", "impressions", "clicks", "ctr", "purchases", "revenue", "roas"]
+
+
+def _rows(day, spend):
+    return [["A", day, spend, 100, 2, 0.02, 1, 2 * spend, 2.0], ["B", day, 1.0, 50, 1, 0.02, 0, 0.0, 0.0]]
+
+
+def _write(path, rows, mode="w"):
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, mode=mode, header=(mode == "w"), index=False)
+
+
+def test_appended_and_restated_days(tmp_path):
+    data, ck_dir = str(tmp_path / "ads.csv"), str(tmp_path / "ck")
+    _write(data, _rows("2025-01-01", 10.0) + _rows("2025-01-02", 20.0))
+    _, stats = AggregateCheckpoint(ck_dir, ["campaign_name"]).ingest(data)
+    assert stats["mode"] == "full"
+
+    # a new day plus a corrected copy of 2025-01-01
+    _write(data, _rows("2025-01-03", 30.0) + _rows("2025-01-01", 15.0), mode="a")
+    ck = AggregateCheckpoint(ck_dir, ["campaign_name"])
+    tail, stats = ck.ingest(data)
+    assert stats["mode"] == "tail" and len(tail) == 4
+    assert stats["new_days"] == 1 and stats["restated_days"] == 1
+    assert ck.meta["watermark"] == "2025-01-03"
+    spend = ck.cells["spend"].xs("A", level="campaign_name")
+    assert spend.tolist() == [15.0, 20.0, 30.0]
+
+    # same totals as aggregating the corrected history from scratch
+    clear_memo()
+    fresh = str(tmp_path / "fresh.csv")
+    _write(fresh, _rows("2025-01-01", 15.0) + _rows("2025-01-02", 20.0) + _rows("2025-01-03", 30.0))
+    full = AggregateCheckpoint(str(tmp_path / "ck_full"), ["campaign_name"])
+    full.ingest(fresh)
+    pd.testing.assert_frame_equal(ck.cells, full.cells, check_dtype=False)
+
+
+def test_rewritten_file_triggers_rebuild(tmp_path):
+    data, ck_dir = str(tmp_path / "ads.csv"), str(tmp_path / "ck")
+    _write(data, _rows("2025-01-01", 10.0))
+    AggregateCheckpoint(ck_dir, ["campaign_name"]).ingest(data)
+    clear_memo()
+    _write(data, _rows("2025-02-01", 5.0) + _rows("2025-02-02", 5.0))
+    _, stats = AggregateCheckpoint(ck_dir, ["campaign_name"]).ingest(data)
+    assert stats["mode"] == "full" and stats["rows_read"] == 4
+
+
+def test_split_latest_day_is_added_not_restated(tmp_path):
+    data, ck_dir = str(tmp_path / "ads.csv"), str(tmp_path / "ck")
+    day1, day2, day3 = _rows("2025-01-01", 10.0), _rows("2025-01-02", 20.0), _rows("2025-01-03", 30.0)
+    # the export writes 2025-01-02 in two parts, across two runs
+    _write(data, day1 + day2[:1])
+    AggregateCheckpoint(ck_dir, ["campaign_name"]).ingest(data)
+    _write(data, day2[1:] + day3, mode="a")
+    ck = AggregateCheckpoint(ck_dir, ["campaign_name"])
+    _, stats = ck.ingest(data)
+    assert stats["restated_days"] == 0 and stats["new_days"] == 1
+
+    clear_memo()
+    fresh = str(tmp_path / "fresh.csv")
+    _write(fresh, day1 + day2 + day3)
+    full = AggregateCheckpoint(str(tmp_path / "ck_full"), ["campaign_name"])
+    full.ingest(fresh)
+    pd.testing.assert_frame_equal(ck.cells, full.cells, check_dtype=False)
+
+
+def test_late_row_for_one_entity_replaces_only_its_cell(tmp_path):
+    data, ck_dir = str(tmp_path / "ads.csv"), str(tmp_path / "ck")
+    rows = [[c, day, 10.0, 100, 2, 0.02, 1, 20.0, 2.0] for day in ("2025-01-01", "2025-01-02", "2025-01-03")
+            for c in ("A", "B", "C")]
+    _write(data, rows)
+    AggregateCheckpoint(ck_dir, ["campaign_name"]).ingest(data)
+    # one correction row for campaign A on an earlier day
+    _write(data, [["A", "2025-01-02", 4.0, 100, 2, 0.02, 1, 8.0, 2.0]], mode="a")
+    ck = AggregateCheckpoint(ck_dir, ["campaign_name"])
+    _, stats = ck.ingest(data)
+    assert stats["restated_days"] == 1 and stats["restated_cells"] == 1
+    day = ck.cells.xs(pd.Timestamp("2025-01-02"), level="date")["spend"]
+    assert day.to_dict() == {"A": 4.0, "B": 10.0, "C": 10.0}
+    assert ck.cells["spend"].sum() == 84.0
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from agents.insight_agent import InsightAgent
+from utils.incremental import AggregateCheckpoint
+
+CONFIG = {"recent_window_days": 7, "previous_window_days": 14, "insight_grains": ["campaign_name", "adset_name"]}
+
+
+def _frame(n=3000, seed=1):
+    rng = np.random.default_rng(seed)
+    impressions = rng.integers(100, 5000, n).astype(float)
+    clicks = rng.integers(0, 80, n).astype(float)
+    spend = rng.uniform(1, 100, n)
+    revenue = spend * rng.uniform(0, 4, n)
+    campaign = rng.choice(["A", "B", "C", "D"], n).astype(object)
+    adset = rng.choice(["x", "y"], n).astype(object)
+    campaign[rng.random(n) < 0.05] = np.nan
+    adset[rng.random(n) < 0.05] = np.nan
+    return pd.DataFrame({
+        "campaign_name": campaign, "adset_name": adset,
+        "date": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 40, n), unit="D"),
+        "spend": spend, "impressions": impressions, "clicks": clicks, "ctr": clicks / impressions,
+        "purchases": rng.integers(0, 5, n).astype(float), "revenue": revenue, "roas": revenue / spend,
+    })
+
+
+def _per_campaign_loop(df, recent_days, prev_days):
+    # the per-entity loop window_frame replaced
+    today = df["date"].max()
+    recent_cut = today - pd.Timedelta(days=recent_days)
+    prev_cut = recent_cut - pd.Timedelta(days=prev_days)
+    out = {}
+    for camp, g in df.groupby("campaign_name"):
+        last = g[g["date"] > recent_cut]
+        prev = g[(g["date"] <= recent_cut) & (g["date"] > prev_cut)]
+        if len(last) < 1 or len(prev) < 1:
+            continue
+        out[str(camp)] = {"roas_prev": prev["roas"].mean(), "roas_last": last["roas"].mean(),
+                          "ctr_prev": prev["ctr"].mean(), "ctr_last": last["ctr"].mean(),
+                          "spend_prev": prev["spend"].sum(), "spend_last": last["spend"].sum(),
+                          "impressions_prev": prev["impressions"].sum(), "impressions_last": last["impressions"].sum()}
+    return out
+
+
+def test_window_frame_matches_the_per_entity_loop():
+    df = _frame()
+    agent = InsightAgent(CONFIG)
+    frames = agent.window_frame(df, agent.grains)
+    expected = _per_campaign_loop(df, 7, 14)
+    frame = frames["campaign_name"]
+    # rows without a campaign form no entity, but rows without an adset still count for their campaign
+    assert sorted(frame.index) == sorted(expected) == ["A", "B", "C", "D"]
+    for camp, values in expected.items():
+        for k, v in values.items():
+            assert np.isclose(frame.loc[camp, k], v), (camp, k)
+    assert sorted(frames["adset_name"].index) == ["x", "y"]
+
+
+def test_stored_cells_give_the_same_windows_without_nan_entities(tmp_path):
+    df = _frame()
+    agent = InsightAgent(CONFIG)
+    data = str(tmp_path / "ads.csv")
+    df.to_csv(data, index=False)
+    ck = AggregateCheckpoint(str(tmp_path / "ck"), agent.grains)
+    ck.ingest(data)
+    # through the saved checkpoint, so missing keys survive the round trip
+    reloaded = AggregateCheckpoint(str(tmp_path / "ck"), agent.grains)
+    assert reloaded.load()
+    agent.cells = reloaded.cells
+    expected = agent.window_frame(df, agent.grains)
+    for g, index in agent.time_indexes(agent.grains).items():
+        frame = index.window_frame(7, 14)
+        assert list(frame.index) == list(expected[g].index)
+        assert np.allclose(frame["roas_last"], expected[g]["roas_last"])
@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+
+from utils.io_utils import RecordWriter, read_json, read_jsonl, write_json, write_records
+
+RECORDS = [{"campaign": f"C{i}", "confidence": i / 10, "evidence": {"roas": [1.5, 2.0], "note": "a\nb"}}
+           for i in range(5)]
+
+
+def test_streamed_json_matches_json_dump_and_jsonl_round_trips(tmp_path):
+    stem = str(tmp_path / "out" / "insights")
+    paths = write_records(stem, iter(RECORDS), ["json", "jsonl"], batch_rows=2)
+    assert paths == {"json": stem + ".json", "jsonl": stem + ".jsonl"}
+    with open(paths["json"]) as fh:
+        assert fh.read() == json.dumps(RECORDS, indent=2)
+    assert read_jsonl(paths["jsonl"]) == RECORDS
+    write_records(stem, [], ["json"])
+    assert read_json(stem + ".json") == []
+
+
+def test_failed_write_keeps_previous_file_and_leaves_no_partial(tmp_path):
+    path = str(tmp_path / "creatives.jsonl")
+    write_json(path, {"old": True})
+
+    def records():
+        yield RECORDS[0]
+        raise RuntimeError("generator failed")
+
+    with pytest.raises(RuntimeError):
+        with RecordWriter(path, "jsonl") as w:
+            w.write_many(records())
+    assert read_json(path) == {"old": True}
+    assert os.listdir(tmp_path) == ["creatives.jsonl"]
+
+
+def test_concurrent_writers_of_one_path_do_not_clobber_each_other(tmp_path):
+    path = str(tmp_path / "insights.jsonl")
+    first = RecordWriter(path, "jsonl")
+    first.write(RECORDS[0])
+    # while a writer is open, <path>.partial follows its temp file
+    assert os.path.islink(path + ".partial")
+    with RecordWriter(path, "jsonl") as second:
+        second.write_many(RECORDS[1:3])
+    first.write(RECORDS[3])
+    first.close()
+    assert read_jsonl(path) == [RECORDS[0], RECORDS[3]]
+    assert os.listdir(tmp_path) == ["insights.jsonl"]
+
+
+def test_parquet_row_groups(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "insights.parquet")
+    with RecordWriter(path, "parquet", batch_rows=2) as w:
+        w.write_many(RECORDS)
+    table = pq.read_table(path)
+    assert pq.ParquetFile(path).num_row_groups == 3
+    assert table.column("campaign").to_pylist() == [r["campaign"] for r in RECORDS]
+    assert json.loads(table.column("evidence")[0].as_py()) == RECORDS[0]["evidence"]
+
+
+def test_parquet_keeps_keys_missing_from_the_first_row_group(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    # window insights first, then anomaly insights with a date the earlier records lack
+    records = RECORDS[:2] + [dict(RECORDS[2], date="2025-03-01", z=4.5)]
+    inferred, declared = str(tmp_path / "inferred.parquet"), str(tmp_path / "declared.parquet")
+    with RecordWriter(inferred, "parquet", batch_rows=2) as w:
+        w.write_many(records)
+    extra = pq.read_table(inferred).column("_extra").to_pylist()
+    assert extra[:2] == [None, None] and json.loads(extra[2]) == {"date": "2025-03-01", "z": 4.5}
+
+    columns = list(dict.fromkeys(k for r in records for k in r))
+    with RecordWriter(declared, "parquet", batch_rows=2, columns=columns) as w:
+        w.write_many(records)
+    table = pq.read_table(declared)
+    assert table.column("date").to_pylist() == [None, None, "2025-03-01"]
+    # no value in the first row group to type it by, so z is stored as JSON text
+    assert table.column("z").to_pylist() == [None, None, "4.5"]
@@ -0,0 +1,30 @@
+from utils.llm_cache import ResponseCache
+from utils.llm_client import LLMCreativeClient, StubBackend
+
+
+def test_batched_generation_is_cached_and_deduplicated(tmp_path):
+    ads = [{"campaign_name": f"C{i}", "creative_message": f"Soft cotton briefs v{i % 5}", "ctr": 0.01} for i in range(12)]
+    backend = StubBackend()
+    try:
+        client = LLMCreativeClient(backend, "stub-model", cache=ResponseCache(str(tmp_path / "llm.sqlite")),
+                                   batch_size=2, max_concurrency=3, rate_per_s=100)
+        first, stats = client.generate(ads)
+        assert stats["unique_uncached"] == 5 and stats["requests"] == 3 and stats["cache_hits"] == 0
+        assert all(v and len(v) == 3 for v in first)
+        assert first[0] == first[5]  # same message, same variants
+
+        again, stats = client.generate(ads)
+        assert again == first
+        assert stats["requests"] == 0 and stats["cache_hits"] == 12
+        assert backend.server.requests == 3
+    finally:
+        backend.close()
+
+
+def test_backend_defaults_to_http_and_the_stub_is_reported(capsys):
+    client = LLMCreativeClient.from_config({"use_llm": True, "llm_cache_path": None})
+    assert client.backend.name == "http"
+    client.close()
+    with LLMCreativeClient.from_config({"llm_backend": "stub", "llm_cache_path": None}) as client:
+        _, stats = client.generate([{"campaign_name": "A", "creative_message": "Soft cotton", "ctr": 0.01}])
+    assert stats["backend"] == "stub" and "llm_backend is 'stub'" in capsys.readouterr().out
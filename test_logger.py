@@ -0,0 +1,78 @@
+import json
+import os
+import tracemalloc
+from datetime import datetime
+
+import pytest
+
+from utils import logger
+from utils.logger import JsonlSink
+
+
+def _events(path):
+    with open(path) as fh:
+        return [json.loads(line) for line in fh]
+
+
+@pytest.fixture
+def traced(tmp_path, monkeypatch):
+    for name in ("_SINK", "_ECHO", "_TRACE_MEMORY"):
+        monkeypatch.setattr(logger, name, getattr(logger, name))
+    was_tracing = tracemalloc.is_tracing()
+    path = str(tmp_path / "logs" / "run_logs.jsonl")
+    logger.configure(path, echo=False, trace_memory=True, buffer_events=1)
+    yield path
+    if not was_tracing:
+        tracemalloc.stop()
+
+
+def test_events_are_buffered_until_flush(tmp_path):
+    path = str(tmp_path / "run_logs.jsonl")
+    sink = JsonlSink(path, buffer_events=3, flush_interval_s=3600)
+    sink.write({"event": "a"})
+    sink.write({"event": "b"})
+    assert not os.path.exists(path)
+    sink.write({"event": "c"})
+    sink.write({"event": "d"})
+    assert [e["event"] for e in _events(path)] == ["a", "b", "c"]
+    sink.flush()
+    assert [e["event"] for e in _events(path)] == ["a", "b", "c", "d"]
+
+
+def test_rotation_by_size_and_by_age_of_the_first_event(tmp_path):
+    path = str(tmp_path / "run_logs.jsonl")
+    sink = JsonlSink(path, buffer_events=1, max_bytes=50, backup_count=2)
+    for i in range(4):
+        sink.write({"event": "x" * 60, "i": i})
+    assert [e["i"] for e in _events(path)] == [3]
+    assert [e["i"] for e in _events(path + ".1")] == [2]
+    assert [e["i"] for e in _events(path + ".2")] == [1]
+
+    # a new run (new sink) judges age from the segment's first event, not from when it started
+    aged = str(tmp_path / "aged.jsonl")
+    JsonlSink(aged, buffer_events=1).write({"time": "2020-01-01T00:00:00Z", "event": "old"})
+    sink = JsonlSink(aged, buffer_events=1, rotate_interval_s=3600)
+    sink.write({"time": datetime.utcnow().isoformat() + "Z", "event": "new"})
+    assert [e["event"] for e in _events(aged + ".1")] == ["old"]
+    JsonlSink(aged, buffer_events=1, rotate_interval_s=3600).write({"event": "recent"})
+    assert [e["event"] for e in _events(aged)] == ["new", "recent"]
+
+
+def test_spans_that_close_out_of_order_keep_their_own_peaks(traced):
+    # as with spans on two threads: a allocates, b opens, a closes first
+    a = logger.span("a")
+    a.__enter__()
+    block = bytearray(40 * 1024 * 1024)
+    del block
+    b = logger.span("b")
+    b.__enter__()
+    a.__exit__(None, None, None)
+    b.__exit__(None, None, None)
+    with pytest.raises(ValueError):
+        with logger.span("c", rows=1):
+            raise ValueError("stage failed")
+    logger.flush()
+    spans = {e["payload"]["stage"]: e["payload"] for e in _events(traced) if e["event"] == "STAGE_SPAN"}
+    assert spans["a"]["py_peak_mb"] >= 40
+    assert spans["b"]["py_peak_mb"] < 10
+    assert spans["c"]["status"] == "error" and spans["c"]["rows"] == 1
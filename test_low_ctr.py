@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from utils.low_ctr import LowCtrView, top_positions
+
+
+def test_top_positions_matches_full_sort():
+    rng = np.random.default_rng(0)
+    key = rng.integers(0, 50, 1000).astype(float)
+    full = np.lexsort((np.arange(len(key)), -key))
+    for k in (0, 1, 7, 999, 1000, 5000):
+        assert top_positions(key, k).tolist() == full[:k].tolist()
+
+
+def test_view_ranks_low_ctr_rows_lazily():
+    df = pd.DataFrame({"campaign_name": list("abcdef"), "ctr": [0.01, 0.05, 0.002, 0.01, 0.03, 0.004],
+                       "impressions": [100, 900, 300, 500, 50, 300], "spend": [10.0, 5.0, 1.0, 2.0, 3.0, 8.0]})
+    view = LowCtrView.from_frame(df, cutoff=0.01, columns=["campaign_name", "impressions"])
+    assert len(view) == 4
+    assert [r["campaign_name"] for r in view[:3]] == ["d", "c", "f"]
+    assert view[-1]["campaign_name"] == "a"
+    assert [r["campaign_name"] for r in view] == ["d", "c", "f", "a"]
+    assert view.arrays(2)["impressions"].tolist() == [500, 300]
+    wasted = LowCtrView.from_frame(df, cutoff=0.01, rank_by="wasted_spend")
+    assert wasted.records(1)[0]["campaign_name"] == "f"
+    assert view.arrays(0)["campaign_name"].tolist() == []
+    assert view.top(2).columns.tolist() == ["campaign_name", "impressions"]
+    assert view.to_dict(k=1) == {"count": 4, "cutoff": 0.01, "rank_by": "impressions",
+                                 "top": [{"campaign_name": "d", "impressions": 500}]}
@@ -0,0 +1,40 @@
+import json
+
+from utils.memory_store import MemoryStore
+
+DAY = 86400.0
+
+def test_upsert_decay_and_ttl(tmp_path):
+    store = MemoryStore(str(tmp_path / "mem.sqlite"), ttl_days=30, half_life_days=10)
+    store.upsert_many([{"campaign": "A", "hypothesis": "h", "confidence": 0.8},
+                       {"campaign": "B", "hypothesis": "h", "confidence": 0.6}], now=0.0)
+    store.upsert_many([{"campaign": "A", "hypothesis": "h", "confidence": 0.5}], now=10 * DAY)
+    assert store.count() == 2
+
+    found = store.lookup_many([("A", "h"), ("B", "h"), ("C", "h")], now=10 * DAY)
+    assert set(found) == {("A", "h"), ("B", "h")}
+    # A was refreshed at day 10 keeping the decayed 0.8 -> 0.4 vs new 0.5
+    assert found[("A", "h")]["confidence"] == 0.5
+    assert found[("A", "h")]["hits"] == 2
+    assert found[("B", "h")]["confidence"] == 0.3
+
+    # B was last seen at day 0 and expires after 30 days
+    store.upsert_many([], now=35 * DAY)
+    assert store.count() == 1
+    store.close()
+
+
+def test_legacy_json_is_imported_once_when_the_store_opens(tmp_path):
+    legacy = tmp_path / "short_term_memory.json"
+    legacy.write_text(json.dumps([{"campaign": "A", "hypothesis": "h", "confidence": 0.7}]))
+    cfg = {"legacy_memory_path": str(legacy)}
+    path = str(tmp_path / "mem.sqlite")
+    with MemoryStore.from_config(path, cfg) as store:
+        assert ("A", "h") in store.lookup_many([("A", "h")])
+    assert not legacy.exists() and (tmp_path / "short_term_memory.json.migrated").exists()
+
+    # a second run that still saw the file (renamed meanwhile, or restored) does not import it again
+    legacy.write_text(json.dumps([{"campaign": "B", "hypothesis": "h", "confidence": 0.7}]))
+    with MemoryStore(path) as store:
+        assert store.import_json(str(legacy)) == 0 and store.count() == 1
+        assert store.import_json(str(tmp_path / "gone.json")) == 0
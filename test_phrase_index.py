@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.phrase_index import PhraseIndex, phrases, tokenize
+
+
+def test_phrases_and_weighted_metrics(tmp_path):
+    df = pd.DataFrame({
+        "creative_message": ["Soft cotton briefs", "Soft waistband", "Bold colors briefs", "Soft cotton briefs", None],
+        "impressions": [1000, 3000, 2000, 1000, 500],
+        "ctr": [0.02, 0.01, 0.03, 0.04, 0.01],
+        "spend": [10.0, 30.0, 20.0, 10.0, 5.0],
+        "roas": [2.0, 1.0, 4.0, 3.0, 0.0],
+    })
+    assert phrases(tokenize("Soft cotton briefs"), 2) == ["soft", "cotton", "briefs", "soft cotton", "cotton briefs"]
+    index = PhraseIndex.build(df, max_n=2)
+    assert index.rows("soft").tolist() == [0, 1, 3]
+    assert index.rows("briefs").tolist() == [0, 2, 3]
+    assert index.rows("missing").tolist() == []
+    t = index.table().set_index("phrase")
+    # impression-weighted CTR and spend-weighted ROAS over rows 0, 1, 3
+    assert np.isclose(t.loc["soft", "ctr"], (20 + 30 + 40) / 5000)
+    assert np.isclose(t.loc["soft", "roas"], (20 + 30 + 30) / 50)
+    assert t.loc["cotton briefs", "rows"] == 2
+
+    cache = str(tmp_path / "phrases")
+    data = tmp_path / "ads.csv"
+    df.to_csv(data, index=False)
+    built = PhraseIndex.for_dataset(str(data), df, cache)
+    loaded = PhraseIndex.for_dataset(str(data), df, cache)
+    assert len(os.listdir(cache)) == 1
+    pd.testing.assert_frame_equal(built.table(), loaded.table())
+    # ties on lift go to the phrase with more impressions
+    assert loaded.top(1, min_rows=1)[0]["phrase"] == "briefs"
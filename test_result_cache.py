@@ -0,0 +1,33 @@
+from utils.result_cache import ResultCache, config_subset
+
+
+def test_keys_follow_the_config_subset(tmp_path):
+    cfg = {"roas_drop_pct": 0.15, "llm_model": "a"}
+    key = ResultCache.key("generate_insights", data="h", config=config_subset(cfg, ["roas_drop_pct"]))
+    cfg["llm_model"] = "b"
+    assert ResultCache.key("generate_insights", data="h", config=config_subset(cfg, ["roas_drop_pct"])) == key
+    cfg["roas_drop_pct"] = 0.2
+    assert ResultCache.key("generate_insights", data="h", config=config_subset(cfg, ["roas_drop_pct"])) != key
+
+    data = tmp_path / "ads.csv"
+    data.write_text("a,b\n1,2\n")
+    with ResultCache(str(tmp_path / "results.sqlite")) as cache:
+        h = cache.data_hash(str(data))
+        assert cache.data_hash(str(data)) == h
+        cache.put(key, "generate_insights", [{"campaign": "A"}])
+        assert cache.lookup(key) == (True, [{"campaign": "A"}])
+        assert cache.lookup("missing") == (False, None)
+
+
+def test_eviction_by_age_and_size(tmp_path):
+    with ResultCache(str(tmp_path / "results.sqlite"), max_bytes=3000, max_age_s=100) as cache:
+        cache.put("old", "s", b"x" * 1000, now=0.0)
+        cache.put("a", "s", b"x" * 1000, now=150.0)
+        assert cache.lookup("old", now=150.0) == (False, None) and cache.count() == 1
+        cache.put("b", "s", b"x" * 1000, now=160.0)
+        cache.lookup("a", now=170.0)
+        # over budget: the least recently used entry ("b") goes first
+        cache.put("c", "s", b"x" * 1000, now=180.0)
+        assert cache.size_bytes() <= 3000
+        assert cache.lookup("b", now=190.0)[0] is False
+        assert cache.lookup("a", now=190.0)[0] and cache.lookup("c", now=190.0)[0]
@@ -0,0 +1,32 @@
+import pytest
+
+from orchestrator.run import llm_result_cacheable, run_pipeline
+from utils import logger
+from utils.synthetic_data import generate
+
+
+@pytest.fixture
+def restore_logger(monkeypatch):
+    for name in ("_SINK", "_ECHO", "_TRACE_MEMORY"):
+        monkeypatch.setattr(logger, name, getattr(logger, name))
+
+
+def test_llm_result_cacheable():
+    assert llm_result_cacheable(None)
+    assert llm_result_cacheable({"backend": "http", "failed_requests": 0})
+    assert not llm_result_cacheable({"backend": "http", "failed_requests": 1})
+    assert not llm_result_cacheable({"error": "URLError: timed out"})
+    assert not llm_result_cacheable({"backend": "stub", "failed_requests": 0})
+
+
+def test_stub_creatives_are_not_replayed_from_the_result_cache(tmp_path, restore_logger):
+    data = str(tmp_path / "ads.csv")
+    generate(data, n_rows=2000, n_campaigns=6, n_days=40, seed=1)
+    cfg = {"reports_path": str(tmp_path / "reports"), "logs_path": str(tmp_path / "logs" / "run_logs.jsonl"),
+           "memory_path": str(tmp_path / "memory" / "mem.sqlite"), "result_cache_path": str(tmp_path / "results"),
+           "log_echo": False, "use_llm": True, "llm_backend": "stub", "llm_cache_path": None}
+    first = run_pipeline(config=cfg, overrides={"data_path": data})
+    assert not any(first["cache_hits"].values())
+    second = run_pipeline(config=cfg, overrides={"data_path": data})
+    assert second["cache_hits"]["load_and_summarize_data"] and second["cache_hits"]["generate_insights"]
+    assert not second["cache_hits"]["generate_creatives"]
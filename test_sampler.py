@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import logger
+from utils.sampler import build_sample
+
+
+@pytest.fixture(autouse=True)
+def log_to_tmp(tmp_path, monkeypatch):
+    for name in ("_SINK", "_ECHO", "_TRACE_MEMORY"):
+        monkeypatch.setattr(logger, name, getattr(logger, name))
+    logger.configure(str(tmp_path / "logs" / "run_logs.jsonl"), echo=False)
+
+
+def _write(path, n=3000, seed=0, campaigns=("A", "B", "C")):
+    rng = np.random.default_rng(seed)
+    # one small campaign that a uniform 200-row sample would usually miss
+    camp = np.where(rng.random(n) < 0.002, "Tiny", rng.choice(list(campaigns), n))
+    pd.DataFrame({
+        "campaign_name": camp, "adset_name": "x",
+        "date": (pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 28, n), unit="D")).strftime("%Y-%m-%d"),
+        "spend": rng.uniform(1, 100, n).round(2), "impressions": rng.integers(100, 5000, n),
+        "clicks": rng.integers(0, 50, n), "ctr": rng.uniform(0, 0.05, n).round(4), "purchases": rng.integers(0, 5, n),
+        "revenue": rng.uniform(0, 300, n).round(2), "roas": rng.uniform(0, 5, n).round(2),
+    }).to_csv(path, index=False)
+
+
+def test_stratified_sample_is_deterministic_and_covers_every_stratum(tmp_path):
+    data = str(tmp_path / "full.csv")
+    _write(data)
+    a, b = str(tmp_path / "a.csv"), str(tmp_path / "b.csv")
+    report = build_sample(data, a, n=200, seed=7, chunk_rows=500)
+    build_sample(data, b, n=200, seed=7, chunk_rows=1000)
+    with open(a) as fa, open(b) as fb:
+        assert fa.read() == fb.read()
+
+    sample, full = pd.read_csv(a), pd.read_csv(data)
+    assert len(sample) == 200 and report["rows"] == {"full": 3000, "sample": 200}
+    assert report["coverage"] == {"campaign": 1.0, "week": 1.0, "strata": 1.0}
+    assert "Tiny" in set(sample["campaign_name"])
+    # sampled rows are unchanged rows of the full file
+    assert len(sample.merge(full, how="inner")) == 200
+    assert abs(report["relative_error"]["roas"]) < 0.1
+    assert report["tvd"]["campaign_rows"] < 0.1 and "note" not in report
+
+
+def test_sample_stays_at_n_rows_when_the_strata_minimums_exceed_it(tmp_path, capsys):
+    data, out = str(tmp_path / "full.csv"), str(tmp_path / "sample.csv")
+    # 40 campaigns x 4-5 weeks: more strata than sample rows
+    _write(data, campaigns=[f"C{i:02d}" for i in range(40)])
+    report = build_sample(data, out, n=100, seed=3)
+    assert len(pd.read_csv(out)) == 100 and report["rows"]["sample"] == 100
+    assert report["strata"] > 100 and "exceeds sample_rows=100" in report["note"]
+    assert "[sampler]" in capsys.readouterr().out
+    # no better than uniform for 100 rows over 40 campaigns, but no longer skewed toward small strata
+    assert report["tvd"]["campaign_rows"] < 0.25
+    assert abs(report["relative_error"]["roas"]) < 0.15
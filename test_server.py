@@ -0,0 +1,51 @@
+import os
+
+import pandas as pd
+import pytest
+
+from orchestrator.client import AnalysisClient
+from orchestrator.server import AnalysisServer, AnalysisService
+
+
+def _frame(days=40):
+    dates = pd.date_range("2025-01-01", periods=days)
+    rows = []
+    for i, d in enumerate(dates):
+        for camp, adset, roas in (("A", "A1", 3.0 if i < days - 7 else 1.0), ("B", "B1", 2.0)):
+            rows.append({"campaign_name": camp, "adset_name": adset, "date": d.strftime("%Y-%m-%d"), "spend": 10.0,
+                         "impressions": 5000, "clicks": 50, "ctr": 0.01, "purchases": 1, "revenue": 10.0 * roas,
+                         "roas": roas, "creative_type": "Image", "creative_message": "soft cotton",
+                         "audience_type": "Broad", "platform": "Facebook", "country": "US"})
+    return pd.DataFrame(rows)
+
+
+def test_queries_overrides_and_reload(tmp_path):
+    data = str(tmp_path / "ads.csv")
+    _frame().to_csv(data, index=False)
+    cfg = {"insight_grains": ["campaign_name"], "recent_window_days": 7, "previous_window_days": 30,
+           "dataset_cache_path": None}
+    service = AnalysisService(cfg, data)
+    service.load()
+    srv = AnalysisServer(service).start()
+    try:
+        client = AnalysisClient(srv.url)
+        res = client.query()
+        by_entity = {i["entity"]: i["hypothesis"] for i in res["insights"]}
+        assert by_entity["A"].startswith("Audience fatigue") and by_entity["B"] == "No clear change"
+
+        # a recent window longer than the drop dilutes it below the 70% threshold
+        res = client.query(recent_window_days=30, previous_window_days=10, roas_drop_pct=0.7)
+        assert {i["entity"]: i["hypothesis"] for i in res["insights"]}["A"] == "No clear change"
+
+        res = client.query(grains=["adset_name"], filters={"campaign_name": "B"})
+        assert [i["entity"] for i in res["insights"]] == ["B1"]
+        with pytest.raises(RuntimeError, match="400"):
+            client.query(grains=["bogus"])
+
+        # a rewritten file is picked up by the next request
+        _frame(days=50).to_csv(data, index=False)
+        os.utime(data, ns=(1, 1))
+        assert client.query()["overall"]["n_rows"] == 100 and client.health()["loads"] == 2
+    finally:
+        srv.shutdown()
+        srv.server_close()
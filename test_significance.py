@@ -0,0 +1,36 @@
+import numpy as np
+
+from utils.significance import bootstrap_change_ci, t_two_sided_p, welch
+
+
+def test_t_distribution_p_values():
+    # reference values of 2 * P(T > t)
+    p = t_two_sided_p([2.0, 1.0, 0.0, 3.5], [10, 30, 5, 200])
+    assert np.allclose(p, [0.07338803, 0.32530861, 1.0, 0.00057354], atol=1e-7)
+
+
+def test_welch_from_sums():
+    rng = np.random.default_rng(1)
+    a, b = rng.normal(1.0, 2.0, 40), rng.normal(2.0, 1.0, 60)
+    res = welch(a.sum(), (a ** 2).sum(), len(a), b.sum(), (b ** 2).sum(), len(b))
+    se = np.sqrt(a.var(ddof=1) / len(a) + b.var(ddof=1) / len(b))
+    assert np.isclose(res["t"], (b.mean() - a.mean()) / se)
+    assert 0 < res["p"] < 0.05
+    assert np.isnan(welch(1.0, 1.0, 1, 2.0, 4.0, 1)["p"])
+
+
+def test_bootstrap_ci_brackets_the_change():
+    rng = np.random.default_rng(2)
+    # group 0 drops 30%, group 1 is flat, group 2 has no recent days
+    group = np.repeat([0, 1, 2], 40)
+    window = np.tile(np.r_[np.zeros(30), np.ones(10)], 3).astype(int)
+    window[80:] = 0
+    den = np.full(len(group), 10.0)
+    level = np.where((group == 0) & (window == 1), 0.7, 1.0)
+    num = den * level * rng.lognormal(0, 0.1, len(group))
+    ci = bootstrap_change_ci({"roas": num}, den, group, window, 3, n_boot=500, seed=0)["roas"]
+    assert ci[0][0] < -0.3 < ci[1][0] < 0
+    assert ci[0][1] < 0 < ci[1][1]
+    assert np.isnan(ci[0][2]) and np.isnan(ci[1][2])
+    again = bootstrap_change_ci({"roas": num}, den, group, window, 3, n_boot=500, seed=0)["roas"]
+    assert np.array_equal(ci[0][:2], again[0][:2])
@@ -0,0 +1,12 @@
+import numpy as np
+
+from utils.sketch import QuantileSketch
+
+def test_merged_sketch_matches_exact_quantile_within_accuracy():
+    values = np.random.default_rng(7).uniform(0.001, 0.05, size=20000)
+    merged = QuantileSketch(0.01)
+    for part in np.array_split(values, 8):
+        merged.merge(QuantileSketch(0.01).update(part))
+    assert merged.count == len(values)
+    exact = float(np.quantile(values, 0.25))
+    assert abs(merged.quantile(0.25) - exact) / exact <= 0.02
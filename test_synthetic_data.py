@@ -0,0 +1,39 @@
+import json
+
+import pandas as pd
+
+from utils.synthetic_data import generate
+
+COLUMNS = ["campaign_name", "adset_name", "date", "spend", "impressions", "clicks", "ctr", "purchases", "revenue",
+           "roas", "creative_type", "creative_message", "audience_type", "platform", "country"]
+
+
+def test_schema_truth_file_and_seeded_output(tmp_path):
+    path = str(tmp_path / "ads.csv")
+    truth = generate(path, n_rows=2000, n_campaigns=8, n_days=30, seed=7, chunk_rows=500)
+    df = pd.read_csv(path)
+    assert list(df.columns) == COLUMNS and len(df) == 2000
+    assert df["date"].is_monotonic_increasing and df["date"].nunique() == 30
+    assert (df["clicks"] <= df["impressions"]).all()
+    with open(tmp_path / "ads.truth.json") as fh:
+        assert json.load(fh) == truth
+    assert len(truth["roas_drops"]) == 2 and set(truth["ctr_drops"]) <= set(truth["roas_drops"])
+
+    again = str(tmp_path / "again.csv")
+    generate(again, n_rows=2000, n_campaigns=8, n_days=30, seed=7, chunk_rows=500)
+    with open(path) as a, open(again) as b:
+        assert a.read() == b.read()
+
+
+def test_injected_drops_show_up_in_the_data(tmp_path):
+    path = str(tmp_path / "ads.csv")
+    truth = generate(path, n_rows=40000, n_campaigns=8, n_days=60, seed=3, roas_drop=0.5, ctr_drop=0.4)
+    df = pd.read_csv(path, parse_dates=["date"])
+    after = df["date"] >= pd.Timestamp(truth["drop_start_date"])
+    sums = df.groupby([df["campaign_name"], after])[["revenue", "spend", "clicks", "impressions"]].sum()
+    roas = (sums["revenue"] / sums["spend"]).unstack()
+    ctr = (sums["clicks"] / sums["impressions"]).unstack()
+    roas_change, ctr_change = roas[True] / roas[False] - 1, ctr[True] / ctr[False] - 1
+    for camp in roas.index:
+        assert (roas_change[camp] < -0.3) == (camp in truth["roas_drops"]), camp
+        assert (ctr_change[camp] < -0.25) == (camp in truth["ctr_drops"]), camp
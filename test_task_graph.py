@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from agents.planner_agent import PlannerAgent
+from utils import logger
+from utils.task_graph import TaskGraphExecutor, resolve_dependencies
+
+
+@pytest.fixture(autouse=True)
+def quiet_spans(tmp_path, monkeypatch):
+    # each task runs in a span; keep its events out of the default log
+    monkeypatch.setattr(logger, "_SINK", logger.JsonlSink(str(tmp_path / "run_logs.jsonl")))
+    monkeypatch.setattr(logger, "_ECHO", False)
+
+
+def _plan(sweep=False):
+    return PlannerAgent().generate_plan("Analyze ROAS drop", sweep=sweep)["tasks"]
+
+
+def test_sweep_is_a_dependency_of_the_report():
+    deps = resolve_dependencies(_plan(sweep=True))
+    assert deps["t7"] == ["t1"] and "t7" in deps["t5"]
+    assert "t7" not in resolve_dependencies(_plan())["t5"]
+
+
+def test_failed_task_skips_only_its_dependents():
+    calls = []
+
+    def handler(action, fail=False):
+        def run(outputs):
+            calls.append(action)
+            if fail:
+                raise RuntimeError(f"{action} failed")
+            return action
+        return run
+
+    handlers = {t["action"]: handler(t["action"], fail=t["action"] == "validate_insights") for t in _plan(sweep=True)}
+    result = TaskGraphExecutor(max_workers=4).run(_plan(sweep=True), handlers)
+    status = {t["action"]: t["status"] for t in result["tasks"]}
+    assert status == {"load_and_summarize_data": "ok", "generate_insights": "ok", "validate_insights": "failed",
+                      "generate_creatives": "ok", "persist_and_report": "skipped", "persist_insights": "skipped",
+                      "sweep_windows": "ok"}
+    assert "RuntimeError: validate_insights failed" == next(t["error"] for t in result["tasks"] if t["id"] == "t3")
+    assert set(result["outputs"]) == {"load_and_summarize_data", "generate_insights", "generate_creatives",
+                                      "sweep_windows"}
+    assert "persist_and_report" not in calls and "persist_insights" not in calls
+
+
+def test_independent_tasks_run_concurrently():
+    # generate_insights and generate_creatives both wait for each other, so they only finish if run together
+    barrier = threading.Barrier(2, timeout=5)
+    handlers = {t["action"]: (lambda outputs: None) for t in _plan()}
+    handlers["generate_insights"] = handlers["generate_creatives"] = lambda outputs: barrier.wait()
+    result = TaskGraphExecutor(max_workers=2).run(_plan(), handlers)
+    assert all(t["status"] == "ok" for t in result["tasks"])
+
+
+def test_cycles_and_unknown_dependencies_are_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        resolve_dependencies([{"id": "a", "action": "x", "depends_on": ["b"]},
+                              {"id": "b", "action": "y", "depends_on": ["a"]}])
+    with pytest.raises(ValueError, match="unknown"):
+        resolve_dependencies([{"id": "a", "action": "x", "depends_on": ["z"]}])
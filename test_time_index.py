@@ -0,0 +1,25 @@
+import pandas as pd
+
+from utils.time_index import TimeIndex
+
+def test_window_sums_are_prefix_differences():
+    df = pd.DataFrame({
+        "campaign_name": ["A", "A", "A", "B"],
+        "date": pd.to_datetime(["2025-01-01", "2025-01-02", "2025-01-04", "2025-01-04"]),
+        "spend": [1.0, 2.0, 4.0, 8.0],
+        "impressions": [10, 20, 40, 80],
+        "clicks": [1, 2, 4, 8],
+        "purchases": [0, 1, 0, 1],
+        "revenue": [0.0, 5.0, 0.0, 9.0],
+        "ctr": [0.1, 0.1, 0.1, 0.1],
+        "roas": [0.0, 2.5, 0.0, 1.125],
+    })
+    index = TimeIndex.build(df, ["campaign_name"])["campaign_name"]
+    assert index.n_days == 4
+    spend = index.window_sums(1, 4)[:, 0]
+    assert spend.tolist() == [6.0, 8.0]
+
+    frame = index.window_frame(recent_days=1, prev_days=3)
+    assert frame.index.tolist() == ["A"]
+    assert frame.loc["A", "spend_prev"] == 3.0
+    assert frame.loc["A", "roas_prev"] == 1.25
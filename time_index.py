@@ -0,0 +1,146 @@
+"""
+Prefix-sum time index:
+Per-entity x per-day cumulative sums of the additive measures, so any window sum
+(and any window mean, via the row count) is one subtraction instead of a re-filter of the rows.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+MEASURES = ['spend', 'impressions', 'clicks', 'purchases', 'revenue', 'ctr_sum', 'roas_sum', 'rows']
+
+
+def window_labels(dates: pd.Series, recent_days: int, prev_days: int, today=None) -> np.ndarray:
+    """
+    0 = previous window, 1 = recent window, -1 = outside both (anchored at today, default the latest date).
+    """
+    today = dates.max() if today is None else pd.Timestamp(today)
+    recent_cut = today - pd.Timedelta(days=recent_days)
+    prev_cut = recent_cut - pd.Timedelta(days=prev_days)
+    d = dates.to_numpy()
+    return np.select([d > recent_cut.to_datetime64(), d > prev_cut.to_datetime64()], [1, 0], default=-1)
+
+
+def daily_cells(df: pd.DataFrame, grains: List[str], squares: bool = False) -> pd.DataFrame:
+    """
+    One grouped pass over the rows: additive measures per (grains x day) cell.
+    Index levels are the grains plus "date" (normalized day). With squares=True, ctr_sq and
+    roas_sq (sums of squares, for variances) are added.
+    """
+    rows = df.loc[df['date'].notna()]
+    # compact float32 ratios are summed in float64
+    rows = rows.assign(ctr=rows['ctr'].astype(np.float64, copy=False), roas=rows['roas'].astype(np.float64, copy=False))
+    keys = [rows[g] for g in grains] + [rows['date'].dt.normalize()]
+    aggs = dict(spend=("spend", "sum"), impressions=("impressions", "sum"), clicks=("clicks", "sum"),
+                purchases=("purchases", "sum"), revenue=("revenue", "sum"),
+                ctr_sum=("ctr", "sum"), roas_sum=("roas", "sum"), rows=("roas", "size"))
+    if squares:
+        rows = rows.assign(ctr_sq=rows['ctr'].to_numpy() ** 2, roas_sq=rows['roas'].to_numpy() ** 2)
+        aggs.update(ctr_sq=("ctr_sq", "sum"), roas_sq=("roas_sq", "sum"))
+    return rows.groupby(keys, dropna=False, sort=False, observed=True).agg(**aggs)
+
+
+
+def merge_cells(cells: Optional[pd.DataFrame], new: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds daily_cells output to an accumulated set of cells (None to start one). Grain keys are
+    stored as strings, so cells from separately read parts of a file line up; missing keys stay
+    missing (not "nan"), so the per-grain roll-ups leave them out.
+    """
+    names = list(new.index.names)
+    new.index = pd.MultiIndex.from_arrays([_str_keys(new.index.get_level_values(n)) if n != "date"
+                                           else new.index.get_level_values(n) for n in names], names=names)
+    if cells is None or cells.empty:
+        return new.sort_index()
+    return pd.concat([cells, new]).groupby(level=names, sort=True, dropna=False).sum()
+
+
+def _str_keys(values: pd.Index) -> pd.Index:
+    return pd.Index(values.astype(str), dtype=object).where(values.notna())
+
+class TimeIndex:
+    def __init__(self, entities: pd.Index, start_date: pd.Timestamp, cum: np.ndarray):
+        self.entities = entities
+        self.start_date = pd.Timestamp(start_date)
+        # cum[e, d, m] = sum of measure m for entity e over days [0, d); shape (n_entities, n_days + 1, n_measures)
+        self.cum = cum
+
+    @property
+    def n_days(self) -> int:
+        return self.cum.shape[1] - 1
+
+    @property
+    def end_date(self) -> pd.Timestamp:
+        return self.start_date + pd.Timedelta(days=self.n_days - 1)
+
+    @classmethod
+    def from_daily(cls, daily: pd.DataFrame, start_date=None, end_date=None) -> "TimeIndex":
+        """
+        daily: additive MEASURES indexed by (entity, date); one row per pair.
+        """
+        entity_values = daily.index.get_level_values(0)
+        dates = pd.DatetimeIndex(daily.index.get_level_values(1)).normalize()
+        start = pd.Timestamp(start_date).normalize() if start_date is not None else dates.min()
+        end = pd.Timestamp(end_date).normalize() if end_date is not None else dates.max()
+        n_days = int((end - start).days) + 1 if len(dates) else 0
+        codes, entities = pd.factorize(entity_values, sort=True)
+        day = np.asarray((dates - start).days, dtype=np.int64)
+        keep = (codes >= 0) & (day >= 0) & (day < n_days)
+        dense = np.zeros((len(entities), n_days + 1, len(MEASURES)), dtype=np.float64)
+        np.add.at(dense, (codes[keep], day[keep] + 1), daily[MEASURES].to_numpy(dtype=np.float64)[keep])
+        np.cumsum(dense, axis=1, out=dense)
+        return cls(pd.Index(entities), start, dense)
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, grains: List[str]) -> Dict[str, "TimeIndex"]:
+        """
+        One index per grain, all rolled up from a single grouped pass over the rows.
+        """
+        return cls.from_cells(daily_cells(df, grains), grains, df['date'].min(), df['date'].max())
+
+    @classmethod
+    def from_cells(cls, cells: pd.DataFrame, grains: List[str], start_date=None, end_date=None) -> Dict[str, "TimeIndex"]:
+        """
+        One index per grain, rolled up from daily_cells output (e.g. a stored aggregate checkpoint).
+        """
+        return {g: cls.from_daily(cells.groupby(level=[g, "date"], observed=True).sum(), start_date, end_date)
+                for g in grains}
+
+    def window_sums(self, start: int, stop: int) -> np.ndarray:
+        """
+        Sums over day indices [start, stop), clamped to the index range: (n_entities, n_measures).
+        """
+        start = min(max(start, 0), self.n_days)
+        stop = min(max(stop, start), self.n_days)
+        return self.cum[:, stop, :] - self.cum[:, start, :]
+
+    def daily_means(self, measure: str) -> np.ndarray:
+        """
+        Per-day row mean of a summed measure (e.g. "roas_sum"): (n_entities, n_days), NaN on days without rows.
+        """
+        n = np.diff(self.cum[:, :, MEASURES.index('rows')], axis=1)
+        total = np.diff(self.cum[:, :, MEASURES.index(measure)], axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(n > 0, total / n, np.nan)
+
+    def window_frame(self, recent_days: int, prev_days: int) -> pd.DataFrame:
+        """
+        Same shape as InsightAgent.window_frame: recent window is the last recent_days days
+        ending at end_date, previous window the prev_days before it.
+        """
+        split = self.n_days - recent_days
+        cols = {}
+        for suffix, (a, b) in (("prev", (split - prev_days, split)), ("last", (split, self.n_days))):
+            sums = self.window_sums(a, b)
+            n = sums[:, MEASURES.index('rows')]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cols[f"n_{suffix}"] = n
+                cols[f"roas_{suffix}"] = np.where(n > 0, sums[:, MEASURES.index('roas_sum')] / n, np.nan)
+                cols[f"ctr_{suffix}"] = np.where(n > 0, sums[:, MEASURES.index('ctr_sum')] / n, np.nan)
+            cols[f"spend_{suffix}"] = sums[:, MEASURES.index('spend')]
+            cols[f"impressions_{suffix}"] = sums[:, MEASURES.index('impressions')]
+        # filter the arrays before building the frame: one constructor call, no per-column inserts
+        keep = (cols["n_prev"] > 0) & (cols["n_last"] > 0)
+        return pd.DataFrame({k: v[keep] for k, v in cols.items()}, index=self.entities[keep])